@@ -0,0 +1,148 @@
+from array import array
+from datetime import date
+from typing import NamedTuple, Sequence
+
+from app.openweathersdk.series import ForecastSeries
+
+SECONDS_PER_DAY = 24 * 60 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class ForecastColumns(NamedTuple):
+    """
+    A forecast laid out as parallel columns, one value per 3-hour step.
+
+    ``dt`` holds the UTC epochs and ``timezone`` the city's shift in seconds
+    from UTC, as returned by OpenWeather.
+    """
+
+    dt: Sequence[int]
+    temp: Sequence[float]
+    pop: Sequence[float]
+    condition: Sequence[str]
+    timezone: int = 0
+
+
+class DailySummary(NamedTuple):
+    date: date
+    temp_mean: float
+    temp_min: float
+    temp_max: float
+    pop_max: float
+    condition: str
+
+
+def forecast_columns(forecast) -> ForecastColumns:
+    """
+    Extracts the columns used by ``aggregate_daily`` from a forecast.
+
+    A ``ForecastSeries`` already stores its steps as columns, so they are
+    used as they are.
+
+    Parameters
+    ----------
+    forecast : WeatherForecast or ForecastSeries
+        The forecast returned by the OpenWeather clients.
+
+    Returns
+    -------
+    ForecastColumns
+        Epochs, temperatures, precipitation probabilities and condition
+        descriptions of every step, with the city timezone.
+    """
+    if isinstance(forecast, ForecastSeries):
+        return ForecastColumns(
+            dt=forecast.dt,
+            temp=forecast.temp,
+            pop=forecast.pop,
+            condition=forecast.descriptions(),
+            timezone=forecast.city.timezone,
+        )
+
+    items = forecast.list
+    return ForecastColumns(
+        dt=array('q', [item.dt for item in items]),
+        temp=array('d', [item.main.temp for item in items]),
+        pop=array('d', [item.pop for item in items]),
+        condition=[
+            item.weather[0].description if item.weather else ''
+            for item in items
+        ],
+        timezone=forecast.city.timezone,
+    )
+
+
+def aggregate_daily(columns: ForecastColumns) -> list[DailySummary]:
+    """
+    Summarizes a forecast per local calendar day in a single pass.
+
+    Days are bucketed by ``(dt + timezone) // 86400``, so they follow the
+    city's local midnight instead of UTC. The steps must be sorted by
+    ``dt``, as OpenWeather returns them.
+
+    Parameters
+    ----------
+    columns : ForecastColumns
+        The forecast columns, see ``forecast_columns``.
+
+    Returns
+    -------
+    list[DailySummary]
+        One summary per day in chronological order, with the mean, minimum
+        and maximum temperatures, the highest precipitation probability and
+        the most frequent condition (the earliest one on ties).
+    """
+    timezone = columns.timezone
+    summaries = []
+
+    current_day = None
+    total = low = high = pop_max = 0.0
+    count = 0
+    votes: dict[str, int] = {}
+
+    for dt, temp, pop, condition in zip(
+        columns.dt, columns.temp, columns.pop, columns.condition
+    ):
+        day = (dt + timezone) // SECONDS_PER_DAY
+
+        if day != current_day:
+            if count:
+                summaries.append(
+                    _summary(
+                        current_day, total, count, low, high, pop_max, votes
+                    )
+                )
+            current_day = day
+            total = low = high = temp
+            pop_max = pop
+            count = 1
+            votes = {condition: 1}
+            continue
+
+        total += temp
+        count += 1
+        if temp < low:
+            low = temp
+        elif temp > high:
+            high = temp
+        pop_max = max(pop, pop_max)
+        votes[condition] = votes.get(condition, 0) + 1
+
+    if count:
+        summaries.append(
+            _summary(current_day, total, count, low, high, pop_max, votes)
+        )
+    return summaries
+
+
+def _summary(  # noqa: PLR0913, PLR0917
+    day, total, count, low, high, pop_max, votes
+) -> DailySummary:
+    return DailySummary(
+        date=date.fromordinal(EPOCH_ORDINAL + day),
+        temp_mean=total / count,
+        temp_min=low,
+        temp_max=high,
+        pop_max=pop_max,
+        condition=max(votes, key=votes.get),
+    )
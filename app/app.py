@@ -1,118 +1,881 @@
+import asyncio
+import math
 import os
-from collections import defaultdict
-from statistics import mean
-from requests.exceptions import HTTPError
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Annotated, Optional
 
-from fastapi import FastAPI, HTTPException, status
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from requests.exceptions import HTTPError
 
-from app.openweathersdk.openweather import OpenWeather
-from app.schemas import ListCityLocation, Message
+from app.compression import CompressionMiddleware
+from app.gist import AsyncGistClient
+from app.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    LoopLagMonitor,
+    MetricFamily,
+    MetricsMiddleware,
+    stage,
+)
+from app.openweathersdk.cache import (
+    ForecastCache,
+    ForecastVersion,
+    GeocodingCache,
+)
+from app.openweathersdk.fuzzy import FuzzyCityIndex
+from app.openweathersdk.gazetteer import Gazetteer
+from app.openweathersdk.openweather import AsyncOpenWeather
+from app.openweathersdk.prefetch import ForecastPrefetcher
+from app.openweathersdk.ratelimit import BULK, INTERACTIVE, RateLimiter
+from app.openweathersdk.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    UpstreamUnavailableError,
+)
+from app.outbox import GistOutbox
+from app.profiling import (
+    ContinuousProfiler,
+    ProfileStore,
+    ProfilingMiddleware,
+    is_authorized,
+)
+from app.responses import FastJSONResponse
+from app.schemas import (
+    BatchForecast,
+    BatchForecastItem,
+    BatchForecastRequest,
+    Coordinate,
+    ForecastStreamItem,
+    GistJob,
+    ListCityLocation,
+    Message,
+    NearestCitiesBatch,
+    NearestCitiesRequest,
+    StreamLocation,
+)
+from app.streaming import (
+    NDJSON_MEDIA_TYPE,
+    SSE_MEDIA_TYPE,
+    DuplexStreamingResponse,
+    iter_lines,
+    map_as_completed,
+    ndjson_line,
+    sse_event,
+)
+from app.tracing import (
+    FileSpanExporter,
+    OTLPSpanExporter,
+    Tracer,
+    TracingMiddleware,
+)
 from app.util import (
+    build_forecast_message,
     create_gist,
-    format_datetime_into_date,
+    data_path,
+    etag_matches,
+    get_gist_index,
+    get_github_circuit_breaker,
+    get_github_retry_policy,
+    make_etag,
 )
+from app.util import get_gist_client as get_sync_gist_client
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '10'))
+STREAM_CONCURRENCY = int(os.getenv('STREAM_CONCURRENCY', '10'))
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '10'))
+STALE_IF_ERROR = os.getenv('STALE_IF_ERROR', 'true').lower() == 'true'
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH')
+FUZZY_SEARCH = os.getenv('FUZZY_SEARCH', 'true').lower() == 'true'
+CITY_LOCATION_MAX_AGE = int(os.getenv('CITY_LOCATION_MAX_AGE', '86400'))
+COMPRESSION_MINIMUM_SIZE = int(os.getenv('COMPRESSION_MINIMUM_SIZE', '1024'))
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.001'))
+PROFILING_CONTINUOUS = (
+    os.getenv('PROFILING_CONTINUOUS', 'false').lower() == 'true'
+)
+
+
+@lru_cache
+def get_tracer() -> Tracer:
+    if OTLP_ENDPOINT:
+        exporter = OTLPSpanExporter(OTLP_ENDPOINT)
+    elif TRACE_EXPORT_PATH:
+        exporter = FileSpanExporter(TRACE_EXPORT_PATH)
+    else:
+        exporter = None
+    return Tracer(
+        exporter,
+        sample_rate=TRACE_SAMPLE_RATE,
+        service_name=os.getenv('OTEL_SERVICE_NAME', 'openweathergit'),
+        export_interval=float(os.getenv('TRACE_EXPORT_INTERVAL', '5')),
+    )
+
+
+def get_admin_token() -> Optional[str]:
+    return os.getenv('PROFILING_ADMIN_TOKEN')
+
+
+@lru_cache
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(
+        os.getenv('PROFILE_DIR') or data_path('profiles'),
+        max_files=int(os.getenv('PROFILE_MAX_FILES', '100')),
+    )
+
+
+@lru_cache
+def get_continuous_profiler() -> ContinuousProfiler:
+    return ContinuousProfiler(
+        get_profile_store(),
+        interval=float(os.getenv('PROFILING_CONTINUOUS_INTERVAL', '0.1')),
+        flush_interval=float(os.getenv('PROFILING_FLUSH_INTERVAL', '60')),
+    )
 
-app = FastAPI()
+
+@lru_cache
+def get_gazetteer() -> Optional[Gazetteer]:
+    return Gazetteer.load(GAZETTEER_PATH) if GAZETTEER_PATH else None
+
+
+@lru_cache
+def get_fuzzy_index() -> Optional[FuzzyCityIndex]:
+    if not FUZZY_SEARCH:
+        return None
+    min_similarity = float(os.getenv('FUZZY_MIN_SIMILARITY', '0.4'))
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return FuzzyCityIndex(min_similarity=min_similarity)
+    return FuzzyCityIndex.from_gazetteer(
+        gazetteer, min_similarity=min_similarity
+    )
+
+
+@lru_cache
+def get_openweather() -> AsyncOpenWeather:
+    return AsyncOpenWeather(
+        pool_size=int(os.getenv('OPENWEATHER_POOL_SIZE', '10')),
+        timeout=(
+            float(os.getenv('OPENWEATHER_CONNECT_TIMEOUT', '3.05')),
+            float(os.getenv('OPENWEATHER_READ_TIMEOUT', '10')),
+        ),
+        forecast_cache=ForecastCache(
+            precision=int(os.getenv('FORECAST_CACHE_PRECISION', '2')),
+            max_entries=int(os.getenv('FORECAST_CACHE_MAX_ENTRIES', '1024')),
+            max_bytes=int(
+                os.getenv('FORECAST_CACHE_MAX_BYTES', str(64 * 1024 * 1024))
+            ),
+            stale_ttl=float(os.getenv('FORECAST_STALE_TTL', '86400')),
+            radius_km=float(os.getenv('FORECAST_CACHE_RADIUS_KM', '2')),
+        ),
+        geocoding_cache=GeocodingCache(
+            os.getenv('GEOCODING_CACHE_PATH') or data_path('geocoding.sqlite3')
+        ),
+        compact=os.getenv('FORECAST_COMPACT', 'true').lower() == 'true',
+        rate_limiter=RateLimiter.per_minute(
+            int(os.getenv('OPENWEATHER_CALLS_PER_MINUTE', '60')),
+            burst=int(os.getenv('OPENWEATHER_BURST', '10')),
+            name='OpenWeather',
+            max_queue=int(os.getenv('RATE_LIMIT_MAX_QUEUE', '100')),
+            max_queue_wait=float(os.getenv('RATE_LIMIT_MAX_QUEUE_WAIT', '30')),
+        ),
+        rate_limit_max_wait=RATE_LIMIT_MAX_WAIT,
+        retry_policy=RetryPolicy(
+            attempts=int(os.getenv('OPENWEATHER_RETRY_ATTEMPTS', '3')),
+            backoff=float(os.getenv('OPENWEATHER_RETRY_BACKOFF', '0.2')),
+        ),
+        gazetteer=get_gazetteer(),
+        fuzzy_index=get_fuzzy_index(),
+        stage_timer=stage,
+        tracer=get_tracer(),
+        circuit_breaker=CircuitBreaker(
+            'OpenWeather',
+            failure_threshold=int(
+                os.getenv('OPENWEATHER_BREAKER_THRESHOLD', '5')
+            ),
+            recovery_timeout=float(
+                os.getenv('OPENWEATHER_BREAKER_RECOVERY', '30')
+            ),
+        ),
+    )
+
+
+@lru_cache
+def get_prefetcher() -> ForecastPrefetcher:
+    return ForecastPrefetcher(
+        get_openweather(),
+        top_n=int(os.getenv('PREFETCH_TOP_N', '20')),
+        lead_time=float(os.getenv('PREFETCH_LEAD_TIME', '60')),
+        rate_limiter=RateLimiter.per_minute(
+            int(os.getenv('PREFETCH_CALLS_PER_MINUTE', '20'))
+        ),
+    )
+
+
+def publish_gist(gist_name: str, content: str) -> str:
+    with stage('gist_publish'), get_tracer().span('gist.publish'):
+        return create_gist(
+            token=os.getenv('GITHUB_KEY'),
+            gist_name=gist_name,
+            content=content,
+            tracer=get_tracer(),
+        )
+
+
+@lru_cache
+def get_gist_client() -> AsyncGistClient:
+    return AsyncGistClient(
+        os.getenv('GITHUB_KEY'),
+        pool_size=int(os.getenv('GITHUB_POOL_SIZE', '10')),
+        index=get_gist_index(),
+        retry_policy=get_github_retry_policy(),
+        circuit_breaker=get_github_circuit_breaker(),
+        tracer=get_tracer(),
+    )
+
+
+async def fetch_forecast(  # noqa: PLR0913
+    opw: AsyncOpenWeather,
+    latitude: float,
+    longitude: float,
+    units: str,
+    lang: str,
+    *,
+    priority: int = INTERACTIVE,
+):
+    """
+    Returns a forecast and, when the API failed and the last good cached
+    forecast was served instead, its age in seconds, otherwise None.
+    """
+    try:
+        forecast = await opw.get_weather_forecast(
+            latitude, longitude, units, lang, priority=priority
+        )
+        return forecast, None
+    except Exception:
+        stale = None
+        if STALE_IF_ERROR:
+            stale = opw.get_stale_forecast(latitude, longitude, units, lang)
+        if stale is None:
+            raise
+        return stale
+
+
+def forecast_validators(version: ForecastVersion) -> tuple[str, str]:
+    """
+    Returns the ETag and Cache-Control headers of a response built from the
+    cached forecast ``version``, fresh until the forecast expires.
+    """
+    max_age = max(0, math.ceil(version.expires_at - time.time()))
+    return (
+        make_etag('forecast', version.key, version.stored_at),
+        f'max-age={max_age}',
+    )
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={'ETag': etag, 'Cache-Control': cache_control},
+    )
+
+
+def unavailable(err: UpstreamUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f'Upstream unavailable: {str(err)}',
+        headers={'Retry-After': str(math.ceil(err.retry_after))},
+    )
+
+
+@lru_cache
+def get_gist_outbox() -> GistOutbox:
+    return GistOutbox(
+        publish_gist,
+        path=os.getenv('GIST_OUTBOX_PATH') or data_path('gist_outbox.sqlite3'),
+        workers=int(os.getenv('GIST_WORKERS', '2')),
+        max_attempts=int(os.getenv('GIST_MAX_ATTEMPTS', '5')),
+        retention=float(os.getenv('GIST_OUTBOX_RETENTION', '604800')),
+    )
+
+
+@lru_cache
+def get_loop_monitor() -> LoopLagMonitor:
+    return LoopLagMonitor(interval=LOOP_LAG_INTERVAL)
+
+
+def built(getter):
+    """
+    Returns what a cached getter without arguments already built, or None
+    when it has built nothing yet, without building anything.
+    """
+    if getter.cache_info().currsize == 0:
+        return None
+    return getter()
+
+
+def collect_app_metrics() -> list[MetricFamily]:
+    """
+    Returns the counters kept by the clients, caches and worker pools of
+    the app as metric families, read at scrape time. Only components that
+    already exist are read, so a scrape never opens a client or database.
+    """
+    opw = built(get_openweather)
+    caches = {
+        'forecast': opw and opw.forecast_cache,
+        'geocoding': opw and opw.geocoding_cache,
+    }
+    cache_stats = {
+        name: cache.stats()
+        for name, cache in caches.items()
+        if cache is not None
+    }
+    gist_clients = [built(get_gist_client)]
+    if tracer := built(get_tracer):
+        token = os.getenv('GITHUB_KEY')
+        gist_clients.append(get_sync_gist_client.peek(token, tracer))
+    upstreams = {
+        'openweather': opw.statuses if opw else Counter(),
+        'github': sum(
+            (client.statuses for client in gist_clients if client),
+            Counter(),
+        ),
+    }
+    breakers = {
+        'openweather': opw and opw.circuit_breaker,
+        'github': built(get_github_circuit_breaker),
+    }
+    threads = current_default_thread_limiter()
+
+    def per_cache(field: str) -> list:
+        return [
+            ('', (('cache', name),), stats[field])
+            for name, stats in cache_stats.items()
+        ]
+
+    families = [
+        MetricFamily(
+            'cache_hits_total',
+            'counter',
+            'Cache lookups answered from the cache.',
+            per_cache('hits'),
+        ),
+        MetricFamily(
+            'cache_misses_total',
+            'counter',
+            'Cache lookups that found nothing.',
+            per_cache('misses'),
+        ),
+        MetricFamily(
+            'cache_hit_ratio',
+            'gauge',
+            'Share of cache lookups answered from the cache.',
+            per_cache('hit_ratio'),
+        ),
+        MetricFamily(
+            'upstream_responses_total',
+            'counter',
+            'Upstream call attempts, by status code or error.',
+            [
+                ('', (('upstream', name), ('code', str(code))), count)
+                for name, statuses in upstreams.items()
+                for code, count in sorted(statuses.items(), key=str)
+            ],
+        ),
+        MetricFamily(
+            'circuit_breaker_open',
+            'gauge',
+            'Whether the circuit breaker of an upstream is open.',
+            [
+                ('', (('upstream', name),), float(breaker.is_open))
+                for name, breaker in breakers.items()
+                if breaker is not None
+            ],
+        ),
+        MetricFamily(
+            'threadpool_threads_busy',
+            'gauge',
+            'Worker threads running blocking calls of the event loop.',
+            [('', (), threads.borrowed_tokens)],
+        ),
+        MetricFamily(
+            'threadpool_threads_limit',
+            'gauge',
+            'Maximum number of worker threads of the event loop.',
+            [('', (), threads.total_tokens)],
+        ),
+    ]
+    if opw is not None and opw.rate_limiter is not None:
+        families.append(
+            MetricFamily(
+                'rate_limiter_queue_depth',
+                'gauge',
+                'Upstream calls waiting for a rate limiter token.',
+                [
+                    (
+                        '',
+                        (('upstream', 'openweather'),),
+                        opw.rate_limiter.queue_depth,
+                    )
+                ],
+            )
+        )
+    return families
+
+
+REGISTRY.add_collector(collect_app_metrics)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    opw = get_openweather()
+    if opw.gazetteer is not None:
+        await run_in_threadpool(lambda: opw.gazetteer.tree)
+    if PREFETCH_ENABLED:
+        get_prefetcher().start()
+    get_tracer().start()
+    get_gist_outbox().start()
+    get_loop_monitor().start()
+    if PROFILING_CONTINUOUS:
+        get_continuous_profiler().start()
+    yield
+    if PROFILING_CONTINUOUS:
+        await run_in_threadpool(get_continuous_profiler().stop)
+        get_continuous_profiler.cache_clear()
+    await get_loop_monitor().stop()
+    get_loop_monitor.cache_clear()
+    await get_prefetcher().stop()
+    get_prefetcher.cache_clear()
+    opw = get_openweather()
+    await opw.aclose()
+    opw.geocoding_cache.close()
+    if opw.gazetteer is not None:
+        opw.gazetteer.close()
+    get_gazetteer.cache_clear()
+    get_fuzzy_index.cache_clear()
+    get_openweather.cache_clear()
+    await run_in_threadpool(get_gist_outbox().stop)
+    get_gist_outbox.cache_clear()
+    await get_gist_client().aclose()
+    get_gist_client.cache_clear()
+    # the middleware keeps the tracer, which is restarted by the next run
+    get_tracer().stop()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(
+    CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE
+)
+app.add_middleware(
+    ProfilingMiddleware,
+    paths=('/get-weather-forecast', '/get-city-location'),
+    admin_token=get_admin_token,
+    get_store=get_profile_store,
+    interval=PROFILE_INTERVAL,
+)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware, tracer=get_tracer())
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get('/profiles/{profile_id}', include_in_schema=False)
+async def get_profile(
+    profile_id: str,
+    x_admin_token: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Returns a profile saved by ``ProfilingMiddleware`` or the continuous
+    profiler as collapsed stacks, ready for ``flamegraph.pl`` or speedscope.
+    """
+    if not is_authorized(x_admin_token, get_admin_token()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Invalid admin token',
+        )
+    report = await run_in_threadpool(get_profile_store().get, profile_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Profile {profile_id} not found',
+        )
+    return Response(report, media_type='text/plain; charset=utf-8')
 
 
 @app.get('/get-city-location', response_model=ListCityLocation)
-def get_city_location(
-    city: str, state: str = None, country: str = None, limit: int = 5
+async def get_city_location(  # noqa: PLR0913, PLR0917
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    city: str,
+    state: str = None,
+    country: str = None,
+    limit: int = 5,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    try:
+        cities = await opw.get_city_location(city, state, country, limit=limit)
+    except UpstreamUnavailableError as err:
+        raise unavailable(err)
+    except HTTPError as http_err:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f'Error fetching weather data: {str(http_err)}',
+        )
+    except Exception as err:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'An unexpected error occurred: {str(err)}',
+        )
+
+    etag = make_etag('city-location', cities)
+    cache_control = f'max-age={CITY_LOCATION_MAX_AGE}'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    return FastJSONResponse(
+        {'locations': cities},
+        headers={'ETag': etag, 'Cache-Control': cache_control},
+    )
+
+
+@app.get('/get-nearest-cities', response_model=ListCityLocation)
+async def get_nearest_cities(
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    latitude: float,
+    longitude: float,
+    limit: int = 5,
 ):
-    opw = OpenWeather()
+    try:
+        cities = await opw.get_nearest_cities(latitude, longitude, limit)
+    except UpstreamUnavailableError as err:
+        raise unavailable(err)
+    except HTTPError as http_err:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f'Error fetching weather data: {str(http_err)}',
+        )
+    except Exception as err:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'An unexpected error occurred: {str(err)}',
+        )
+
+    return FastJSONResponse({'locations': cities})
+
 
+@app.post('/get-nearest-cities-batch', response_model=NearestCitiesBatch)
+async def get_nearest_cities_batch(
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    batch: NearestCitiesRequest,
+):
     try:
-        cities = opw.get_city_location(city, state, country, limit=limit)
+        results = await opw.get_nearest_cities_bulk(
+            [
+                (location.latitude, location.longitude)
+                for location in batch.locations
+            ],
+            limit=batch.limit,
+        )
+    except UpstreamUnavailableError as err:
+        raise unavailable(err)
     except HTTPError as http_err:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Error fetching weather data: {str(http_err)}"
+            detail=f'Error fetching weather data: {str(http_err)}',
         )
     except Exception as err:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An unexpected error occurred: {str(err)}"
+            detail=f'An unexpected error occurred: {str(err)}',
         )
 
-    return {'locations': cities}
+    return FastJSONResponse({
+        'results': [{'locations': cities} for cities in results]
+    })
+
+
+@app.get('/get-weather-forecast-message', response_model=Message)
+async def get_weather_forecast_message(  # noqa: PLR0913, PLR0917
+    response: Response,
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    latitude: float,
+    longitude: float,
+    units: str = 'metric',
+    lang: str = 'pt_br',
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    version = opw.get_forecast_version(latitude, longitude, units, lang)
+    if version is not None:
+        etag, cache_control = forecast_validators(version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, cache_control)
+
+    try:
+        forecast, stale_age = await fetch_forecast(
+            opw, latitude, longitude, units, lang
+        )
+    except UpstreamUnavailableError as err:
+        raise unavailable(err)
+    except HTTPError as http_err:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f'Error fetching weather data: {str(http_err)}',
+        )
+    except Exception as err:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'An unexpected error occurred: {str(err)}',
+        )
+
+    _, symbol = opw.get_temperature_scale(units)
+    with stage('aggregate'), get_tracer().span('aggregate'):
+        message = build_forecast_message(forecast, symbol)
+    if stale_age is not None:
+        response.headers['Age'] = str(int(stale_age))
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['Cache-Control'] = 'no-cache'
+        return {'msg': message}
+
+    if version is None:
+        version = opw.get_forecast_version(latitude, longitude, units, lang)
+    if version is not None:
+        etag, cache_control = forecast_validators(version)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+    return {'msg': message}
 
 
 @app.get('/get-weather-forecast', response_model=Message)
-def get_weather_forecast(
+async def get_weather_forecast(  # noqa: PLR0913, PLR0917
+    response: Response,
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    outbox: Annotated[GistOutbox, Depends(get_gist_outbox)],
+    gist_client: Annotated[AsyncGistClient, Depends(get_gist_client)],
     latitude: float,
     longitude: float,
     units: str = 'metric',
     lang: str = 'pt_br',
     gist_name: str = 'weather_forecast',
+    wait: bool = False,
 ):
     try:
-        opw = OpenWeather()
-        response = opw.get_weather_forecast(
-            latitude,
-            longitude,
-            units,
-            lang,
+        forecast, stale_age = await fetch_forecast(
+            opw, latitude, longitude, units, lang
         )
+    except UpstreamUnavailableError as err:
+        raise unavailable(err)
     except HTTPError as http_err:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Error fetching weather data: {str(http_err)}"
+            detail=f'Error fetching weather data: {str(http_err)}',
         )
     except Exception as err:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An unexpected error occurred: {str(err)}"
+            detail=f'An unexpected error occurred: {str(err)}',
         )
 
     try:
-        scale, symbol = opw.get_temperature_scale(units)
+        _, symbol = opw.get_temperature_scale(units)
+        with stage('aggregate'), get_tracer().span('aggregate'):
+            message = build_forecast_message(forecast, symbol)
+        if stale_age is not None:
+            response.headers['Age'] = str(int(stale_age))
+            response.headers['Warning'] = '110 - "Response is Stale"'
 
-        city = response.city.name
-        current_forecast = response.list[0]
-        current_temp = current_forecast.main.temp
-        if current_temp.is_integer():
-            current_temp = int(current_temp)
-        current_weather = current_forecast.weather[0].description
+        if not wait:
+            with stage('gist'), get_tracer().span('gist.enqueue'):
+                job_id = await run_in_threadpool(
+                    outbox.enqueue, gist_name, message
+                )
+            return {'msg': message, 'job_id': job_id}
 
-        current_formated_date = format_datetime_into_date(
-            current_forecast.dt_txt, '%Y-%m-%d %H:%M:%S', '%d/%m'
+        with stage('gist'):
+            gist_url = await gist_client.publish(gist_name, message)
+
+        return {
+            'msg': message,
+            'github_url': gist_url,
+        }
+
+    except Exception as err:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'Error generating forecast or Gist: {str(err)}',
         )
 
-        current_forecast_text = (
-            f'{current_temp}{symbol} e {current_weather} em {city} '
-            f'em {current_formated_date}. '
+
+@app.post('/get-weather-forecast-batch', response_model=BatchForecast)
+async def get_weather_forecast_batch(
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    batch: BatchForecastRequest,
+):
+    _, symbol = opw.get_temperature_scale(batch.units)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def summarize(location: Coordinate) -> BatchForecastItem:
+        result = {
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+        }
+        async with semaphore:
+            try:
+                forecast, stale_age = await fetch_forecast(
+                    opw,
+                    location.latitude,
+                    location.longitude,
+                    batch.units,
+                    batch.lang,
+                    priority=BULK,
+                )
+                result['msg'] = build_forecast_message(forecast, symbol)
+                result['stale'] = stale_age is not None
+            except Exception as err:
+                result['error'] = str(err)
+        # already valid, so built without validation for FastJSONResponse
+        return BatchForecastItem.model_construct(**result)
+
+    results = await asyncio.gather(*map(summarize, batch.locations))
+    return FastJSONResponse({'results': results})
+
+
+async def summarize_stream_line(  # noqa: PLR0913
+    result: dict,
+    opw: AsyncOpenWeather,
+    line: bytes,
+    *,
+    units: str,
+    lang: str,
+    symbol: str,
+) -> None:
+    """
+    Fills ``result`` with the city, coordinates and forecast summary of
+    one ``StreamLocation`` line, keeping what was found before any error.
+    """
+    location = StreamLocation.model_validate_json(line)
+    latitude, longitude = location.latitude, location.longitude
+    if latitude is None or longitude is None:
+        cities = await opw.get_city_location(
+            location.city,
+            location.state,
+            location.country,
+            limit=1,
+            priority=BULK,
         )
+        if not cities:
+            raise LookupError(f'City {location.city} not found')
+        result['city'] = cities[0].name
+        latitude, longitude = cities[0].lat, cities[0].lon
+    result['latitude'] = latitude
+    result['longitude'] = longitude
+    forecast, stale_age = await fetch_forecast(
+        opw, latitude, longitude, units, lang, priority=BULK
+    )
+    result['msg'] = build_forecast_message(forecast, symbol)
+    result['stale'] = stale_age is not None
+
 
-        temps_by_day = defaultdict(list)
+@app.post('/get-weather-forecast-stream')
+async def get_weather_forecast_stream(  # noqa: PLR0913, PLR0917
+    request: Request,
+    opw: Annotated[AsyncOpenWeather, Depends(get_openweather)],
+    units: str = 'metric',
+    lang: str = 'pt_br',
+    format: Optional[str] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Streams the forecast summary of every location of an NDJSON body, one
+    ``StreamLocation`` per line, as soon as each one is ready.
 
-        for forecast in response.list:
-            date = format_datetime_into_date(
-                forecast.dt_txt, '%Y-%m-%d %H:%M:%S', '%d/%m'
+    Results are NDJSON lines of ``ForecastStreamItem``, or server-sent
+    events with ``format=sse`` or ``Accept: text/event-stream``, in
+    completion order and carrying the ``index`` of their input line. At
+    most ``STREAM_CONCURRENCY`` locations are fetched at a time and the
+    body is only read as fast as the client reads the results.
+    """
+    _, symbol = opw.get_temperature_scale(units)
+    sse = format == 'sse' or (
+        format is None and SSE_MEDIA_TYPE in (accept or '')
+    )
+
+    async def summarize(index: int, line: bytes) -> ForecastStreamItem:
+        result = {'index': index}
+        try:
+            await summarize_stream_line(
+                result, opw, line, units=units, lang=lang, symbol=symbol
             )
-            if date != current_formated_date:
-                temps_by_day[date].append(forecast.main.temp)
+        except Exception as err:
+            result['error'] = str(err)
+        return ForecastStreamItem.model_construct(**result)
 
-        next_days_forecast_text = 'Média para os próximos dias: '
+    body_read = False
 
-        for date, temps in temps_by_day.items():
-            avg_temp = mean(temps)
-            next_days_forecast_text += f'{int(avg_temp)}{symbol} em {date}, '
+    async def body():
+        nonlocal body_read
+        async for chunk in request.stream():
+            yield chunk
+        body_read = True
 
-        next_days_forecast_text = next_days_forecast_text.rstrip(', ') + '.'
+    async def stream():
+        try:
+            async for item in map_as_completed(
+                summarize, iter_lines(body()), STREAM_CONCURRENCY
+            ):
+                if sse:
+                    yield sse_event(item, 'forecast', item.index)
+                else:
+                    yield ndjson_line(item)
+                if body_read and await request.is_disconnected():
+                    return
+        except ValueError as err:
+            error = {'error': str(err)}
+            yield sse_event(error, 'error') if sse else ndjson_line(error)
+        if sse:
+            yield sse_event({}, 'end')
 
-        gist_url = create_gist(
-            token=os.getenv('GITHUB_KEY'),
-            gist_name=gist_name,
-            content=current_forecast_text + next_days_forecast_text,
+    if sse:
+        return DuplexStreamingResponse(
+            stream(),
+            media_type=SSE_MEDIA_TYPE,
+            headers={'Cache-Control': 'no-cache'},
         )
+    return DuplexStreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
 
-        return {
-            'msg': current_forecast_text + next_days_forecast_text,
-            'github_url': gist_url,
-        }
 
-    except Exception as err:
+@app.get('/gist-jobs/{job_id}', response_model=GistJob)
+async def get_gist_job(
+    outbox: Annotated[GistOutbox, Depends(get_gist_outbox)],
+    job_id: str,
+):
+    job = await run_in_threadpool(outbox.get, job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating forecast or Gist: {str(err)}"
-        )
\ No newline at end of file
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Gist job {job_id} not found',
+        )
+
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'github_url': job['url'],
+        'error': job['error'],
+    }
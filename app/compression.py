@@ -0,0 +1,189 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/',
+)
+
+
+def supported_encodings() -> tuple[str, ...]:
+    """
+    Returns the content codings the server can produce, best first.
+    """
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Returns the best supported coding an ``Accept-Encoding`` header allows,
+    or None for the identity.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    default = weights.get('*', 0.0)
+    for coding in supported_encodings():
+        if weights.get(coding, default) > 0:
+            return coding
+    return None
+
+
+class Encoder:
+    """
+    Incremental gzip or brotli compressor of one response body.
+    """
+
+    def __init__(self, encoding: str, gzip_level=6, brotli_quality=4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(
+                gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def chunk(self, data: bytes) -> bytes:
+        """
+        Compresses part of the body, flushed so the client can decode it
+        right away.
+        """
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def last(self, data: bytes) -> bytes:
+        """
+        Compresses the end of the body and closes the stream.
+        """
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON, NDJSON and text responses with the best coding the
+    client accepts, brotli when the optional ``brotli`` package is
+    installed, otherwise gzip.
+
+    Bodies sent in one message are only compressed from ``minimum_size``
+    bytes, below which compression costs more CPU than it saves on the
+    wire. Streamed bodies are always compressed, each chunk flushed so the
+    stream is not delayed. Strong ETags of compressed responses are made
+    weak, as the bytes differ from the identity ones, so ``If-None-Match``
+    still matches them.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        """
+        Parameters
+        ----------
+        app : ASGIApp
+            The application whose responses are compressed.
+        minimum_size : int, optional
+            Smallest body compressed, in bytes (default: 1024).
+        gzip_level : int, optional
+            zlib compression level from 1 to 9 (default: 6).
+        brotli_quality : int, optional
+            brotli quality from 0 to 11, the default 4 compressing better
+            than gzip at a similar speed (default: 4).
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            Headers(scope=scope).get('accept-encoding', '')
+        )
+        start: Optional[Message] = None
+        encoder: Optional[Encoder] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if start is not None:
+                headers = MutableHeaders(raw=start['headers'])
+                encoder = self._negotiate(headers, encoding, body, more_body)
+            if encoder is not None:
+                body = encoder.chunk(body) if more_body else encoder.last(body)
+                message = {**message, 'body': body}
+            if start is not None:
+                if encoder is not None and more_body:
+                    if 'content-length' in headers:
+                        del headers['content-length']
+                elif encoder is not None:
+                    headers['Content-Length'] = str(len(body))
+                await send(start)
+                start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _negotiate(
+        self,
+        headers: MutableHeaders,
+        encoding: Optional[str],
+        body: bytes,
+        more_body: bool,
+    ) -> Optional[Encoder]:
+        """
+        Returns the encoder of a response body, updating its ``headers``,
+        or None to send it as is.
+        """
+        if 'content-encoding' in headers or not headers.get(
+            'content-type', ''
+        ).startswith(COMPRESSIBLE_TYPES):
+            return None
+        if not more_body and len(body) < self.minimum_size:
+            return None
+
+        headers.add_vary_header('Accept-Encoding')
+        if encoding is None:
+            return None
+        headers['Content-Encoding'] = encoding
+        etag = headers.get('etag')
+        if etag is not None and etag.startswith('"'):
+            headers['ETag'] = f'W/{etag}'
+        return Encoder(encoding, self.gzip_level, self.brotli_quality)
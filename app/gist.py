@@ -0,0 +1,524 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timezone
+from functools import cached_property, partial
+from http import HTTPStatus
+from typing import NamedTuple, Optional, Union
+
+import httpx
+import requests
+from github import GithubException
+from requests.adapters import HTTPAdapter
+
+from app.openweathersdk.resilience import (
+    CircuitBreaker,
+    ResilientClient,
+    RetryPolicy,
+)
+from app.openweathersdk.tracing import traced
+
+IDEMPOTENT_METHODS = frozenset({'get', 'patch'})
+
+
+class IndexedGist(NamedTuple):
+    gist_id: str
+    url: str
+    content_hash: str
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class GistIndex:
+    """
+    A persistent SQLite index of the gists published for each gist name.
+
+    It maps every ``gist_name`` to the id, URL and content hash of its gist,
+    so republishing identical content needs no GitHub call and new content
+    updates the existing gist instead of creating another one.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            Location of the SQLite database (default: ``':memory:'``, the
+            index is kept in memory and lost on exit).
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS gists ('
+                ' gist_name TEXT PRIMARY KEY,'
+                ' gist_id TEXT NOT NULL,'
+                ' url TEXT NOT NULL,'
+                ' content_hash TEXT NOT NULL)'
+            )
+
+    def get(self, gist_name: str) -> Optional[IndexedGist]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT gist_id, url, content_hash FROM gists'
+                ' WHERE gist_name = ?',
+                (gist_name,),
+            ).fetchone()
+        return IndexedGist(*row) if row else None
+
+    def set(self, gist_name: str, gist: IndexedGist) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO gists VALUES (?, ?, ?, ?)',
+                (gist_name, *gist),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class BaseGistClient(ResilientClient, ABC):
+    """
+    Shared configuration and request building of the GitHub gist clients.
+
+    A client is built once per process with its token and keeps a pooled
+    keep-alive session to the GitHub REST API, instead of setting up a new
+    ``Github`` object and fetching the user on every gist. With a
+    ``GistIndex``, ``publish`` deduplicates gists by name and content.
+    Connection errors and 5xx answers go through the optional retry policy
+    and circuit breaker. Only the idempotent GET and PATCH calls are simply
+    retried: a failed create may have created the gist anyway, so the gists
+    of the user changed since are fetched and compared by content before
+    the POST is sent again.
+    """
+
+    upstream = 'github'
+    transport_errors: tuple = ()
+
+    def __init__(  # noqa: PLR0913
+        self,
+        token: str,
+        *,
+        base_url: str = 'https://api.github.com/',
+        pool_size: int = 10,
+        timeout: Union[float, tuple[float, float]] = (3.05, 10),
+        index: Optional[GistIndex] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        tracer=None,
+    ):
+        """
+        Parameters
+        ----------
+        token : str
+            The GitHub token used to create gists.
+        base_url : str, optional
+            The base URL of the GitHub REST API
+            (default: https://api.github.com/).
+        pool_size : int, optional
+            Maximum number of keep-alive connections kept in the pool
+            (default: 10).
+        timeout : float or tuple[float, float], optional
+            Connect and read timeouts in seconds (default: (3.05, 10)).
+        index : GistIndex, optional
+            Index used by ``publish`` to reuse and update gists
+            (default: None, every publish creates a gist).
+        retry_policy : RetryPolicy, optional
+            Backoff used to retry connection errors, timeouts and 5xx
+            answers (default: None, a single attempt).
+        circuit_breaker : CircuitBreaker, optional
+            Breaker that fails calls fast with ``CircuitOpenError`` while
+            GitHub keeps failing (default: None).
+        tracer : Tracer, optional
+            Tracer of the spans of ``publish`` and of every attempt of its
+            requests, like ``app.tracing.Tracer`` (default: None).
+        """
+        self.index = index
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.statuses = Counter()
+        self.tracer = tracer
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+        self.headers = {
+            'Accept': 'application/vnd.github+json',
+            'Authorization': f'Bearer {token}',
+            'X-GitHub-Api-Version': '2022-11-28',
+        }
+        self.session = self._build_session(pool_size)
+
+    @abstractmethod
+    def _build_session(self, pool_size: int):
+        """
+        Returns the HTTP session of the client, keeping up to ``pool_size``
+        connections alive.
+        """
+
+    @staticmethod
+    def _gist_payload(
+        gist_name: str,
+        content: str,
+        public: bool = True,
+        description: str = 'Weather forecast message',
+    ) -> dict:
+        return {
+            'description': description,
+            'public': public,
+            'files': {gist_name: {'content': content}},
+        }
+
+    def _create_failed(self, err: Exception) -> bool:
+        """
+        Whether a create failed in a way worth looking up and retrying.
+        """
+        if isinstance(err, GithubException):
+            return RetryPolicy.is_transient_status(err.status)
+        return isinstance(err, self.transport_errors)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    @staticmethod
+    def _candidates(gists: list[dict], payload: dict) -> list[str]:
+        """
+        Returns the ids of the gists of a listing that a create of
+        ``payload`` may have made, those with its description and a file of
+        the same name and size. The listing has no file contents, so each
+        still has to be fetched and compared with ``_same_content``.
+        """
+        ((gist_name, file),) = payload['files'].items()
+        size = len(file['content'].encode())
+        return [
+            gist['id']
+            for gist in gists
+            if gist.get('description') == payload['description']
+            and gist.get('files', {}).get(gist_name, {}).get('size') == size
+        ]
+
+    @staticmethod
+    def _same_content(gist: dict, payload: dict) -> bool:
+        """
+        Whether the file of a fetched ``gist`` holds the content of
+        ``payload``.
+        """
+        ((gist_name, file),) = payload['files'].items()
+        created = gist.get('files', {}).get(gist_name, {})
+        return (
+            'content' in created
+            and not created.get('truncated')
+            and content_hash(created['content'])
+            == content_hash(file['content'])
+        )
+
+    def _indexed(self, gist_name: str, content: str):
+        """
+        Returns the indexed gist of ``gist_name`` and the hash of content.
+        """
+        if self.index is None:
+            return None, None
+        return self.index.get(gist_name), content_hash(content)
+
+    def _index(self, gist_name: str, data: dict, digest: str) -> str:
+        if self.index is not None:
+            self.index.set(
+                gist_name, IndexedGist(data['id'], data['html_url'], digest)
+            )
+        return data['html_url']
+
+    @staticmethod
+    def _raise_for_status(response) -> None:
+        if response.status_code >= HTTPStatus.BAD_REQUEST:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {'message': response.text}
+            raise GithubException(
+                response.status_code, data, dict(response.headers)
+            )
+
+
+class GistClient(BaseGistClient):
+    """
+    A thread-safe client for the GitHub gist API over a pooled
+    ``requests.Session``.
+
+    Methods
+    -------
+    user
+        The login of the authenticated user, fetched once.
+
+    create_gist(gist_name, content, public=True, description=...)
+        Creates a gist and returns its URL.
+
+    edit_gist(gist_id, gist_name, content)
+        Replaces the content of a gist file and returns its URL.
+
+    publish(gist_name, content)
+        Creates, updates or reuses the gist of ``gist_name``.
+
+    close()
+        Closes the pooled HTTP session.
+    """
+
+    transport_errors = (requests.ConnectionError, requests.Timeout)
+
+    def _build_session(self, pool_size: int) -> requests.Session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    @cached_property
+    def user(self) -> str:
+        return self._request('get', 'user')['login']
+
+    def create_gist(self, gist_name: str, content: str, **kwargs) -> str:
+        """
+        Creates a gist with a single file.
+
+        Parameters
+        ----------
+        gist_name : str
+            The file name of the gist.
+        content : str
+            The content of the file.
+        public : bool, optional
+            Whether the gist is public (default: True).
+        description : str, optional
+            The description of the gist.
+
+        Returns
+        -------
+        str
+            The html URL of the new gist.
+        """
+        return self._create(gist_name, content, **kwargs)['html_url']
+
+    def edit_gist(self, gist_id: str, gist_name: str, content: str) -> str:
+        """
+        Replaces the content of the file ``gist_name`` of a gist.
+
+        Returns
+        -------
+        str
+            The html URL of the gist.
+        """
+        return self._edit(gist_id, gist_name, content)['html_url']
+
+    @traced('github.publish')
+    def publish(self, gist_name: str, content: str) -> str:
+        """
+        Publishes content under ``gist_name`` through the index.
+
+        Identical content returns the indexed URL without calling GitHub,
+        new content for an indexed name edits that gist and an unknown name
+        creates a gist. Without an index it is the same as ``create_gist``.
+
+        Returns
+        -------
+        str
+            The html URL of the gist.
+        """
+        indexed, digest = self._indexed(gist_name, content)
+        if indexed is not None and indexed.content_hash == digest:
+            return indexed.url
+
+        if indexed is not None:
+            try:
+                data = self._edit(indexed.gist_id, gist_name, content)
+                return self._index(gist_name, data, digest)
+            except GithubException as err:
+                if err.status != HTTPStatus.NOT_FOUND:
+                    raise
+
+        data = self._create(gist_name, content)
+        return self._index(gist_name, data, digest)
+
+    def _create(self, gist_name: str, content: str, **kwargs) -> dict:
+        payload = self._gist_payload(gist_name, content, **kwargs)
+        since = self._now()
+        delays = self._retry_delays()
+        while True:
+            try:
+                return self._request('post', 'gists', json=payload)
+            except Exception as err:
+                delay = next(delays, None)
+                if delay is None or not self._create_failed(err):
+                    raise
+            time.sleep(delay)
+            created = self._find_created(payload, since)
+            if created is not None:
+                return created
+
+    def _find_created(self, payload: dict, since: str) -> Optional[dict]:
+        """
+        Returns the gist a failed create of ``payload`` made anyway, looked
+        up among the gists changed ``since``, or None.
+        """
+        gists = self._request('get', 'gists', params={'since': since})
+        for gist_id in self._candidates(gists, payload):
+            gist = self._request('get', f'gists/{gist_id}')
+            if self._same_content(gist, payload):
+                return gist
+        return None
+
+    def _edit(self, gist_id: str, gist_name: str, content: str) -> dict:
+        return self._request(
+            'patch',
+            f'gists/{gist_id}',
+            json={'files': {gist_name: {'content': content}}},
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        response = self._call_upstream(
+            partial(
+                getattr(self.session, method),
+                f'{self.base_url}{path}',
+                timeout=self.timeout,
+                **kwargs,
+            ),
+            self.transport_errors,
+            retry=method in IDEMPOTENT_METHODS,
+            method=method.upper(),
+            url=f'{self.base_url}{path}',
+        )
+        self._raise_for_status(response)
+        return response.json()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncGistClient(BaseGistClient):
+    """
+    An asyncio client for the GitHub gist API over a pooled
+    ``httpx.AsyncClient``. See ``GistClient``.
+    """
+
+    transport_errors = (httpx.TransportError,)
+
+    def _build_session(self, pool_size: int) -> httpx.AsyncClient:
+        if isinstance(self.timeout, tuple):
+            connect, read = self.timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(self.timeout)
+
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+
+    async def get_user(self) -> str:
+        """
+        Returns the login of the authenticated user, fetched once.
+        """
+        if not hasattr(self, '_user'):
+            self._user = (await self._request('get', 'user'))['login']
+        return self._user
+
+    async def create_gist(self, gist_name: str, content: str, **kwargs) -> str:
+        """
+        Creates a gist with a single file. See ``GistClient.create_gist``.
+        """
+        return (await self._create(gist_name, content, **kwargs))['html_url']
+
+    async def edit_gist(
+        self, gist_id: str, gist_name: str, content: str
+    ) -> str:
+        """
+        Replaces the content of a gist file. See ``GistClient.edit_gist``.
+        """
+        return (await self._edit(gist_id, gist_name, content))['html_url']
+
+    @traced('github.publish')
+    async def publish(self, gist_name: str, content: str) -> str:
+        """
+        Publishes content under ``gist_name`` through the index, queried
+        in a worker thread. See ``GistClient.publish``.
+        """
+        indexed, digest = await asyncio.to_thread(
+            self._indexed, gist_name, content
+        )
+        if indexed is not None and indexed.content_hash == digest:
+            return indexed.url
+
+        if indexed is not None:
+            try:
+                data = await self._edit(indexed.gist_id, gist_name, content)
+                return await asyncio.to_thread(
+                    self._index, gist_name, data, digest
+                )
+            except GithubException as err:
+                if err.status != HTTPStatus.NOT_FOUND:
+                    raise
+
+        data = await self._create(gist_name, content)
+        return await asyncio.to_thread(self._index, gist_name, data, digest)
+
+    async def _create(self, gist_name: str, content: str, **kwargs) -> dict:
+        payload = self._gist_payload(gist_name, content, **kwargs)
+        since = self._now()
+        delays = self._retry_delays()
+        while True:
+            try:
+                return await self._request('post', 'gists', json=payload)
+            except Exception as err:
+                delay = next(delays, None)
+                if delay is None or not self._create_failed(err):
+                    raise
+            await asyncio.sleep(delay)
+            created = await self._find_created(payload, since)
+            if created is not None:
+                return created
+
+    async def _find_created(self, payload: dict, since: str) -> Optional[dict]:
+        """
+        Coroutine version of ``GistClient._find_created``.
+        """
+        gists = await self._request('get', 'gists', params={'since': since})
+        for gist_id in self._candidates(gists, payload):
+            gist = await self._request('get', f'gists/{gist_id}')
+            if self._same_content(gist, payload):
+                return gist
+        return None
+
+    async def _edit(self, gist_id: str, gist_name: str, content: str) -> dict:
+        return await self._request(
+            'patch',
+            f'gists/{gist_id}',
+            json={'files': {gist_name: {'content': content}}},
+        )
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        response = await self._acall_upstream(
+            partial(
+                getattr(self.session, method),
+                f'{self.base_url}{path}',
+                **kwargs,
+            ),
+            self.transport_errors,
+            retry=method in IDEMPOTENT_METHODS,
+            method=method.upper(),
+            url=f'{self.base_url}{path}',
+        )
+        self._raise_for_status(response)
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self.session.aclose()
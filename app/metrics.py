@@ -0,0 +1,416 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MetricFamily(NamedTuple):
+    """
+    The samples of one metric at scrape time, each a name suffix, a tuple
+    of label pairs and a value.
+    """
+
+    name: str
+    type: str
+    documentation: str
+    samples: list[tuple[str, tuple, float]]
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    """
+    Formats metric families in the Prometheus text exposition format.
+    """
+    lines = []
+    for family in families:
+        lines.append(f'# HELP {family.name} {family.documentation}')
+        lines.append(f'# TYPE {family.name} {family.type}')
+        for suffix, labels, value in family.samples:
+            name = family.name + suffix
+            if labels:
+                pairs = ','.join(
+                    f'{key}="{_escape(label)}"' for key, label in labels
+                )
+                name += '{' + pairs + '}'
+            lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class _Metric(ABC):
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    @abstractmethod
+    def _child(self):
+        """
+        Returns a new child holding the value of one label combination.
+        """
+
+    def labels(self, *values):
+        """
+        Returns the child of one combination of label values, created on
+        first use and cached, so hot paths should keep it.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(
+                    f'{self.name} expects labels {self.labelnames}'
+                )
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def collect(self) -> MetricFamily:
+        samples = []
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, map(str, values)))
+            samples.extend(child.samples(labels))
+        return MetricFamily(self.name, self.type, self.documentation, samples)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self, labels: tuple) -> list:
+        return [('', labels, self.value)]
+
+
+class _GaugeValue(_Value):
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, labels: tuple) -> list:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            bucket = labels + (('le', _format_value(bound)),)
+            samples.append(('_bucket', bucket, cumulative))
+        samples.append(('_sum', labels, total))
+        samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+
+    type = 'counter'
+
+    _child = _Value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, optionally split by labels.
+    """
+
+    type = 'gauge'
+
+    _child = _GaugeValue
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    """
+    Counts of observed values in cumulative ``le`` buckets, with their sum
+    and count, optionally split by labels.
+
+    Observing a value is a binary search of the bounds and two additions
+    under a lock, well under a microsecond.
+    """
+
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+
+class Registry:
+    """
+    The metrics exposed by ``/metrics``.
+
+    Metrics updated as requests run are registered once, and collectors
+    are called at scrape time to turn counters the app already keeps, like
+    the ``stats`` of caches and rate limiters, into metric families, so
+    they cost nothing between scrapes.
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(
+        self, collector: Callable[[], Iterable[MetricFamily]]
+    ) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> list[MetricFamily]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in list(self._collectors):
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+REGISTRY = Registry()
+STAGE_DURATION = REGISTRY.register(
+    Histogram(
+        'stage_duration_seconds',
+        'Time spent in each stage of a request.',
+        ('stage',),
+    )
+)
+REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        'http_request_duration_seconds',
+        'Time to answer HTTP requests, by route and status code.',
+        ('method', 'route', 'code'),
+    )
+)
+IN_FLIGHT = REGISTRY.register(
+    Gauge('http_requests_in_flight', 'HTTP requests being answered.')
+)
+LOOP_LAG = REGISTRY.register(
+    Histogram(
+        'event_loop_lag_seconds',
+        'Delay of the event loop in running a callback due now.',
+    )
+)
+
+_timings: ContextVar[Optional[dict]] = ContextVar('timings', default=None)
+
+
+class stage:
+    """
+    Times a block as a named stage of the current request, recording it in
+    ``stage_duration_seconds`` and in the request's ``Server-Timing``
+    header. Stages repeated in one request are added up.
+
+    Usable as ``with stage('parse'):``, also from tasks and threads that
+    inherited the request's context.
+    """
+
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> 'stage':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self._start
+        STAGE_DURATION.labels(self.name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+
+
+def server_timing(timings: dict, total: Optional[float] = None) -> str:
+    """
+    Formats stage durations in seconds as a ``Server-Timing`` header.
+    """
+    header = ''
+    for name, seconds in timings.items():
+        header += f'{name};dur={seconds * 1000:.3f}, '
+    if total is not None:
+        return header + f'total;dur={total * 1000:.3f}'
+    return header[:-2]
+
+
+class MetricsMiddleware:
+    """
+    Times HTTP requests by route template and status code, tracks those in
+    flight and adds the stages timed with ``stage`` while the response was
+    prepared as a ``Server-Timing`` header.
+
+    Stages that run after the response started, like the body of a
+    streaming response, are only recorded in the histograms. The whole
+    instrumentation of a request takes a few microseconds, see
+    ``benchmarks/bench_metrics.py``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._in_flight = IN_FLIGHT.labels()
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: dict = {}
+        token = _timings.set(timings)
+        code = 500
+
+        async def send_timed(message: Message) -> None:
+            nonlocal code
+            if message['type'] == 'http.response.start':
+                code = message['status']
+                header = server_timing(timings, time.perf_counter() - start)
+                message['headers'] = [
+                    *message.get('headers', ()),
+                    (b'server-timing', header.encode('latin-1')),
+                ]
+            await send(message)
+
+        self._in_flight.inc()
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            self._in_flight.dec()
+            _timings.reset(token)
+            route = scope.get('route')
+            REQUEST_DURATION.labels(
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                code,
+            ).observe(time.perf_counter() - start)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a callback scheduled every
+    ``interval`` seconds, into ``event_loop_lag_seconds``.
+
+    A loop busy with CPU work or blocking calls runs callbacks late, which
+    delays every request it serves, so the lag is the saturation of the
+    event loop.
+    """
+
+    def __init__(self, interval: float = 0.5, histogram=LOOP_LAG):
+        self.interval = interval
+        self.histogram = histogram
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.histogram.observe(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        """
+        Runs the monitor as a task of the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,418 @@
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+from app.openweathersdk.spatial import GridIndex
+
+FORECAST_STEP = 3 * 60 * 60
+
+
+class ForecastKey(NamedTuple):
+    latitude: float
+    longitude: float
+    units: str
+    lang: str
+
+
+class ForecastVersion(NamedTuple):
+    key: ForecastKey
+    stored_at: float
+    expires_at: float
+
+
+class _Entry(NamedTuple):
+    value: object
+    size: int
+    expires_at: float
+    stored_at: float
+
+
+class ForecastCache:
+    """
+    An in-process TTL + LRU cache for weather forecasts.
+
+    Entries are keyed by the coordinates rounded to ``precision`` decimal
+    places plus ``units`` and ``lang``, so requests for nearly the same
+    location share one entry. The cache is bounded both by number of entries
+    and by the total size in bytes of the upstream payloads, evicting the
+    least recently used entries first. Every entry expires at the ``dt`` of
+    the next 3-hour step of its forecast, when OpenWeather publishes new
+    data.
+
+    With a ``stale_ttl``, expired entries are kept for that many more
+    seconds, still bounded by the LRU limits, so ``get_stale`` can serve
+    the last good forecast while the API is down.
+
+    With a ``radius_km``, cached forecasts are also indexed on a spatial
+    grid by the ``city.coord`` of their response, and a lookup missing its
+    exact key is answered by the nearest fresh forecast within that radius
+    with the same units and language, absorbing GPS jitter and coordinates
+    from different geocoders.
+
+    Lookups are counted per key, so ``hot`` can tell a refresh-ahead
+    prefetcher which entries are worth refreshing before they expire.
+
+    All operations hold a lock for a few dict operations only, so one
+    instance can be shared by threads and by coroutines of an event loop.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that found no fresh entry.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        precision: int = 2,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        stale_ttl: float = 0,
+        radius_km: float = 0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Parameters
+        ----------
+        precision : int, optional
+            Decimal places kept from latitude and longitude in the key
+            (default: 2, roughly 1 km).
+        max_entries : int, optional
+            Maximum number of cached forecasts (default: 1024).
+        max_bytes : int, optional
+            Maximum total size of the cached payloads (default: 64 MiB).
+        stale_ttl : float, optional
+            Seconds an expired entry is kept for ``get_stale``
+            (default: 0, expired entries are dropped).
+        radius_km : float, optional
+            Distance within which a fresh cached forecast answers a lookup
+            for other coordinates (default: 0, exact keys only).
+        clock : Callable[[], float], optional
+            Source of the current epoch time (default: time.time).
+        """
+        self.precision = precision
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.radius_km = radius_km
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries: OrderedDict[ForecastKey, _Entry] = OrderedDict()
+        self._lookups: Counter[ForecastKey] = Counter()
+        self._grids: dict[tuple[str, str], GridIndex] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, latitude, longitude, units='metric', lang='pt_br'):
+        """
+        Builds the cache key of a forecast request.
+
+        Returns
+        -------
+        ForecastKey
+            The quantized coordinates with the units and language.
+        """
+        return ForecastKey(
+            round(float(latitude), self.precision),
+            round(float(longitude), self.precision),
+            units,
+            lang,
+        )
+
+    def expires_at(self, forecast) -> float:
+        """
+        Returns the epoch time at which a forecast stops being fresh.
+
+        That is the ``dt`` of the first 3-hour step still in the future, or
+        one step from now when the forecast has none.
+        """
+        now = self.clock()
+        for item in forecast.list:
+            if item.dt > now:
+                return item.dt
+        return now + FORECAST_STEP
+
+    def get(self, key: ForecastKey):
+        """
+        Returns the fresh forecast cached under ``key``, or None.
+        """
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                if not self._keep_stale(entry):
+                    self._remove(key)
+                entry = None
+            if entry is None and self.radius_km:
+                key, entry = self._nearby(key, now)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._lookups[key] += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def _nearby(self, key: ForecastKey, now: float):
+        grid = self._grids.get((key.units, key.lang))
+        if grid is not None:
+            for _, near_key in grid.within(
+                key.latitude, key.longitude, self.radius_km
+            ):
+                entry = self._entries[near_key]
+                if entry.expires_at > now:
+                    return near_key, entry
+        return key, None
+
+    def version(self, key: ForecastKey) -> Optional[ForecastVersion]:
+        """
+        Returns which fresh entry ``get`` would answer ``key`` with, when it
+        was stored and when it expires, or None, without reading it.
+
+        Meant for validating HTTP caches, so lookups here count towards
+        ``hot`` but not as hits or misses.
+        """
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if not self.radius_km:
+                    return None
+                key, entry = self._nearby(key, now)
+                if entry is None:
+                    return None
+            self._lookups[key] += 1
+            return ForecastVersion(key, entry.stored_at, entry.expires_at)
+
+    def get_stale(self, key: ForecastKey):
+        """
+        Returns the forecast cached under ``key``, fresh or expired less than
+        ``stale_ttl`` seconds ago, and its age in seconds, or None.
+
+        Lookups here do not count as hits or misses.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self.clock() and not self._keep_stale(
+                entry
+            ):
+                self._remove(key)
+                return None
+            return entry.value, max(0.0, self.clock() - entry.stored_at)
+
+    def set(self, key: ForecastKey, forecast, size: int = 0) -> None:
+        """
+        Stores a forecast, evicting least recently used entries if needed.
+
+        Parameters
+        ----------
+        key : ForecastKey
+            The key built by ``key``.
+        forecast : WeatherForecast
+            The forecast to cache.
+        size : int, optional
+            Size in bytes accounted for the entry, usually the length of the
+            upstream response body (default: 0).
+        """
+        if size > self.max_bytes:
+            return
+
+        entry = _Entry(forecast, size, self.expires_at(forecast), self.clock())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, forget=False)
+            self._entries[key] = entry
+            self._lookups.setdefault(key, 1)
+            self.size += size
+            if self.radius_km:
+                self._grid(key).insert(
+                    key, forecast.city.coord.lat, forecast.city.coord.lon
+                )
+            while (
+                len(self._entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def hot(self, n: int) -> list[tuple[ForecastKey, float]]:
+        """
+        Returns the ``n`` cached keys looked up the most, with the epoch
+        time at which each expires.
+
+        A key starts at one lookup, the miss that stored it, and then only
+        lookups answered by its entry count. The count goes with the entry,
+        so the counter never outgrows the cache.
+        """
+        with self._lock:
+            return [
+                (key, self._entries[key].expires_at)
+                for key, _ in self._lookups.most_common()
+                if key in self._entries
+            ][:n]
+
+    def extend(self, key: ForecastKey, until: float) -> None:
+        """
+        Keeps the entry of ``key`` fresh at least until ``until``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < until:
+                self._entries[key] = entry._replace(expires_at=until)
+
+    def decay(self) -> None:
+        """
+        Halves the lookup counts, forgetting keys no longer cached, so
+        ``hot`` follows recent traffic.
+        """
+        with self._lock:
+            self._lookups = Counter({
+                key: count // 2
+                for key, count in self._lookups.items()
+                if count > 1 and key in self._entries
+            })
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._lookups.clear()
+            self._grids.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns
+        -------
+        dict
+            Hits, misses, hit ratio, number of entries and bytes in use.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self.size,
+        }
+
+    def _keep_stale(self, entry: _Entry) -> bool:
+        return entry.expires_at + self.stale_ttl > self.clock()
+
+    def _grid(self, key: ForecastKey) -> GridIndex:
+        grid = self._grids.get((key.units, key.lang))
+        if grid is None:
+            grid = self._grids[key.units, key.lang] = GridIndex(self.radius_km)
+        return grid
+
+    def _remove(self, key: ForecastKey, forget: bool = True) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        if forget:
+            self._lookups.pop(key, None)
+        if self.radius_km:
+            self._grid(key).remove(key)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a geocoding query for use as a cache key.
+
+    The text is trimmed, accents are stripped, case is folded and inner
+    whitespace is collapsed, so ``' São  Paulo, SP'`` and ``'sao paulo,sp'``
+    share one key.
+    """
+    decomposed = unicodedata.normalize('NFKD', query)
+    stripped = ''.join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).casefold()
+    return ','.join(' '.join(part.split()) for part in stripped.split(','))
+
+
+class GeocodingCache:
+    """
+    A persistent SQLite cache of direct geocoding results.
+
+    Results are stored as the JSON returned by the API under the normalized
+    query and the requested limit. Empty results are cached as well, so
+    unknown cities do not hit the API again. The mapping from names to
+    coordinates is effectively static, so entries never expire.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            Location of the SQLite database, created if missing (default:
+            ``':memory:'``, the cache is kept in memory and lost on exit).
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocoding ('
+                ' query TEXT NOT NULL,'
+                ' lim INTEGER NOT NULL,'
+                ' locations TEXT NOT NULL,'
+                ' PRIMARY KEY (query, lim))'
+            )
+
+    def get(self, query: str, limit: int) -> Optional[list[dict]]:
+        """
+        Returns the cached locations for a query, or None on a miss.
+
+        Returns
+        -------
+        list[dict] or None
+            The locations as returned by the API, possibly empty.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT locations FROM geocoding WHERE query = ? AND lim = ?',
+                (normalize_query(query), limit),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, query: str, limit: int, locations: list[dict]) -> None:
+        """
+        Stores the locations returned by the API for a query.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO geocoding VALUES (?, ?, ?)',
+                (normalize_query(query), limit, json.dumps(locations)),
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
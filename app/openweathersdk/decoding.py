@@ -0,0 +1,39 @@
+import json
+from typing import Union
+
+from pydantic import TypeAdapter
+
+from app.openweathersdk.models import City, WeatherForecast
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_cities_adapter = TypeAdapter(list[City])
+
+
+def loads(raw: Union[bytes, str]):
+    """
+    Decodes a JSON document, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def decode_forecast(raw: Union[bytes, str]) -> WeatherForecast:
+    """
+    Validates a forecast straight from the raw response body.
+
+    pydantic parses the JSON in its core instead of building intermediate
+    dicts with the stdlib decoder first.
+    """
+    return WeatherForecast.model_validate_json(raw)
+
+
+def decode_cities(raw: Union[bytes, str]) -> list[City]:
+    """
+    Validates a direct geocoding response straight from its raw body.
+    """
+    return _cities_adapter.validate_json(raw)
@@ -0,0 +1,182 @@
+import bisect
+import threading
+import zlib
+from array import array
+from typing import Iterable, NamedTuple, Optional
+
+from app.openweathersdk.cache import normalize_query
+
+# names shorter than this are only indexed as a whole, their single
+# deletions being too common to narrow anything down
+MIN_DELETE_LENGTH = 4
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+class FuzzyMatch(NamedTuple):
+    name: str
+    similarity: float
+    population: int
+
+
+def trigrams(key: str) -> set[str]:
+    padded = f'  {key} '
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(first: str, second: str) -> float:
+    """
+    Returns the Jaccard similarity of the trigrams of two normalized names.
+    """
+    first_trigrams, second_trigrams = trigrams(first), trigrams(second)
+    shared = len(first_trigrams & second_trigrams)
+    return shared / (len(first_trigrams) + len(second_trigrams) - shared)
+
+
+def _variants(key: str) -> set[str]:
+    variants = {key}
+    if len(key) >= MIN_DELETE_LENGTH:
+        variants.update(key[:i] + key[i + 1 :] for i in range(len(key)))
+    return variants
+
+
+def _signature(variant: str) -> int:
+    return zlib.crc32(variant.encode()) << ID_BITS
+
+
+class FuzzyCityIndex:
+    """
+    An accent- and typo-tolerant index of city names.
+
+    Names are normalized like ``normalize_query``, so accents, case and
+    spacing never matter. Typos are found through a deletion neighbourhood:
+    every name is indexed under itself and each string left by deleting one
+    of its characters, and a query looks up the same variants of itself.
+    Two names meet when they are at most one substitution, insertion,
+    deletion or swap of adjacent characters apart, in a few lookups whatever
+    the size of the corpus. Candidates are then ranked by the trigram
+    similarity of their name to the query, then by population.
+
+    Variants are stored as the CRC-32 of the string next to the name id in
+    a sorted ``array``, 8 bytes each, searched with ``bisect``. Names added
+    one at a time after a bulk ``extend`` go to a small dict instead.
+
+    Methods
+    -------
+    from_gazetteer(gazetteer, **kwargs)
+        Builds an index of the names of a ``Gazetteer``.
+
+    add(name, population=0)
+        Adds a name, such as one returned by the geocoding API.
+
+    extend(names)
+        Adds many ``(name, population)`` pairs at once.
+
+    search(query, limit=5)
+        Returns the names closest to ``query``.
+
+    resolve(query)
+        Returns the best name for ``query``, or None.
+    """
+
+    def __init__(self, min_similarity: float = 0.4):
+        """
+        Parameters
+        ----------
+        min_similarity : float, optional
+            Lowest trigram similarity at which ``resolve`` accepts a name
+            (default: 0.4).
+        """
+        self.min_similarity = min_similarity
+        self.names: list[str] = []
+        self.populations = array('I')
+        self._ids: dict[str, int] = {}
+        self._table = array('Q')
+        self._recent: dict[int, list[int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_gazetteer(cls, gazetteer, **kwargs) -> 'FuzzyCityIndex':
+        index = cls(**kwargs)
+        index.extend(gazetteer.names())
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _new_ids(self, names: Iterable[tuple[str, int]]) -> list[int]:
+        new_ids = []
+        for name, population in names:
+            key = normalize_query(name)
+            known = self._ids.get(key)
+            if known is not None:
+                self.populations[known] = max(
+                    population, self.populations[known]
+                )
+                continue
+            self._ids[key] = len(self.names)
+            new_ids.append(len(self.names))
+            self.names.append(name)
+            self.populations.append(population)
+        return new_ids
+
+    def add(self, name: str, population: int = 0) -> None:
+        with self._lock:
+            for name_id in self._new_ids([(name, population)]):
+                for variant in _variants(normalize_query(name)):
+                    self._recent.setdefault(_signature(variant), []).append(
+                        name_id
+                    )
+
+    def extend(self, names: Iterable[tuple[str, int]]) -> None:
+        with self._lock:
+            entries = list(self._table)
+            for name_id in self._new_ids(names):
+                key = normalize_query(self.names[name_id])
+                entries.extend(
+                    _signature(variant) | name_id for variant in _variants(key)
+                )
+            entries.sort()
+            self._table = array('Q', entries)
+
+    def _candidates(self, key: str) -> set[int]:
+        table = self._table
+        candidates = set()
+        for variant in _variants(key):
+            signature = _signature(variant)
+            position = bisect.bisect_left(table, signature)
+            while (
+                position < len(table)
+                and table[position] >> ID_BITS == signature >> ID_BITS
+            ):
+                candidates.add(table[position] & ID_MASK)
+                position += 1
+            candidates.update(self._recent.get(signature, ()))
+        return candidates
+
+    def search(self, query: str, limit: int = 5) -> list[FuzzyMatch]:
+        """
+        Returns up to ``limit`` indexed names at most one edit away from
+        ``query``, the most similar and then most populous first.
+        """
+        key = normalize_query(query)
+        matches = []
+        for name_id in self._candidates(key):
+            name = self.names[name_id]
+            score = similarity(key, normalize_query(name))
+            matches.append(FuzzyMatch(name, score, self.populations[name_id]))
+        matches.sort(key=lambda match: (-match.similarity, -match.population))
+        return matches[:limit]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """
+        Returns the best match of ``query`` if it is at least
+        ``min_similarity`` similar, otherwise None.
+        """
+        key = normalize_query(query)
+        if key in self._ids:
+            return self.names[self._ids[key]]
+        matches = self.search(query, limit=1)
+        if matches and matches[0].similarity >= self.min_similarity:
+            return matches[0].name
+        return None
@@ -0,0 +1,309 @@
+import bisect
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Iterator, Optional
+
+from app.openweathersdk.cache import normalize_query
+from app.openweathersdk.models import City
+from app.openweathersdk.spatial import KDTree
+
+MAGIC = b'GAZ1'
+HEADER = struct.Struct('<4sI')
+# key offset and length, name offset and length, state offset and length,
+# country code, latitude, longitude and population
+RECORD = struct.Struct('<IHIHIH2sffI')
+KEY = struct.Struct('<IH')
+# one key out of every BLOCK is kept in memory to narrow binary searches
+BLOCK = 64
+
+
+def _open_text(path: str):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path), encoding='utf-8')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_cities(path: str) -> Iterator[dict]:
+    """
+    Reads a city list, either OpenWeather's ``city.list.json`` or a CSV
+    file with ``name``, ``state``, ``country``, ``lat`` and ``lon`` columns
+    and an optional ``population`` one. Both may be gzipped.
+
+    Yields
+    ------
+    dict
+        The name, state, country, lat, lon and population of each city.
+    """
+    with _open_text(path) as file:
+        if '.json' in os.path.basename(path):
+            for row in json.load(file):
+                yield {
+                    'name': row['name'],
+                    'state': row.get('state') or '',
+                    'country': row.get('country') or '',
+                    'lat': row['coord']['lat'],
+                    'lon': row['coord']['lon'],
+                    'population': row.get('population')
+                    or row.get('stat', {}).get('population', 0),
+                }
+            return
+
+        for row in csv.DictReader(file):
+            yield {
+                'name': row['name'],
+                'state': row.get('state') or '',
+                'country': row.get('country') or '',
+                'lat': float(row['lat']),
+                'lon': float(row['lon']),
+                'population': int(row.get('population') or 0),
+            }
+
+
+def build_index(source: str, path: str) -> int:
+    """
+    Writes the index of the city list ``source`` to ``path``.
+
+    The file holds a header, one fixed-size record per city sorted by the
+    normalized name, and a blob of the UTF-8 strings the records point to,
+    each distinct string stored once.
+
+    Returns
+    -------
+    int
+        The number of cities indexed.
+    """
+    cities = sorted(
+        (
+            (normalize_query(city['name']).encode(), city)
+            for city in read_cities(source)
+        ),
+        key=lambda pair: pair[0],
+    )
+    strings = bytearray()
+    offsets: dict[bytes, int] = {}
+
+    def intern(value: bytes) -> tuple[int, int]:
+        if value not in offsets:
+            offsets[value] = len(strings)
+            strings.extend(value)
+        return offsets[value], len(value)
+
+    records = bytearray()
+    for key, city in cities:
+        records.extend(
+            RECORD.pack(
+                *intern(key),
+                *intern(city['name'].encode()),
+                *intern(city['state'].encode()),
+                city['country'].encode()[:2],
+                city['lat'],
+                city['lon'],
+                city['population'],
+            )
+        )
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(cities)))
+        file.write(records)
+        file.write(strings)
+    os.replace(tmp_path, path)
+    return len(cities)
+
+
+class Gazetteer:
+    """
+    An offline, memory-mapped index of a city list for direct geocoding.
+
+    The index built by ``build_index`` is mapped read-only, so it is loaded
+    lazily by the OS, takes no Python heap beyond what lookups touch and is
+    shared by every process of the app. Lookups binary search the records,
+    sorted by name normalized like ``normalize_query``, for the name or a
+    prefix of it, then filter by state and country. One key out of every
+    ``BLOCK`` is kept in memory, so the search runs in C down to a single
+    block of records. Lookups take a few microseconds and never touch the
+    network.
+
+    Methods
+    -------
+    load(source, path=None)
+        Opens the index of a city list, building it first if needed.
+
+    lookup(name, state=None, country=None, limit=5)
+        Returns the cities named ``name``.
+
+    search(prefix, state=None, country=None, limit=5)
+        Returns the cities whose name starts with ``prefix``.
+
+    nearest(lat, lon, limit=5)
+        Returns the cities nearest to a point.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Location of an index written by ``build_index``.
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a gazetteer index')
+        self._strings = HEADER.size + self.count * RECORD.size
+        self._sample = [
+            self._key(index) for index in range(0, self.count, BLOCK)
+        ]
+        self._tree: Optional[KDTree] = None
+        self._tree_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, source: str, path: Optional[str] = None) -> 'Gazetteer':
+        """
+        Opens the index of the city list ``source``, building it when it is
+        missing or older than the list.
+
+        Parameters
+        ----------
+        source : str
+            City list in ``city.list.json`` or CSV format.
+        path : str, optional
+            Location of the index (default: ``source`` plus ``.idx``).
+        """
+        path = path or f'{source}.idx'
+        if not os.path.exists(path) or (
+            os.path.getmtime(path) < os.path.getmtime(source)
+        ):
+            build_index(source, path)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _record(self, index: int) -> tuple:
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._strings + offset
+        return self._map[start : start + length]
+
+    def _key(self, index: int) -> bytes:
+        return self._string(
+            *KEY.unpack_from(self._map, HEADER.size + index * RECORD.size)
+        )
+
+    def _bisect(self, key: bytes) -> int:
+        block = bisect.bisect_left(self._sample, key)
+        low = max(0, (block - 1) * BLOCK)
+        high = min(self.count, block * BLOCK)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def city(self, index: int) -> City:
+        """
+        Returns the city stored at position ``index`` of the index.
+        """
+        return self._city(self._record(index))
+
+    def _city(self, record: tuple) -> City:
+        return City(
+            name=self._string(record[2], record[3]).decode(),
+            state=self._string(record[4], record[5]).decode(),
+            country=record[6].rstrip(b'\0').decode(),
+            lat=round(record[7], 6),
+            lon=round(record[8], 6),
+        )
+
+    def population(self, index: int) -> int:
+        return self._record(index)[9]
+
+    def names(self) -> Iterator[tuple[str, int]]:
+        """
+        Yields the name and population of every city, in index order.
+        """
+        for index in range(self.count):
+            record = self._record(index)
+            yield self._string(record[2], record[3]).decode(), record[9]
+
+    @property
+    def tree(self) -> KDTree:
+        """
+        The k-d tree of the city coordinates, built on first use, which
+        takes a couple of seconds for 200k cities.
+        """
+        with self._tree_lock:
+            if self._tree is None:
+                self._tree = KDTree(
+                    (record[7], record[8], index)
+                    for index, record in enumerate(
+                        RECORD.iter_unpack(
+                            self._map[HEADER.size : self._strings]
+                        )
+                    )
+                )
+            return self._tree
+
+    def nearest(self, lat: float, lon: float, limit=5) -> list[City]:
+        """
+        Returns up to ``limit`` cities nearest to ``(lat, lon)``, nearest
+        first.
+        """
+        return [
+            self.city(index) for _, index in self.tree.nearest(lat, lon, limit)
+        ]
+
+    def _find(self, key, exact, state, country, limit) -> list[City]:
+        state = normalize_query(state) if state else None
+        country = country.upper().encode().ljust(2, b'\0') if country else None
+        cities = []
+        index = self._bisect(key)
+        while index < self.count and len(cities) < limit:
+            record = self._record(index)
+            index += 1
+            candidate = self._string(record[0], record[1])
+            if not candidate.startswith(key) or (exact and candidate != key):
+                break
+            if country and record[6] != country:
+                continue
+            if state and state != normalize_query(
+                self._string(record[4], record[5]).decode()
+            ):
+                continue
+            cities.append(self._city(record))
+        return cities
+
+    def lookup(
+        self, name: str, state=None, country=None, limit=5
+    ) -> list[City]:
+        """
+        Returns up to ``limit`` cities named ``name``, ignoring accents,
+        case and extra whitespace, optionally in the given state and
+        country code.
+        """
+        key = normalize_query(name).encode()
+        return self._find(key, True, state, country, limit)
+
+    def search(
+        self, prefix: str, state=None, country=None, limit=5
+    ) -> list[City]:
+        """
+        Returns up to ``limit`` cities whose normalized name starts with
+        the normalized ``prefix``, in alphabetical order.
+        """
+        key = normalize_query(prefix).encode()
+        return self._find(key, False, state, country, limit)
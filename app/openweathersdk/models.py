@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from app.schemas import CityLocation
+
+
+class City(CityLocation):
+    pass
+
+
+class WeatherMain(BaseModel):
+    temp: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    pressure: int
+    sea_level: Optional[int]
+    grnd_level: Optional[int]
+    humidity: int
+    temp_kf: Optional[float]
+
+
+class WeatherDescription(BaseModel):
+    id: int
+    main: str
+    description: str
+    icon: str
+
+
+class Clouds(BaseModel):
+    all: int
+
+
+class Wind(BaseModel):
+    speed: float
+    deg: int
+    gust: Optional[float]
+
+
+class Sys(BaseModel):
+    pod: str
+
+
+class WeatherData(BaseModel):
+    dt: int
+    main: WeatherMain
+    weather: List[WeatherDescription]
+    clouds: Clouds
+    wind: Wind
+    visibility: int
+    pop: float
+    rain: Optional[Dict[str, float]] = None
+    sys: Sys
+    dt_txt: str
+
+
+class Coord(BaseModel):
+    lat: float
+    lon: float
+
+
+class WeatherForecastCityInfo(BaseModel):
+    id: int
+    name: str
+    coord: Coord
+    country: str
+    population: int
+    timezone: int
+    sunrise: int
+    sunset: int
+
+
+class WeatherForecast(BaseModel):
+    cod: str
+    message: Union[int, str]
+    cnt: int
+    list: List[WeatherData]
+    city: WeatherForecastCityInfo
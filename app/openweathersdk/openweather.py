@@ -1,88 +1,354 @@
+import asyncio
 import os
-from typing import Dict, List, Optional, Union
-
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import nullcontext
+from functools import partial
+from http import HTTPStatus
+from typing import Callable, ContextManager, Optional, Union
+
+import httpx
 import requests
-from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 
-from app.schemas import CityLocation
-
+from app.openweathersdk.cache import (
+    ForecastCache,
+    ForecastVersion,
+    GeocodingCache,
+    normalize_query,
+)
+from app.openweathersdk.decoding import decode_cities, decode_forecast, loads
+from app.openweathersdk.fuzzy import FuzzyCityIndex
+from app.openweathersdk.gazetteer import Gazetteer
+from app.openweathersdk.models import (  # noqa: F401
+    City,
+    Clouds,
+    Coord,
+    Sys,
+    WeatherData,
+    WeatherDescription,
+    WeatherForecast,
+    WeatherForecastCityInfo,
+    WeatherMain,
+    Wind,
+)
+from app.openweathersdk.ratelimit import (
+    BULK,
+    INTERACTIVE,
+    RateLimitedError,
+    RateLimiter,
+    parse_retry_after,
+)
+from app.openweathersdk.resilience import (
+    CircuitBreaker,
+    ResilientClient,
+    RetryPolicy,
+    UpstreamUnavailableError,
+)
+from app.openweathersdk.series import ForecastSeries
+from app.openweathersdk.singleflight import AsyncSingleFlight, SingleFlight
+from app.openweathersdk.tracing import traced
+
+
+class BaseOpenWeather(ResilientClient, ABC):
+    """
+    Shared configuration and request building of the OpenWeatherMap clients.
 
-class City(CityLocation):
-    pass
+    Subclasses provide the transport through ``_build_session`` and expose
+    ``get_city_location`` and ``get_weather_forecast`` on top of the
+    ``_city_location_request`` and ``_weather_forecast_request`` builders.
+    Concurrent calls with the same canonical parameters are coalesced into
+    a single upstream request through ``_single_flight_class``.
+    """
 
+    _single_flight_class = SingleFlight
+    upstream = 'openweather'
+
+    def __init__(  # noqa: PLR0913
+        self,
+        pool_size: int = 10,
+        *,
+        timeout: Union[float, tuple[float, float]] = (3.05, 10),
+        forecast_cache: Optional[ForecastCache] = None,
+        geocoding_cache: Optional[GeocodingCache] = None,
+        compact: bool = False,
+        rate_limiter: Optional[RateLimiter] = None,
+        rate_limit_retries: int = 2,
+        rate_limit_max_wait: float = 10.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        gazetteer: Optional[Gazetteer] = None,
+        fuzzy_index: Optional[FuzzyCityIndex] = None,
+        stage_timer: Optional[Callable[[str], ContextManager]] = None,
+        tracer=None,
+    ):
+        """
+        Initializes the client with the API token from env.
 
-class WeatherMain(BaseModel):
-    temp: float
-    feels_like: float
-    temp_min: float
-    temp_max: float
-    pressure: int
-    sea_level: Optional[int]
-    grnd_level: Optional[int]
-    humidity: int
-    temp_kf: Optional[float]
+        The client owns a single pooled HTTP session whose connections to the
+        API are kept alive between calls, so an instance is meant to be
+        created once and shared. The session is only configured here and
+        never mutated afterwards, which makes it safe to share between
+        concurrent callers.
 
+        Parameters
+        ----------
+        pool_size : int, optional
+            Maximum number of keep-alive connections kept in the pool
+            (default: 10).
+        timeout : float or tuple[float, float], optional
+            Connect and read timeouts in seconds, in the format accepted by
+            ``requests`` (default: (3.05, 10)).
+        forecast_cache : ForecastCache, optional
+            Cache consulted by ``get_weather_forecast`` before calling the
+            API (default: None, no caching).
+        geocoding_cache : GeocodingCache, optional
+            Persistent cache consulted by ``get_city_location`` before
+            calling the API (default: None, no caching).
+        compact : bool, optional
+            Return forecasts as array-backed ``ForecastSeries`` instead of
+            ``WeatherForecast`` models (default: False).
+        rate_limiter : RateLimiter, optional
+            Token bucket every upstream call waits on (default: None, no
+            limit).
+        rate_limit_retries : int, optional
+            How many times a call answered with 429 is retried after its
+            ``Retry-After`` delay (default: 2).
+        rate_limit_max_wait : float, optional
+            Longest ``Retry-After`` delay in seconds the client waits for,
+            a longer one raises ``RateLimitedError`` at once and leaves the
+            rate limiter untouched (default: 10.0).
+        retry_policy : RetryPolicy, optional
+            Backoff used to retry connection errors, timeouts and 5xx
+            answers (default: None, a single attempt).
+        circuit_breaker : CircuitBreaker, optional
+            Breaker that fails calls fast with ``CircuitOpenError`` while
+            the API keeps failing (default: None).
+        gazetteer : Gazetteer, optional
+            Offline city index answering ``get_city_location`` before the
+            caches and the API, which are only used when it has no match
+            (default: None).
+        fuzzy_index : FuzzyCityIndex, optional
+            Index resolving misspelled city names to known ones when
+            ``get_city_location`` finds no exact match, so variants of a
+            name share the cached locations of the canonical one. The names
+            returned by the API are added to it (default: None).
+        stage_timer : Callable[[str], ContextManager], optional
+            Called with the name of a stage of a forecast call, ``fetch``
+            for the upstream request and ``parse`` for decoding its answer,
+            returning a context manager that times it, like
+            ``app.metrics.stage`` (default: None).
+        tracer : Tracer, optional
+            Tracer of the spans of the public calls, of every attempt of
+            their upstream requests and of the parsing of forecasts, like
+            ``app.tracing.Tracer`` (default: None, no tracing).
 
-class WeatherDescription(BaseModel):
-    id: int
-    main: str
-    description: str
-    icon: str
+        Returns
+        -------
+        None
+        """
+        self.__token = os.getenv('OPENWEATHER_KEY')
+        self.__base_url = 'http://api.openweathermap.org/'
+        self.timeout = timeout
+        self.forecast_cache = forecast_cache
+        self.geocoding_cache = geocoding_cache
+        self.compact = compact
+        self.rate_limiter = rate_limiter
+        self.rate_limit_retries = rate_limit_retries
+        self.rate_limit_max_wait = rate_limit_max_wait
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.gazetteer = gazetteer
+        self.fuzzy_index = fuzzy_index
+        self.stage_timer = stage_timer
+        self.tracer = tracer
+        self.statuses = Counter()
+        self.session = self._build_session(pool_size)
+        self._flights = self._single_flight_class()
+
+    @abstractmethod
+    def _build_session(self, pool_size: int):
+        """
+        Returns the HTTP session of the client, keeping up to ``pool_size``
+        connections alive.
+        """
 
+    def _stage(self, name: str) -> ContextManager:
+        if self.stage_timer is None:
+            return nullcontext()
+        return self.stage_timer(name)
 
-class Clouds(BaseModel):
-    all: int
+    def _resolve_city_name(self, city: str) -> Optional[str]:
+        """
+        Returns the known name ``city`` is a misspelling of, or None.
+        """
+        if self.fuzzy_index is None:
+            return None
+        name = self.fuzzy_index.resolve(city)
+        if name is None or normalize_query(name) == normalize_query(city):
+            return None
+        return name
+
+    def _local_city_location(
+        self, city, state=None, country=None, limit=5
+    ) -> list[City]:
+        if self.gazetteer is None:
+            return []
+        return self.gazetteer.lookup(city, state, country, limit)
 
+    def _learn_cities(self, cities: list[City]) -> None:
+        if self.fuzzy_index is not None:
+            for city in cities:
+                self.fuzzy_index.add(city.name)
 
-class Wind(BaseModel):
-    speed: float
-    deg: int
-    gust: Optional[float]
+    def _city_location_request(
+        self, city, state=None, country=None, limit=5
+    ) -> tuple[str, dict]:
+        url = f'{self.__base_url}geo/1.0/direct'
 
+        params = {
+            'q': ','.join(filter(None, [city, state, country])),
+            'limit': limit,
+            'appid': self.__token,
+        }
+        return url, params
 
-class Sys(BaseModel):
-    pod: str
+    def _reverse_location_request(
+        self, latitude, longitude, limit=5
+    ) -> tuple[str, dict]:
+        url = f'{self.__base_url}geo/1.0/reverse'
 
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'limit': limit,
+            'appid': self.__token,
+        }
+        return url, params
 
-class WeatherData(BaseModel):
-    dt: int
-    main: WeatherMain
-    weather: List[WeatherDescription]
-    clouds: Clouds
-    wind: Wind
-    visibility: int
-    pop: float
-    rain: Optional[Dict[str, float]] = None
-    sys: Sys
-    dt_txt: str
+    def _weather_forecast_request(
+        self, latitude, longitude, units='metric', lang='pt_br'
+    ) -> tuple[str, dict]:
+        url = f'{self.__base_url}data/2.5/forecast'
 
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'units': units,
+            'lang': lang,
+            'appid': self.__token,
+        }
+        return url, params
+
+    def _cached_forecast_key(self, latitude, longitude, units, lang):
+        if self.forecast_cache is None:
+            return None
+        return self.forecast_cache.key(latitude, longitude, units, lang)
+
+    def _parse_forecast(
+        self, response
+    ) -> tuple[Union[WeatherForecast, ForecastSeries], int]:
+        if self.compact:
+            forecast_data = ForecastSeries.from_dict(loads(response.content))
+            return forecast_data, forecast_data.nbytes
+        return decode_forecast(response.content), len(response.content)
+
+    def _should_retry_rate_limited(self, response, attempt: int) -> bool:
+        return (
+            response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+            and attempt < self.rate_limit_retries
+        )
+
+    def _penalize(self, response) -> float:
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after > self.rate_limit_max_wait:
+            raise RateLimitedError(self.upstream, retry_after)
+        if self.rate_limiter is not None:
+            self.rate_limiter.penalize(retry_after)
+        return retry_after
+
+    def get_stale_forecast(
+        self, latitude, longitude, units='metric', lang='pt_br'
+    ) -> Optional[tuple[Union[WeatherForecast, ForecastSeries], float]]:
+        """
+        Returns the last forecast cached for a location even if it expired,
+        with its age in seconds, or None.
 
-class Coord(BaseModel):
-    lat: float
-    lon: float
+        Meant for serving stale data while the API is failing, see
+        ``ForecastCache.get_stale``.
+        """
+        cache_key = self._cached_forecast_key(latitude, longitude, units, lang)
+        if cache_key is None:
+            return None
+        return self.forecast_cache.get_stale(cache_key)
 
+    def get_forecast_version(
+        self, latitude, longitude, units='metric', lang='pt_br'
+    ) -> Optional[ForecastVersion]:
+        """
+        Returns the version of the fresh forecast cached for a location, or
+        None, without reading the forecast, see ``ForecastCache.version``.
+        """
+        cache_key = self._cached_forecast_key(latitude, longitude, units, lang)
+        if cache_key is None:
+            return None
+        return self.forecast_cache.version(cache_key)
+
+    @staticmethod
+    def _city_location_flight_key(params: dict) -> tuple:
+        return ('geo', normalize_query(params['q']), params['limit'])
+
+    @staticmethod
+    def _reverse_location_flight_key(params: dict) -> tuple:
+        return (
+            'reverse',
+            float(params['lat']),
+            float(params['lon']),
+            params['limit'],
+        )
+
+    @staticmethod
+    def _weather_forecast_flight_key(params: dict, cache_key) -> tuple:
+        if cache_key:
+            return ('forecast', *cache_key)
+        return (
+            'forecast',
+            float(params['lat']),
+            float(params['lon']),
+            params['units'],
+            params['lang'],
+        )
 
-class WeatherForecastCityInfo(BaseModel):
-    id: int
-    name: str
-    coord: Coord
-    country: str
-    population: int
-    timezone: int
-    sunrise: int
-    sunset: int
+    def get_temperature_scale(self, units: str) -> tuple[str, str]:
+        """
+        Returns the corresponding temperature scale and its symbol based on the
+        given units.
 
+        Parameters:
+        -----------
+        units : str
+            The units for temperature. It can be either 'metric', 'imperial', or
+            any other value.
 
-class WeatherForecast(BaseModel):
-    cod: str
-    message: Union[int, str]
-    cnt: int
-    list: List[WeatherData]
-    city: WeatherForecastCityInfo
+        Returns:
+        --------
+        tuple[str, str]
+            A tuple containing the temperature scale name and its symbol.
+            If the units are 'metric', it returns ('Celsius', '°C').
+            If the units are 'imperial', it returns ('Fahrenheit', '°F').
+            For any other value, it returns ('Kelvin', 'K').
+        """
+        if units == 'metric':
+            return ('Celsius', '°C')
+        elif units == 'imperial':
+            return ('Fahrenheit', '°F')
+        else:
+            return ('Kelvin', 'K')
 
 
-class OpenWeather:
+class OpenWeather(BaseOpenWeather):
     """
     A class used to interact with the OpenWeatherMap API.
 
@@ -92,11 +358,21 @@ class OpenWeather:
         The API token required for authentication.
     base_url : str
         The base URL of the OpenWeatherMap API.
+    session : requests.Session
+        The pooled HTTP session shared by every call of this client.
 
     Methods
     -------
-    __init__(token)
-        Initializes the OpenWeather class with the provided API token.
+    __init__(
+        pool_size=10, timeout=(3.05, 10), forecast_cache=None,
+        geocoding_cache=None, compact=False
+    )
+        Initializes the OpenWeather class with the API token from env, a
+        pooled keep-alive HTTP session and optional forecast and geocoding
+        caches.
+
+    close()
+        Closes the pooled HTTP session.
 
     get_city_location(city, state=None, country=None, limit=5)
         Retrieves the geographical coordinates of a city.
@@ -107,23 +383,72 @@ class OpenWeather:
         Retrieves the current weather forecast for a given location.
     """
 
-    def __init__(self):
+    def _build_session(self, pool_size: int) -> requests.Session:  # noqa: PLR6301
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=False,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        return session
+
+    def close(self) -> None:
         """
-        Initializes the OpenWeather class with the API token from env.
+        Closes the pooled HTTP session and its connections.
 
         Returns
         -------
         None
         """
-        self.__token = os.getenv('OPENWEATHER_KEY')
-        self.__base_url = 'http://api.openweathermap.org/'
-
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get(self, url, params, priority=INTERACTIVE) -> requests.Response:
+        return self._call_upstream(
+            partial(self._send, url, params, priority),
+            (requests.ConnectionError, requests.Timeout),
+            url=url,
+        )
+
+    def _send(self, url, params, priority) -> requests.Response:
+        for attempt in range(self.rate_limit_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(priority)
+            response = self.session.get(
+                url, params=params, timeout=self.timeout
+            )
+            if self._should_retry_rate_limited(response, attempt):
+                self._count_status(response.status_code)
+                retry_after = self._penalize(response)
+                if self.rate_limiter is None:
+                    time.sleep(retry_after)
+                continue
+            return response
+
+    @traced('openweather.get_city_location')
     def get_city_location(
-        self, city, state=None, country=None, limit=5
+        self, city, state=None, country=None, limit=5, priority=INTERACTIVE
     ) -> list[City]:
         """
         Retrieves the geographical coordinates of a city.
 
+        When neither the gazetteer, the geocoding cache nor the API know
+        the name and the client has a ``fuzzy_index``, the closest known
+        name is looked up instead, so typos and missing accents still find
+        the city without shadowing real names the index lacks.
+
         Parameters
         ----------
         city : str
@@ -134,6 +459,9 @@ class OpenWeather:
             The country code in ISO standard (default: None).
         limit : int, optional
             The maximum number of results to return (default: 5).
+        priority : int, optional
+            Queue priority of the upstream call when the client is rate
+            limited (default: INTERACTIVE).
 
         Returns
         -------
@@ -142,29 +470,138 @@ class OpenWeather:
         coordinates of a city named the same as the given param city.
 
         """
-        url = f'{self.__base_url}geo/1.0/direct'
+        if cities := self._local_city_location(city, state, country, limit):
+            return cities
+
+        cities = self._remote_city_location(
+            city, state, country, limit, priority
+        )
+        if not cities and (name := self._resolve_city_name(city)):
+            cities = self._local_city_location(name, state, country, limit)
+            if not cities:
+                cities = self._remote_city_location(
+                    name, state, country, limit, priority
+                )
+        return cities
+
+    def _remote_city_location(
+        self, city, state, country, limit, priority
+    ) -> list[City]:
+        url, params = self._city_location_request(city, state, country, limit)
+
+        if self.geocoding_cache is not None:
+            cached = self.geocoding_cache.get(params['q'], limit)
+            if cached is not None:
+                return [City(**location) for location in cached]
+
+        return self._flights.do(
+            self._city_location_flight_key(params),
+            self._fetch_city_location,
+            url,
+            params,
+            priority,
+        )
+
+    def _fetch_city_location(self, url, params, priority) -> list[City]:
+        try:
+            response = self._get(url, params, priority)
 
-        params = {
-            'q': ','.join(filter(None, [city, state, country])),
-            'limit': limit,
-            'appid': self.__token,
-        }
+            response.raise_for_status()
+            cities = decode_cities(response.content)
+
+        except UpstreamUnavailableError:
+            raise
+        except HTTPError as http_err:
+            raise HTTPError({'error': str(http_err)})
+        except Exception as err:
+            raise Exception({'error': str(err)})
+        else:
+            self._learn_cities(cities)
+            if self.geocoding_cache is not None:
+                self.geocoding_cache.set(
+                    params['q'],
+                    params['limit'],
+                    [city.model_dump() for city in cities],
+                )
+            return cities
+
+    @traced('openweather.get_nearest_cities')
+    def get_nearest_cities(
+        self, latitude, longitude, limit=5, priority=INTERACTIVE
+    ) -> list[City]:
+        """
+        Retrieves the cities nearest to a point, nearest first.
+
+        The client's ``gazetteer`` answers offline through its k-d tree.
+        Without one, the reverse geocoding API is called.
+
+        Parameters
+        ----------
+        latitude : float
+            The latitude of the point.
+        longitude : float
+            The longitude of the point.
+        limit : int, optional
+            The maximum number of cities to return (default: 5).
+        priority : int, optional
+            Queue priority of the upstream call when the client is rate
+            limited (default: INTERACTIVE).
+
+        Returns
+        -------
+        list[City]
+        """
+        if self.gazetteer is not None:
+            return self.gazetteer.nearest(latitude, longitude, limit)
+
+        url, params = self._reverse_location_request(
+            latitude, longitude, limit
+        )
+        return self._flights.do(
+            self._reverse_location_flight_key(params),
+            self._fetch_nearest_cities,
+            url,
+            params,
+            priority,
+        )
+
+    def get_nearest_cities_bulk(self, points, limit=5) -> list[list[City]]:
+        """
+        Retrieves the cities nearest to each ``(latitude, longitude)`` of
+        ``points``, in the same order, with ``BULK`` priority.
+        """
+        return [
+            self.get_nearest_cities(latitude, longitude, limit, BULK)
+            for latitude, longitude in points
+        ]
 
+    def _fetch_nearest_cities(self, url, params, priority) -> list[City]:
         try:
-            response = requests.get(url, params)
+            response = self._get(url, params, priority)
 
             response.raise_for_status()
-            data = response.json()
-            return [City(**location) for location in data]
+            cities = decode_cities(response.content)
+            self._learn_cities(cities)
+            return cities
 
+        except UpstreamUnavailableError:
+            raise
         except HTTPError as http_err:
             raise HTTPError({'error': str(http_err)})
         except Exception as err:
             raise Exception({'error': str(err)})
 
-    def get_weather_forecast(
-        self, latitude, longitude, units='metric', lang='pt_br'
-    ) -> WeatherForecast:
+    @traced('openweather.get_weather_forecast')
+    def get_weather_forecast(  # noqa: PLR0913
+        self,
+        latitude,
+        longitude,
+        units='metric',
+        lang='pt_br',
+        *,
+        priority=INTERACTIVE,
+        refresh=False,
+    ) -> Union[WeatherForecast, ForecastSeries]:
         """
         Retrieves the current weather forecast for a given location.
 
@@ -178,57 +615,348 @@ class OpenWeather:
             The units for temperature (default: metric).
         lang : str, optional
             The language for the api response. (default: pt_br)
+        priority : int, optional
+            Queue priority of the upstream call when the client is rate
+            limited (default: INTERACTIVE).
+        refresh : bool, optional
+            Skip the cache lookup and fetch a new forecast, replacing the
+            cached one (default: False).
 
         Returns
         -------
-        dict
-            A dictionary containing the current weather forecast.
+        WeatherForecast or ForecastSeries
+            The 5-day/3-hour forecast, as a ``ForecastSeries`` when the
+            client is ``compact``.
         """
-        url = f'{self.__base_url}data/2.5/forecast'
+        cache_key = self._cached_forecast_key(latitude, longitude, units, lang)
+        if (
+            cache_key
+            and not refresh
+            and (cached := self.forecast_cache.get(cache_key))
+        ):
+            return cached
+
+        url, params = self._weather_forecast_request(
+            latitude, longitude, units, lang
+        )
+
+        return self._flights.do(
+            self._weather_forecast_flight_key(params, cache_key),
+            self._fetch_weather_forecast,
+            url,
+            params,
+            cache_key,
+            priority,
+        )
+
+    def _fetch_weather_forecast(
+        self, url, params, cache_key, priority
+    ) -> Union[WeatherForecast, ForecastSeries]:
+        try:
+            forecast_data, size = self._load_forecast(url, params, priority)
 
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'units': units,
-            'lang': lang,
-            'appid': self.__token,
-        }
+        except UpstreamUnavailableError:
+            raise
+        except HTTPError as http_err:
+            raise HTTPError({'error': str(http_err)})
+        except Exception as err:
+            raise Exception({'error': str(err)})
+        else:
+            if cache_key:
+                self.forecast_cache.set(cache_key, forecast_data, size)
+            return forecast_data
+
+    def _load_forecast(
+        self, url, params, priority
+    ) -> tuple[Union[WeatherForecast, ForecastSeries], int]:
+        """
+        Requests and parses a forecast, timing each stage, and returns it
+        with its size in bytes.
+        """
+        with self._stage('fetch'):
+            response = self._get(url, params, priority)
+
+        response.raise_for_status()
+
+        with self._stage('parse'), self._span('openweather.parse'):
+            return self._parse_forecast(response)
+
+
+class AsyncOpenWeather(BaseOpenWeather):
+    """
+    An asyncio client for the OpenWeatherMap API.
+
+    It mirrors ``OpenWeather`` with coroutine methods running over a pooled
+    ``httpx.AsyncClient``, so waiting on the API does not hold a thread.
+    Errors are raised as the same ``requests`` exceptions used by
+    ``OpenWeather``. Identical concurrent calls are coalesced into one
+    upstream request per event loop.
+
+    Methods
+    -------
+    aclose()
+        Closes the pooled HTTP client.
+
+    get_city_location(city, state=None, country=None, limit=5)
+        Retrieves the geographical coordinates of a city.
+
+    get_weather_forecast(latitude, longitude, units='metric', lang='pt_br')
+        Retrieves the current weather forecast for a given location.
+    """
+
+    _single_flight_class = AsyncSingleFlight
+
+    def _build_session(self, pool_size: int) -> httpx.AsyncClient:
+        if isinstance(self.timeout, tuple):
+            connect, read = self.timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(self.timeout)
+
+        return httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+            headers={
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+            },
+        )
+
+    async def aclose(self) -> None:
+        """
+        Closes the pooled HTTP client and its connections.
+
+        Returns
+        -------
+        None
+        """
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _get(self, url, params, priority=INTERACTIVE) -> httpx.Response:
+        return await self._acall_upstream(
+            partial(self._send, url, params, priority),
+            (httpx.TransportError,),
+            url=url,
+        )
+
+    async def _send(self, url, params, priority) -> httpx.Response:
+        for attempt in range(self.rate_limit_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(priority)
+            response = await self.session.get(url, params=params)
+            if self._should_retry_rate_limited(response, attempt):
+                self._count_status(response.status_code)
+                retry_after = self._penalize(response)
+                if self.rate_limiter is None:
+                    await asyncio.sleep(retry_after)
+                continue
+            return response
+
+    @traced('openweather.get_city_location')
+    async def get_city_location(
+        self, city, state=None, country=None, limit=5, priority=INTERACTIVE
+    ) -> list[City]:
+        """
+        Retrieves the geographical coordinates of a city.
 
+        See ``OpenWeather.get_city_location``.
+        """
+        if cities := self._local_city_location(city, state, country, limit):
+            return cities
+
+        cities = await self._remote_city_location(
+            city, state, country, limit, priority
+        )
+        if not cities and (name := self._resolve_city_name(city)):
+            cities = self._local_city_location(name, state, country, limit)
+            if not cities:
+                cities = await self._remote_city_location(
+                    name, state, country, limit, priority
+                )
+        return cities
+
+    async def _remote_city_location(
+        self, city, state, country, limit, priority
+    ) -> list[City]:
+        url, params = self._city_location_request(city, state, country, limit)
+
+        if self.geocoding_cache is not None:
+            cached = await asyncio.to_thread(
+                self.geocoding_cache.get, params['q'], limit
+            )
+            if cached is not None:
+                return [City(**location) for location in cached]
+
+        return await self._flights.do(
+            self._city_location_flight_key(params),
+            self._fetch_city_location,
+            url,
+            params,
+            priority,
+        )
+
+    async def _fetch_city_location(self, url, params, priority) -> list[City]:
         try:
-            response = requests.get(url, params)
+            response = await self._get(url, params, priority)
 
             response.raise_for_status()
+            cities = decode_cities(response.content)
 
-            forecast_data = WeatherForecast(**response.json())
-            return forecast_data
-
-        except HTTPError as http_err:
+        except UpstreamUnavailableError:
+            raise
+        except httpx.HTTPStatusError as http_err:
             raise HTTPError({'error': str(http_err)})
         except Exception as err:
             raise Exception({'error': str(err)})
+        else:
+            self._learn_cities(cities)
+            if self.geocoding_cache is not None:
+                await asyncio.to_thread(
+                    self.geocoding_cache.set,
+                    params['q'],
+                    params['limit'],
+                    [city.model_dump() for city in cities],
+                )
+            return cities
+
+    @traced('openweather.get_nearest_cities')
+    async def get_nearest_cities(
+        self, latitude, longitude, limit=5, priority=INTERACTIVE
+    ) -> list[City]:
+        """
+        Retrieves the cities nearest to a point, nearest first.
 
-    def get_temperature_scale(self, units: str) -> tuple[str, str]:
+        See ``OpenWeather.get_nearest_cities``.
         """
-        Returns the corresponding temperature scale and its symbol based on the
-        given units.
+        if self.gazetteer is not None:
+            return self.gazetteer.nearest(latitude, longitude, limit)
+
+        url, params = self._reverse_location_request(
+            latitude, longitude, limit
+        )
+        return await self._flights.do(
+            self._reverse_location_flight_key(params),
+            self._fetch_nearest_cities,
+            url,
+            params,
+            priority,
+        )
+
+    async def get_nearest_cities_bulk(
+        self, points, limit=5
+    ) -> list[list[City]]:
+        """
+        Retrieves the cities nearest to each ``(latitude, longitude)`` of
+        ``points``, in the same order, with ``BULK`` priority.
 
-        Parameters:
-        -----------
-        units : str
-            The units for temperature. It can be either 'metric', 'imperial', or
-            any other value.
+        Offline lookups run in a worker thread so a large batch does not
+        stall the event loop, while upstream calls run concurrently.
+        """
+        if self.gazetteer is not None:
+            return await asyncio.to_thread(
+                lambda: [
+                    self.gazetteer.nearest(latitude, longitude, limit)
+                    for latitude, longitude in points
+                ]
+            )
+        return await asyncio.gather(
+            *(
+                self.get_nearest_cities(latitude, longitude, limit, BULK)
+                for latitude, longitude in points
+            )
+        )
+
+    async def _fetch_nearest_cities(self, url, params, priority) -> list[City]:
+        try:
+            response = await self._get(url, params, priority)
 
-        Returns:
-        --------
-        tuple[str, str]
-            A tuple containing the temperature scale name and its symbol.
-            If the units are 'metric', it returns ('Celsius', '°C').
-            If the units are 'imperial', it returns ('Fahrenheit', '°F').
-            For any other value, it returns ('Kelvin', 'K').
+            response.raise_for_status()
+            cities = decode_cities(response.content)
+            self._learn_cities(cities)
+            return cities
+
+        except UpstreamUnavailableError:
+            raise
+        except httpx.HTTPStatusError as http_err:
+            raise HTTPError({'error': str(http_err)})
+        except Exception as err:
+            raise Exception({'error': str(err)})
+
+    @traced('openweather.get_weather_forecast')
+    async def get_weather_forecast(  # noqa: PLR0913
+        self,
+        latitude,
+        longitude,
+        units='metric',
+        lang='pt_br',
+        *,
+        priority=INTERACTIVE,
+        refresh=False,
+    ) -> Union[WeatherForecast, ForecastSeries]:
         """
-        if units == 'metric':
-            return ('Celsius', '°C')
-        elif units == 'imperial':
-            return ('Fahrenheit', '°F')
+        Retrieves the current weather forecast for a given location.
+
+        See ``OpenWeather.get_weather_forecast``.
+        """
+        cache_key = self._cached_forecast_key(latitude, longitude, units, lang)
+        if (
+            cache_key
+            and not refresh
+            and (cached := self.forecast_cache.get(cache_key))
+        ):
+            return cached
+
+        url, params = self._weather_forecast_request(
+            latitude, longitude, units, lang
+        )
+
+        return await self._flights.do(
+            self._weather_forecast_flight_key(params, cache_key),
+            self._fetch_weather_forecast,
+            url,
+            params,
+            cache_key,
+            priority,
+        )
+
+    async def _fetch_weather_forecast(
+        self, url, params, cache_key, priority
+    ) -> Union[WeatherForecast, ForecastSeries]:
+        try:
+            forecast_data, size = await self._load_forecast(
+                url, params, priority
+            )
+
+        except UpstreamUnavailableError:
+            raise
+        except httpx.HTTPStatusError as http_err:
+            raise HTTPError({'error': str(http_err)})
+        except Exception as err:
+            raise Exception({'error': str(err)})
         else:
-            return ('Kelvin', 'K')
+            if cache_key:
+                self.forecast_cache.set(cache_key, forecast_data, size)
+            return forecast_data
+
+    async def _load_forecast(
+        self, url, params, priority
+    ) -> tuple[Union[WeatherForecast, ForecastSeries], int]:
+        """
+        Coroutine version of ``OpenWeather._load_forecast``.
+        """
+        with self._stage('fetch'):
+            response = await self._get(url, params, priority)
+
+        response.raise_for_status()
+
+        with self._stage('parse'), self._span('openweather.parse'):
+            return self._parse_forecast(response)
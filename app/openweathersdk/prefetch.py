@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+from app.openweathersdk.cache import ForecastKey
+from app.openweathersdk.ratelimit import PREFETCH, RateLimiter
+
+
+class ForecastPrefetcher:
+    """
+    Refreshes the hottest cached forecasts of an ``AsyncOpenWeather``
+    client as their 3-hour step ends, so hot locations never miss.
+
+    Every cached forecast expires at the next 3-hour step boundary. Shortly
+    before it, ``lead_time`` seconds ahead, the ``top_n`` keys looked up the
+    most that expire by then are held fresh a little past the boundary.
+    Right at the boundary, once OpenWeather serves the next step, they are
+    fetched again with ``refresh=True``, replacing the cached entries.
+
+    Refreshes take tokens from their own ``rate_limiter``, so they can
+    never use more than that budget, and queue on the client's limiter with
+    ``PREFETCH`` priority, behind interactive and bulk calls.
+
+    Attributes
+    ----------
+    refreshed : int
+        Number of forecasts refreshed.
+    failed : int
+        Number of refreshes that failed. Their previous forecast stays
+        cached until ``lead_time`` seconds past the boundary.
+    """
+
+    def __init__(
+        self,
+        client,
+        top_n: int = 20,
+        lead_time: float = 60.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Parameters
+        ----------
+        client : AsyncOpenWeather
+            The client whose ``forecast_cache`` is kept warm.
+        top_n : int, optional
+            Maximum number of keys refreshed per step (default: 20).
+        lead_time : float, optional
+            Seconds before the boundary at which hot entries are held
+            (default: 60.0).
+        rate_limiter : RateLimiter, optional
+            Budget of the refreshes (default: None, only the client's
+            limiter applies).
+        clock : Callable[[], float], optional
+            Source of the current epoch time (default: time.time).
+        """
+        self.client = client
+        self.cache = client.forecast_cache
+        self.top_n = top_n
+        self.lead_time = lead_time
+        self.rate_limiter = rate_limiter
+        self.clock = clock
+        self.refreshed = 0
+        self.failed = 0
+        self._last_boundary = float('-inf')
+        self._task: Optional[asyncio.Task] = None
+
+    def next_boundary(self) -> Optional[float]:
+        """
+        Returns the earliest upcoming expiry among the hot keys, or None.
+        """
+        after = max(self.clock(), self._last_boundary + self.lead_time)
+        upcoming = [
+            expires_at
+            for _, expires_at in self.cache.hot(self.top_n)
+            if expires_at > after
+        ]
+        return min(upcoming, default=None)
+
+    def hold(self, boundary: float) -> list[ForecastKey]:
+        """
+        Keeps the hot keys expiring by ``boundary`` fresh until
+        ``lead_time`` seconds past it and returns them.
+        """
+        now = self.clock()
+        keys = [
+            key
+            for key, expires_at in self.cache.hot(self.top_n)
+            if now < expires_at <= boundary
+        ]
+        for key in keys:
+            self.cache.extend(key, boundary + self.lead_time)
+        self._last_boundary = boundary
+        return keys
+
+    async def refresh(self, keys: list[ForecastKey]) -> int:
+        """
+        Fetches new forecasts for ``keys`` and returns how many succeeded.
+        """
+        results = await asyncio.gather(
+            *map(self._refresh, keys), return_exceptions=True
+        )
+        succeeded = sum(result is None for result in results)
+        self.refreshed += succeeded
+        self.failed += len(results) - succeeded
+        return succeeded
+
+    async def _refresh(self, key: ForecastKey) -> None:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(PREFETCH)
+        await self.client.get_weather_forecast(
+            key.latitude,
+            key.longitude,
+            key.units,
+            key.lang,
+            priority=PREFETCH,
+            refresh=True,
+        )
+
+    async def run(self) -> None:
+        """
+        Refreshes the hot keys at every step boundary until cancelled.
+        """
+        while True:
+            boundary = self.next_boundary()
+            if boundary is None:
+                await asyncio.sleep(self.lead_time)
+                continue
+
+            await asyncio.sleep(
+                max(0.0, boundary - self.lead_time - self.clock())
+            )
+            keys = self.hold(boundary)
+            await asyncio.sleep(max(0.0, boundary - self.clock()))
+            await self.refresh(keys)
+            self.cache.decay()
+
+    def start(self) -> None:
+        """
+        Runs the prefetcher as a task of the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'next_boundary': self.next_boundary(),
+        }
@@ -0,0 +1,307 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from app.openweathersdk.resilience import UpstreamUnavailableError
+
+INTERACTIVE = 0
+BULK = 1
+PREFETCH = 2
+
+
+class RateLimitedError(UpstreamUnavailableError):
+    """
+    Raised when an upstream asks, through ``Retry-After``, to wait longer
+    than the client is willing to, instead of blocking the caller and the
+    rate limiter for all that time.
+
+    Attributes
+    ----------
+    name : str
+        Name of the upstream.
+    retry_after : float
+        Seconds the upstream asked to wait.
+    """
+
+
+class _Waiter(ABC):
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @abstractmethod
+    def wake(self) -> None:
+        """
+        Tells the waiter it may head the queue now.
+        """
+
+
+class _ThreadWaiter(_Waiter):
+    def __init__(self, priority: int, seq: int):
+        super().__init__(priority, seq)
+        self.event = threading.Event()
+
+    def wake(self) -> None:
+        self.event.set()
+
+
+class _AsyncWaiter(_Waiter):
+    def __init__(self, priority: int, seq: int):
+        super().__init__(priority, seq)
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """
+    Returns the delay in seconds of a ``Retry-After`` header, given either
+    as seconds or as an HTTP date.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    A token bucket gating upstream calls, with a priority queue of waiters.
+
+    The bucket refills at ``rate`` tokens per second up to ``burst`` tokens
+    and every upstream call takes one. Callers that find it empty queue up
+    ordered by priority, ``INTERACTIVE`` before ``BULK``, then by arrival,
+    and only the head of the queue may take the next token. A 429 answer
+    pauses the bucket for its ``Retry-After`` through ``penalize``, so
+    bursts turn into bounded queueing instead of failed requests.
+
+    Threads wait with ``acquire`` and coroutines with ``acquire_async``;
+    both share the same bucket and queue. With ``max_queue`` or
+    ``max_queue_wait`` set, a caller that would find the queue full or
+    wait longer than that raises ``RateLimitedError`` at once instead of
+    queueing, so a burst larger than the quota fails fast.
+
+    Attributes
+    ----------
+    queue_depth : int
+        Number of callers currently waiting for a token.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        *,
+        name: str = 'upstream',
+        max_queue: Optional[int] = None,
+        max_queue_wait: Optional[float] = None,
+    ):
+        """
+        Parameters
+        ----------
+        rate : float
+            Tokens added per second.
+        burst : int, optional
+            Capacity of the bucket, the number of calls allowed at once
+            after an idle period (default: 1).
+        clock : Callable[[], float], optional
+            Monotonic clock in seconds (default: time.monotonic).
+        name : str, optional
+            Name of the upstream, used in errors (default: upstream).
+        max_queue : int, optional
+            Most callers allowed to wait at once (default: None, no
+            limit).
+        max_queue_wait : float, optional
+            Longest expected wait in seconds a caller queues for
+            (default: None, no limit).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.name = name
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @classmethod
+    def per_minute(cls, calls: int, burst: Optional[int] = None, **kwargs):
+        """
+        Builds a limiter from a calls-per-minute quota.
+        """
+        return cls(calls / 60, burst or max(1, calls // 6), **kwargs)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def expected_wait(self) -> float:
+        """
+        Estimates how long a new caller would wait for a token, in seconds.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return self._expected_wait(now, len(self._queue))
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'expected_wait': self.expected_wait(),
+            'granted': self.granted,
+            'avg_wait': (
+                self.total_wait / self.granted if self.granted else 0.0
+            ),
+            'max_wait': self.max_wait,
+        }
+
+    def penalize(self, retry_after: float) -> None:
+        """
+        Empties the bucket and pauses it for ``retry_after`` seconds.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = 0.0
+            self._updated = max(now, self._updated)
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def acquire(self, priority: int = INTERACTIVE) -> float:
+        """
+        Blocks the calling thread until it is granted a token.
+
+        Returns
+        -------
+        float
+            The time waited, in seconds.
+        """
+        waiter = self._enqueue(_ThreadWaiter, priority)
+        while True:
+            granted, delay = self._try_grant(waiter)
+            if granted:
+                return delay
+            waiter.event.wait(delay)
+            waiter.event.clear()
+
+    async def acquire_async(self, priority: int = INTERACTIVE) -> float:
+        """
+        Waits, without blocking the event loop, until a token is granted.
+
+        Returns
+        -------
+        float
+            The time waited, in seconds.
+        """
+        waiter = self._enqueue(_AsyncWaiter, priority)
+        try:
+            return await self._wait_async(waiter)
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+
+    async def _wait_async(self, waiter: _AsyncWaiter) -> float:
+        while True:
+            granted, delay = self._try_grant(waiter)
+            if granted:
+                return delay
+            try:
+                await asyncio.wait_for(waiter.event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            waiter.event.clear()
+
+    def _expected_wait(self, now: float, ahead: int) -> float:
+        missing = ahead + 1 - self._tokens
+        wait = max(0.0, missing / self.rate)
+        return wait + max(0.0, self._blocked_until - now)
+
+    def _admit(self, now: float, priority: int) -> None:
+        """
+        Raises ``RateLimitedError`` when a caller of ``priority`` would find
+        the queue full or wait longer than ``max_queue_wait``.
+        """
+        if self.max_queue is not None and len(self._queue) >= self.max_queue:
+            raise RateLimitedError(self.name, self._expected_wait(now, 0))
+        if self.max_queue_wait is None:
+            return
+        ahead = sum(1 for waiter in self._queue if waiter.priority <= priority)
+        wait = self._expected_wait(now, ahead)
+        if wait > self.max_queue_wait:
+            raise RateLimitedError(self.name, wait)
+
+    def _enqueue(self, waiter_class, priority: int) -> _Waiter:
+        waiter = waiter_class(priority, next(self._seq))
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._admit(now, priority)
+            waiter.enqueued_at = now
+            heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            if self._queue:
+                self._queue[0].wake()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            start = max(self._updated, self._blocked_until)
+            if now > start:
+                self._tokens = min(
+                    self.burst, self._tokens + (now - start) * self.rate
+                )
+            self._updated = now
+
+    def _try_grant(self, waiter: _Waiter) -> tuple[bool, Optional[float]]:
+        """
+        Grants a token to ``waiter`` if it heads the queue and one is
+        available. Otherwise returns how long it should sleep before trying
+        again, None meaning until it is woken up.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            if self._queue[0] is not waiter:
+                return False, None
+            if now < self._blocked_until:
+                return False, self._blocked_until - now
+            if self._tokens < 1:
+                return False, (1 - self._tokens) / self.rate
+
+            self._tokens -= 1
+            heapq.heappop(self._queue)
+            if self._queue:
+                self._queue[0].wake()
+
+            waited = now - waiter.enqueued_at
+            self.granted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            return True, waited
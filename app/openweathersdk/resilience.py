@@ -0,0 +1,325 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from typing import Callable, Iterator
+
+from app.openweathersdk.tracing import NULL_SPAN
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+TRANSIENT_STATUSES = frozenset({
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+})
+
+
+class UpstreamUnavailableError(Exception):
+    """
+    Raised instead of calling an upstream that cannot take the call now.
+
+    Attributes
+    ----------
+    name : str
+        Name of the upstream.
+    retry_after : float
+        Seconds after which the call is worth trying again.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f'{name} is unavailable, retry in {retry_after:.0f} seconds'
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open.
+
+    Attributes
+    ----------
+    name : str
+        Name of the upstream.
+    retry_after : float
+        Seconds until the breaker lets a probe call through.
+    """
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient upstream failures.
+
+    A call is tried at most ``attempts`` times. The n-th retry, counting
+    from zero, sleeps a random delay between 0 and
+    ``min(max_backoff, backoff * 2 ** n)``, so clients that failed together
+    do not retry together.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+    ):
+        """
+        Parameters
+        ----------
+        attempts : int, optional
+            Maximum number of tries of one call, the first included
+            (default: 3).
+        backoff : float, optional
+            Upper bound in seconds of the first retry delay, doubled on
+            every following retry (default: 0.2).
+        max_backoff : float, optional
+            Upper bound in seconds of any retry delay (default: 2.0).
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delays(self) -> Iterator[float]:
+        """
+        Yields the delay before each retry of one call.
+        """
+        for retry in range(self.attempts - 1):
+            yield random.uniform(
+                0, min(self.max_backoff, self.backoff * 2**retry)
+            )
+
+    @staticmethod
+    def is_transient_status(status_code: int) -> bool:
+        """
+        Whether an HTTP status is worth retrying.
+        """
+        return status_code in TRANSIENT_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream keeps failing.
+
+    After ``failure_threshold`` consecutive failed calls the circuit opens
+    and ``check`` raises ``CircuitOpenError`` for ``recovery_timeout``
+    seconds, without touching the network. Then it turns half-open and lets
+    one probe call through per ``recovery_timeout``: a success closes the
+    circuit and a failure opens it again.
+
+    Attributes
+    ----------
+    state : str
+        One of ``CLOSED``, ``OPEN`` or ``HALF_OPEN``.
+    failures : int
+        Consecutive failed calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Parameters
+        ----------
+        name : str
+            Name of the upstream, used in error messages.
+        failure_threshold : int, optional
+            Consecutive failures that open the circuit (default: 5).
+        recovery_timeout : float, optional
+            Seconds the circuit stays open before a probe call
+            (default: 30.0).
+        clock : Callable[[], float], optional
+            Monotonic clock in seconds (default: time.monotonic).
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED
+
+    def retry_after(self) -> float:
+        """
+        Returns the seconds until the circuit lets a probe call through.
+        """
+        if self.state == CLOSED:
+            return 0.0
+        elapsed = self.clock() - self._opened_at
+        return max(0.0, self.recovery_timeout - elapsed)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the upstream now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.retry_after() <= 0:
+                self.state = HALF_OPEN
+                self._opened_at = self.clock()
+                return True
+            return False
+
+    def check(self) -> None:
+        """
+        Raises ``CircuitOpenError`` unless a call is allowed.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if (
+                self.state == HALF_OPEN
+                or self.failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = self.clock()
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_after': self.retry_after(),
+        }
+
+
+class ResilientClient:
+    """
+    Mixin running the calls of an upstream client through its
+    ``retry_policy`` and ``circuit_breaker`` attributes, either of which may
+    be None.
+
+    Every attempt is counted in the ``statuses`` counter the client sets
+    up, by status code of the answer or ``'error'`` when none came back.
+    With a ``tracer``, an object whose ``span(name, **attributes)`` returns
+    a context manager like ``app.tracing.Tracer``, every attempt also runs
+    in a span named after ``upstream``, retries included.
+    """
+
+    retry_policy = None
+    circuit_breaker = None
+    tracer = None
+    upstream = 'upstream'
+    statuses: Counter
+
+    def _count_status(self, status) -> None:
+        self.statuses[status] += 1
+
+    def _span(self, name: str, **attributes):
+        if self.tracer is None:
+            return NULL_SPAN
+        return self.tracer.span(name, **attributes)
+
+    def _retry_delays(self) -> Iterator[float]:
+        if self.retry_policy is None:
+            return iter(())
+        return self.retry_policy.delays()
+
+    def _record_outcome(self, failed: bool) -> None:
+        if self.circuit_breaker is None:
+            return
+        if failed:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    def _call_upstream(
+        self, send: Callable, errors: tuple, retry: bool = True, **attributes
+    ):
+        """
+        Calls ``send`` until it returns a non transient response or the
+        retries run out, sleeping the backoff in between. Exceptions in
+        ``errors`` are retried as well and re-raised once out of retries.
+        Without ``retry``, meant for requests that are not idempotent,
+        ``send`` is called once. ``attributes`` are added to the span of
+        every attempt.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.check()
+        delays = self._retry_delays() if retry else iter(())
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self._span(
+                    f'{self.upstream}.request', attempt=attempt, **attributes
+                ) as span:
+                    response = send()
+                    span.set_attribute(
+                        'http.status_code', response.status_code
+                    )
+                self._count_status(response.status_code)
+                transient = RetryPolicy.is_transient_status(
+                    response.status_code
+                )
+            except errors:
+                self._count_status('error')
+                delay = next(delays, None)
+                if delay is None:
+                    self._record_outcome(failed=True)
+                    raise
+            else:
+                delay = next(delays, None) if transient else None
+                if delay is None:
+                    self._record_outcome(failed=transient)
+                    return response
+            time.sleep(delay)
+
+    async def _acall_upstream(
+        self, send: Callable, errors: tuple, retry: bool = True, **attributes
+    ):
+        """
+        Coroutine version of ``_call_upstream`` awaiting ``send()``.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.check()
+        delays = self._retry_delays() if retry else iter(())
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self._span(
+                    f'{self.upstream}.request', attempt=attempt, **attributes
+                ) as span:
+                    response = await send()
+                    span.set_attribute(
+                        'http.status_code', response.status_code
+                    )
+                self._count_status(response.status_code)
+                transient = RetryPolicy.is_transient_status(
+                    response.status_code
+                )
+            except errors:
+                self._count_status('error')
+                delay = next(delays, None)
+                if delay is None:
+                    self._record_outcome(failed=True)
+                    raise
+            else:
+                delay = next(delays, None) if transient else None
+                if delay is None:
+                    self._record_outcome(failed=transient)
+                    return response
+            await asyncio.sleep(delay)
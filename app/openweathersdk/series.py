@@ -0,0 +1,284 @@
+import math
+import sys
+import threading
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import List, Union
+
+from app.openweathersdk.models import (
+    Clouds,
+    Sys,
+    WeatherData,
+    WeatherDescription,
+    WeatherForecast,
+    WeatherForecastCityInfo,
+    WeatherMain,
+    Wind,
+)
+
+MISSING_INT = -(2**31)
+
+_conditions: list[tuple] = []
+_condition_index: dict[tuple, int] = {}
+_conditions_lock = threading.Lock()
+
+
+def _intern_conditions(weather: list[dict]) -> int:
+    key = tuple(
+        (
+            item['id'],
+            sys.intern(item['main']),
+            sys.intern(item['description']),
+            sys.intern(item['icon']),
+        )
+        for item in weather
+    )
+    index = _condition_index.get(key)
+    if index is None:
+        with _conditions_lock:
+            index = _condition_index.get(key)
+            if index is None:
+                index = len(_conditions)
+                _conditions.append(key)
+                _condition_index[key] = index
+    return index
+
+
+def _int_or_missing(value) -> int:
+    return MISSING_INT if value is None else value
+
+
+def _float_or_nan(value) -> float:
+    return math.nan if value is None else value
+
+
+def _optional_int(value: int):
+    return None if value == MISSING_INT else value
+
+
+def _optional_float(value: float):
+    return None if math.isnan(value) else value
+
+
+class ForecastSeries:
+    """
+    A compact, array-backed 5-day/3-hour forecast.
+
+    Every numeric field of the 40 steps is kept in a typed ``array`` column
+    and the weather conditions are interned process-wide, so thousands of
+    cached forecasts share their condition strings. The object reads like a
+    ``WeatherForecast``: ``cod``, ``message``, ``cnt`` and ``city`` are plain
+    attributes, and ``list`` is a sequence that builds each ``WeatherData``
+    model only when it is accessed.
+
+    Methods
+    -------
+    from_dict(data)
+        Builds a series from the JSON returned by the forecast API.
+
+    from_forecast(forecast)
+        Builds a series from a ``WeatherForecast``.
+
+    to_forecast()
+        Builds the equivalent full ``WeatherForecast``.
+    """
+
+    __slots__ = (
+        'cod',
+        'message',
+        'city',
+        'dt',
+        'temp',
+        'feels_like',
+        'temp_min',
+        'temp_max',
+        'pressure',
+        'sea_level',
+        'grnd_level',
+        'humidity',
+        'temp_kf',
+        'conditions',
+        'clouds',
+        'wind_speed',
+        'wind_deg',
+        'wind_gust',
+        'visibility',
+        'pop',
+        'rain',
+        'pod',
+    )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ForecastSeries':
+        """
+        Builds a series from the JSON of the forecast API.
+
+        The typed columns check every value as it is stored, so a payload
+        with missing fields or values of the wrong type or range raises
+        ``ValueError``, like the validation of ``WeatherForecast``.
+        """
+        try:
+            return cls._from_dict(data)
+        except (KeyError, TypeError, ValueError, OverflowError) as err:
+            raise ValueError(
+                f'Malformed forecast: {type(err).__name__}: {err}'
+            ) from err
+
+    @classmethod
+    def _from_dict(cls, data: dict) -> 'ForecastSeries':
+        items = data['list']
+        series = cls.__new__(cls)
+        series.cod = data['cod']
+        series.message = data['message']
+        series.city = WeatherForecastCityInfo(**data['city'])
+
+        mains = [item['main'] for item in items]
+        winds = [item['wind'] for item in items]
+        series.dt = array('q', [item['dt'] for item in items])
+        series.temp = array('d', [main['temp'] for main in mains])
+        series.feels_like = array('d', [main['feels_like'] for main in mains])
+        series.temp_min = array('d', [main['temp_min'] for main in mains])
+        series.temp_max = array('d', [main['temp_max'] for main in mains])
+        series.pressure = array('i', [main['pressure'] for main in mains])
+        series.sea_level = array(
+            'i', [_int_or_missing(main.get('sea_level')) for main in mains]
+        )
+        series.grnd_level = array(
+            'i', [_int_or_missing(main.get('grnd_level')) for main in mains]
+        )
+        series.humidity = array('B', [main['humidity'] for main in mains])
+        series.temp_kf = array(
+            'd', [_float_or_nan(main.get('temp_kf')) for main in mains]
+        )
+        series.conditions = array(
+            'H', [_intern_conditions(item['weather']) for item in items]
+        )
+        series.clouds = array('B', [item['clouds']['all'] for item in items])
+        series.wind_speed = array('d', [wind['speed'] for wind in winds])
+        series.wind_deg = array('H', [wind['deg'] for wind in winds])
+        series.wind_gust = array(
+            'd', [_float_or_nan(wind.get('gust')) for wind in winds]
+        )
+        series.visibility = array('i', [item['visibility'] for item in items])
+        series.pop = array('d', [item['pop'] for item in items])
+        series.rain = {
+            index: item['rain']
+            for index, item in enumerate(items)
+            if item.get('rain') is not None
+        }
+        series.pod = ''.join(item['sys']['pod'] for item in items)
+        return series
+
+    @classmethod
+    def from_forecast(cls, forecast: WeatherForecast) -> 'ForecastSeries':
+        return cls.from_dict(forecast.model_dump())
+
+    @property
+    def cnt(self) -> int:
+        return len(self.dt)
+
+    @property
+    def list(self) -> Sequence[WeatherData]:
+        return _WeatherDataView(self)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the series, excluding interned strings.
+        """
+        total = sys.getsizeof(self) + sys.getsizeof(self.pod)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, array):
+                total += sys.getsizeof(value)
+        total += sys.getsizeof(self.rain) + sum(
+            sys.getsizeof(rain) for rain in self.rain.values()
+        )
+        return total + sys.getsizeof(self.city.__dict__)
+
+    def weather(self, index: int) -> List[WeatherDescription]:
+        return [
+            WeatherDescription.model_construct(
+                id=condition_id,
+                main=main,
+                description=description,
+                icon=icon,
+            )
+            for condition_id, main, description, icon in _conditions[
+                self.conditions[index]
+            ]
+        ]
+
+    def descriptions(self) -> List[str]:
+        """
+        Returns the description of the main condition of every step.
+        """
+        return [
+            condition[0][2] if condition else ''
+            for condition in map(_conditions.__getitem__, self.conditions)
+        ]
+
+    def weather_data(self, index: int) -> WeatherData:
+        dt = self.dt[index]
+        return WeatherData.model_construct(
+            dt=dt,
+            main=WeatherMain.model_construct(
+                temp=self.temp[index],
+                feels_like=self.feels_like[index],
+                temp_min=self.temp_min[index],
+                temp_max=self.temp_max[index],
+                pressure=self.pressure[index],
+                sea_level=_optional_int(self.sea_level[index]),
+                grnd_level=_optional_int(self.grnd_level[index]),
+                humidity=self.humidity[index],
+                temp_kf=_optional_float(self.temp_kf[index]),
+            ),
+            weather=self.weather(index),
+            clouds=Clouds.model_construct(all=self.clouds[index]),
+            wind=Wind.model_construct(
+                speed=self.wind_speed[index],
+                deg=self.wind_deg[index],
+                gust=_optional_float(self.wind_gust[index]),
+            ),
+            visibility=self.visibility[index],
+            pop=self.pop[index],
+            rain=self.rain.get(index),
+            sys=Sys.model_construct(pod=self.pod[index]),
+            dt_txt=datetime.fromtimestamp(dt, timezone.utc).strftime(
+                '%Y-%m-%d %H:%M:%S'
+            ),
+        )
+
+    def to_forecast(self) -> WeatherForecast:
+        return WeatherForecast(
+            cod=self.cod,
+            message=self.message,
+            cnt=self.cnt,
+            list=list(self.list),
+            city=self.city,
+        )
+
+
+class _WeatherDataView(Sequence):
+    __slots__ = ('_series',)
+
+    def __init__(self, series: ForecastSeries):
+        self._series = series
+
+    def __len__(self) -> int:
+        return len(self._series.dt)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[WeatherData, list[WeatherData]]:
+        if isinstance(index, slice):
+            return [
+                self._series.weather_data(i)
+                for i in range(*index.indices(len(self)))
+            ]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('forecast index out of range')
+        return self._series.weather_data(index)
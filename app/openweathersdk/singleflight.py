@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls made from different threads.
+
+    The first caller of ``do`` for a key runs the function while every other
+    caller arriving with the same key before it finishes waits and receives
+    the same result, or the same exception. Nothing is kept once the call
+    returns, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs):
+        """
+        Runs ``fn(*args, **kwargs)`` once for all concurrent callers of key.
+
+        Returns
+        -------
+        Any
+            The value returned by the shared call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical coroutine calls of one event loop.
+
+    The first caller of ``do`` for a key starts the coroutine as a task and
+    every caller with the same key awaits that task while it runs. The task
+    is shielded, so a cancelled caller does not cancel the fetch the others
+    are waiting on.
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(
+        self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs
+    ):
+        """
+        Awaits ``fn(*args, **kwargs)`` once for all concurrent callers of key.
+
+        Returns
+        -------
+        Any
+            The value returned by the shared coroutine.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
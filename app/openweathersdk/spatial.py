@@ -0,0 +1,254 @@
+import heapq
+import math
+from array import array
+from typing import Hashable, Iterable
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_LATITUDE = 90
+FULL_CIRCLE = 360
+# largest number of points a k-d tree scans without splitting them further
+LEAF_SIZE = 16
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Returns the great-circle distance between two points in kilometers.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = (
+        math.sin(half_dphi) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    A spatial index of points on a uniform latitude/longitude grid.
+
+    Like a geohash prefix, each point lives in the cell of about
+    ``cell_km`` side containing it, kept in a dict, so inserts and removals
+    are O(1). A radius query only visits the cells overlapping the bounding
+    box of the circle, which for a radius close to ``cell_km`` is a handful
+    of cells whatever the number of points. Cells wrap around the
+    antimeridian.
+    """
+
+    def __init__(self, cell_km: float):
+        """
+        Parameters
+        ----------
+        cell_km : float
+            Side of a cell in kilometers along a meridian, best set to the
+            usual query radius.
+        """
+        self._columns = math.ceil(FULL_CIRCLE * KM_PER_DEGREE / cell_km)
+        self.cell_deg = FULL_CIRCLE / self._columns
+        self._cells: dict[tuple[int, int], dict] = {}
+        self._points: dict[Hashable, tuple[float, float, tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        column = math.floor((lon + 180) / self.cell_deg) % self._columns
+        return math.floor((lat + MAX_LATITUDE) / self.cell_deg), column
+
+    def insert(self, item: Hashable, lat: float, lon: float) -> None:
+        """
+        Adds ``item`` at ``(lat, lon)``, moving it if already indexed.
+        """
+        self.remove(item)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[item] = (lat, lon)
+        self._points[item] = (lat, lon, cell)
+
+    def remove(self, item: Hashable) -> None:
+        point = self._points.pop(item, None)
+        if point is None:
+            return
+        cell = point[2]
+        members = self._cells[cell]
+        del members[item]
+        if not members:
+            del self._cells[cell]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._points.clear()
+
+    def within(
+        self, lat: float, lon: float, radius_km: float
+    ) -> list[tuple[float, Hashable]]:
+        """
+        Returns the items at most ``radius_km`` away from ``(lat, lon)`` as
+        ``(distance, item)`` pairs, nearest first.
+        """
+        lat_span = radius_km / KM_PER_DEGREE
+        first_row = self._cell(lat - lat_span, lon)[0]
+        last_row = self._cell(lat + lat_span, lon)[0]
+
+        cos_lat = min(
+            math.cos(math.radians(lat - lat_span)),
+            math.cos(math.radians(lat + lat_span)),
+        )
+        if lat_span >= MAX_LATITUDE or cos_lat <= 0:
+            columns = range(self._columns)
+        else:
+            lon_span = lat_span / cos_lat
+            if 2 * lon_span >= FULL_CIRCLE:
+                columns = range(self._columns)
+            else:
+                start = math.floor((lon - lon_span + 180) / self.cell_deg)
+                stop = math.floor((lon + lon_span + 180) / self.cell_deg)
+                columns = {
+                    column % self._columns for column in range(start, stop + 1)
+                }
+
+        found = []
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                members = self._cells.get((row, column))
+                if not members:
+                    continue
+                for item, (item_lat, item_lon) in members.items():
+                    distance = haversine_km(lat, lon, item_lat, item_lon)
+                    if distance <= radius_km:
+                        found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    """
+    Returns the point of the unit sphere at ``(lat, lon)``.
+    """
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (
+        math.cos(phi) * math.cos(lam),
+        math.cos(phi) * math.sin(lam),
+        math.sin(phi),
+    )
+
+
+def chord_to_km(chord: float) -> float:
+    """
+    Returns the great-circle distance of two points of the unit sphere
+    ``chord`` apart in a straight line.
+    """
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """
+    A static k-d tree of points on the Earth for nearest-neighbour queries.
+
+    Points are mapped to 3D unit vectors, so the straight-line distance
+    between them grows with their great-circle distance and the tree needs
+    no special case at the poles or the antimeridian. The tree is implicit:
+    its points are sorted so that every node is a slice of three coordinate
+    arrays split at its median, along x, y and z in turn, with no node
+    objects. A query descends to the nearest leaf first and only visits the
+    other half of a node when the splitting plane is closer than the k-th
+    nearest point found so far, which is O(log n) on average.
+    """
+
+    def __init__(self, points: Iterable[tuple[float, float, Hashable]]):
+        """
+        Parameters
+        ----------
+        points : Iterable[tuple[float, float, Hashable]]
+            ``(lat, lon, item)`` of every point.
+        """
+        nodes = [(*unit_vector(lat, lon), item) for lat, lon, item in points]
+        self._sort(nodes, 0, len(nodes), 0)
+        self._axes = tuple(
+            array('d', (node[axis] for node in nodes)) for axis in range(3)
+        )
+        self.items = [node[3] for node in nodes]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @classmethod
+    def _sort(cls, nodes: list, low: int, high: int, depth: int) -> None:
+        stack = [(low, high, depth)]
+        while stack:
+            low, high, depth = stack.pop()
+            if high - low <= LEAF_SIZE:
+                continue
+            axis = depth % 3
+            nodes[low:high] = sorted(
+                nodes[low:high], key=lambda node: node[axis]
+            )
+            middle = (low + high) // 2
+            stack.append((low, middle, depth + 1))
+            stack.append((middle + 1, high, depth + 1))
+
+    def _offer(
+        self,
+        best: list[tuple[float, int]],
+        k: int,
+        positions: Iterable[int],
+        query: tuple[float, float, float],
+    ) -> None:
+        # keeps in the heap ``best`` the k points nearest to ``query``
+        qx, qy, qz = query
+        xs, ys, zs = self._axes
+        for position in positions:
+            dx = xs[position] - qx
+            dy = ys[position] - qy
+            dz = zs[position] - qz
+            squared = dx * dx + dy * dy + dz * dz
+            if len(best) < k:
+                heapq.heappush(best, (-squared, position))
+            elif squared < -best[0][0]:
+                heapq.heapreplace(best, (-squared, position))
+
+    def nearest(
+        self, lat: float, lon: float, k: int = 5
+    ) -> list[tuple[float, Hashable]]:
+        """
+        Returns the ``k`` items nearest to ``(lat, lon)`` as
+        ``(distance_km, item)`` pairs, nearest first.
+        """
+        if k <= 0 or not self.items:
+            return []
+        query = unit_vector(lat, lon)
+        # max-heap of (-squared distance, position) of the best points
+        best: list[tuple[float, int]] = []
+        # slices left to search, with the squared distance to their plane
+        stack = [(0, len(self.items), 0, 0.0)]
+        while stack:
+            low, high, depth, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            if high - low <= LEAF_SIZE:
+                positions = range(low, high)
+            else:
+                middle = (low + high) // 2
+                positions = (middle,)
+                axis = depth % 3
+                offset = query[axis] - self._axes[axis][middle]
+                near, far = (
+                    ((low, middle), (middle + 1, high))
+                    if offset < 0
+                    else ((middle + 1, high), (low, middle))
+                )
+                # the far half is pushed first so the near one is searched
+                # first and has tightened the bound by the time the far one
+                # is popped
+                stack.append((*far, depth + 1, offset * offset))
+                stack.append((*near, depth + 1, bound))
+
+            self._offer(best, k, positions, query)
+        return sorted(
+            (
+                (chord_to_km(math.sqrt(-squared)), self.items[position])
+                for squared, position in best
+            ),
+            key=lambda pair: pair[0],
+        )
@@ -0,0 +1,43 @@
+import asyncio
+from functools import wraps
+from typing import Callable
+
+
+class _NullSpan:
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorates a method of a ``ResilientClient``, sync or coroutine, to run
+    in a span named ``name`` of the client's ``tracer``.
+    """
+
+    def decorate(method: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(method):
+
+            @wraps(method)
+            async def traced_coroutine(self, *args, **kwargs):
+                with self._span(name):
+                    return await method(self, *args, **kwargs)
+
+            return traced_coroutine
+
+        @wraps(method)
+        def traced_method(self, *args, **kwargs):
+            with self._span(name):
+                return method(self, *args, **kwargs)
+
+        return traced_method
+
+    return decorate
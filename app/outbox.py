@@ -0,0 +1,279 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+PRUNE_INTERVAL = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class GistOutbox:
+    """
+    A durable SQLite outbox of gists waiting to be published.
+
+    Jobs are written to disk before ``enqueue`` returns and are drained by a
+    pool of worker threads calling ``publish``. Failed attempts are retried
+    with exponential backoff and jitter until ``max_attempts`` is reached.
+    Jobs left running by a process that died are picked up again when the
+    next one calls ``start``. Published jobs are deleted ``retention``
+    seconds after they were enqueued, failed ones are kept.
+
+    Methods
+    -------
+    enqueue(gist_name, content)
+        Stores a new job and returns its id.
+
+    get(job_id)
+        Returns the state of a job.
+
+    run_once()
+        Publishes the next due job in the calling thread.
+
+    prune()
+        Deletes the published jobs older than ``retention``.
+
+    start() / stop()
+        Starts and stops the worker threads.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        publish: Callable[[str, str], str],
+        *,
+        path: str = ':memory:',
+        workers: int = 2,
+        max_attempts: int = 5,
+        backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        poll_interval: float = 1.0,
+        retention: float = 7 * 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Parameters
+        ----------
+        publish : Callable[[str, str], str]
+            Creates the gist from ``(gist_name, content)`` and returns its URL.
+        path : str, optional
+            Location of the SQLite database (default: ``':memory:'``, jobs
+            are kept in memory and lost on exit).
+        workers : int, optional
+            Number of worker threads started by ``start`` (default: 2).
+        max_attempts : int, optional
+            Attempts before a job is marked as failed (default: 5).
+        backoff : float, optional
+            Delay in seconds before the first retry, doubled on every
+            following one (default: 2.0).
+        max_backoff : float, optional
+            Upper bound of the retry delay in seconds (default: 300.0).
+        poll_interval : float, optional
+            How long an idle worker sleeps before looking for due retries
+            (default: 1.0).
+        retention : float, optional
+            Seconds a published job is kept after it was enqueued, so its
+            status can still be read (default: one week).
+        clock : Callable[[], float], optional
+            Source of the current epoch time (default: time.time).
+        """
+        self.publish = publish
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.clock = clock
+        self._pruned_at = float('-inf')
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS gist_jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' gist_name TEXT NOT NULL,'
+                ' content TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' next_attempt_at REAL NOT NULL,'
+                ' url TEXT,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS gist_jobs_due'
+                ' ON gist_jobs (status, next_attempt_at)'
+            )
+
+    def enqueue(self, gist_name: str, content: str) -> str:
+        """
+        Stores a gist to be published and wakes up a worker.
+
+        Returns
+        -------
+        str
+            The id of the new job.
+        """
+        job_id = uuid.uuid4().hex
+        now = self.clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO gist_jobs'
+                ' (id, gist_name, content, status, next_attempt_at,'
+                ' created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, gist_name, content, PENDING, now, now),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns the id, status, attempts, url and last error of a job, or
+        None if it does not exist.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, status, attempts, url, error FROM gist_jobs'
+                ' WHERE id = ?',
+                (job_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def run_once(self) -> bool:
+        """
+        Claims the next due job and tries to publish it.
+
+        Returns
+        -------
+        bool
+            Whether a job was found.
+        """
+        job = self._claim()
+        if job is None:
+            return False
+
+        try:
+            url = self.publish(job['gist_name'], job['content'])
+        except Exception as err:
+            self._retry_or_fail(job, str(err))
+        else:
+            self._finish(job['id'], DONE, url=url)
+        return True
+
+    def prune(self) -> int:
+        """
+        Deletes the published jobs enqueued more than ``retention`` seconds
+        ago.
+
+        Returns
+        -------
+        int
+            The number of jobs deleted.
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'DELETE FROM gist_jobs WHERE status = ? AND created_at < ?',
+                (DONE, self.clock() - self.retention),
+            ).rowcount
+
+    def start(self) -> None:
+        """
+        Requeues jobs interrupted by a previous process and starts the
+        worker threads.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE gist_jobs SET status = ? WHERE status = ?',
+                (PENDING, RUNNING),
+            )
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'gist-outbox-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the workers after their current job and closes the database.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+        with self._lock:
+            self._conn.close()
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+                self._prune_if_due()
+            except Exception:
+                logger.exception('Gist outbox worker failed')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _prune_if_due(self) -> None:
+        now = self.clock()
+        if now - self._pruned_at >= PRUNE_INTERVAL:
+            self._pruned_at = now
+            self.prune()
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT * FROM gist_jobs WHERE status = ?'
+                ' AND next_attempt_at <= ?'
+                ' ORDER BY next_attempt_at LIMIT 1',
+                (PENDING, self.clock()),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    'UPDATE gist_jobs SET status = ?, attempts = attempts + 1'
+                    ' WHERE id = ?',
+                    (RUNNING, row['id']),
+                )
+        return row
+
+    def _retry_or_fail(self, job: sqlite3.Row, error: str) -> None:
+        attempts = job['attempts'] + 1
+        if attempts >= self.max_attempts:
+            self._finish(job['id'], FAILED, error=error)
+            return
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE gist_jobs SET status = ?, next_attempt_at = ?,'
+                ' error = ? WHERE id = ?',
+                (
+                    PENDING,
+                    self.clock() + delay * random.uniform(0.5, 1.0),
+                    error,
+                    job['id'],
+                ),
+            )
+
+    def _finish(self, job_id: str, status: str, url=None, error=None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE gist_jobs SET status = ?, url = ?, error = ?'
+                ' WHERE id = ?',
+                (status, url, error, job_id),
+            )
@@ -0,0 +1,356 @@
+import asyncio
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Callable, Iterable, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_ID = re.compile(r'^[\w-]{1,64}$')
+TRUE_VALUES = ('1', 'true', 'yes')
+_labels: dict[CodeType, str] = {}
+
+
+def _label(code: CodeType) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        for marker in ('site-packages' + os.sep, os.getcwd() + os.sep):
+            if marker in path:
+                path = path.split(marker, 1)[1]
+                break
+        label = f'{code.co_name} ({path}:{code.co_firstlineno})'
+        _labels[code] = label
+    return label
+
+
+def frame_stack(frame: Optional[FrameType]) -> str:
+    """
+    Returns the stack of ``frame`` in the collapsed format, outermost
+    function first and every function named ``name (path:line)``.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def collapse(counts: Counter) -> str:
+    """
+    Formats stack counts as collapsed stacks, one ``stack count`` line per
+    stack, the input of ``flamegraph.pl``, speedscope and most flame graph
+    viewers.
+    """
+    return ''.join(
+        f'{stack} {count}\n' for stack, count in counts.most_common()
+    )
+
+
+def is_authorized(token: Optional[str], expected: Optional[str]) -> bool:
+    """
+    Whether ``token`` matches the ``expected`` admin token, compared in
+    constant time. Nothing is authorized without an expected token.
+    """
+    if not token or not expected:
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+class SamplingProfiler:
+    """
+    A wall-clock sampling profiler running in its own thread.
+
+    Every ``interval`` seconds it takes the stack of the sampled threads,
+    all but itself or only ``thread_ids``, and counts it. Python code keeps
+    running at full speed in between, so profiling costs the time of one
+    stack walk per sample whatever the code profiled. Threads blocked in a
+    wait are sampled too, as the time they spend waiting is part of the
+    latency being profiled.
+
+    Attributes
+    ----------
+    counts : Counter
+        Number of samples of every collapsed stack.
+    samples : int
+        Number of samples taken.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.001,
+        thread_ids: Optional[Iterable[int]] = None,
+        thread_names: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        interval : float, optional
+            Seconds between two samples (default: 0.001).
+        thread_ids : Iterable[int], optional
+            Identifiers of the threads sampled (default: None, all of them).
+        thread_names : bool, optional
+            Start every stack with the name of its thread, to tell threads
+            apart in the flame graph (default: False).
+        """
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.thread_names = thread_names
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        """
+        Counts the current stack of every sampled thread.
+        """
+        own = threading.get_ident()
+        names = (
+            {thread.ident: thread.name for thread in threading.enumerate()}
+            if self.thread_names
+            else {}
+        )
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (
+                self.thread_ids is not None
+                and thread_id not in self.thread_ids
+            ):
+                continue
+            stack = frame_stack(frame)
+            if self.thread_names:
+                stack = f'{names.get(thread_id, thread_id)};{stack}'
+            stacks.append(stack)
+        with self._lock:
+            self.counts.update(stacks)
+            self.samples += 1
+
+    def take(self) -> Counter:
+        """
+        Returns the counts sampled so far and starts new ones.
+        """
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """
+        Starts sampling in a daemon thread.
+        """
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='profiler', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> Counter:
+        """
+        Stops sampling and returns the counts.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        return self.take()
+
+
+class ProfileStore:
+    """
+    A directory of collapsed stack reports, keeping the ``max_files`` most
+    recent ones.
+    """
+
+    def __init__(self, directory: str, max_files: int = 100):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str) -> str:
+        if not PROFILE_ID.match(profile_id):
+            raise ValueError(f'Invalid profile id {profile_id!r}')
+        return os.path.join(self.directory, f'{profile_id}.collapsed')
+
+    def save(self, profile_id: str, counts: Counter) -> str:
+        """
+        Writes the report of ``counts`` and returns its path.
+        """
+        path = self._path(profile_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(collapse(counts))
+        os.replace(tmp_path, path)
+        self._prune()
+        return path
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """
+        Returns the report saved as ``profile_id``, or None.
+        """
+        try:
+            with open(self._path(profile_id), encoding='utf-8') as file:
+                return file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _prune(self) -> None:
+        paths = [
+            entry.path
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith('.collapsed')
+        ]
+        if len(paths) <= self.max_files:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[: len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ContinuousProfiler(SamplingProfiler):
+    """
+    An always-on, low-rate profiler of every thread of the process.
+
+    It samples every ``interval`` seconds, ten times per second by
+    default, cheap enough to leave running in production, and every
+    ``flush_interval`` seconds saves the stacks aggregated meanwhile as
+    ``continuous-<epoch>`` in its ``store``.
+    """
+
+    def __init__(
+        self,
+        store: ProfileStore,
+        interval: float = 0.1,
+        flush_interval: float = 60.0,
+    ):
+        super().__init__(interval, thread_names=True)
+        self.store = store
+        self.flush_interval = flush_interval
+
+    def flush(self) -> Optional[str]:
+        """
+        Saves the stacks sampled since the last flush, if any, and returns
+        the path of the report.
+        """
+        return self._save(self.take())
+
+    def _save(self, counts: Counter) -> Optional[str]:
+        if not counts:
+            return None
+        return self.store.save(f'continuous-{int(time.time())}', counts)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stopping.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def stop(self) -> Counter:
+        """
+        Stops sampling and saves the stacks not flushed yet.
+        """
+        counts = super().stop()
+        self._save(counts)
+        return counts
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests to ``paths`` on demand.
+
+    A request asks for a profile with an ``X-Profile: 1`` header or a
+    ``profile=1`` query parameter, and must carry the admin token in
+    ``X-Admin-Token``. Requests without a valid token are served as usual,
+    unprofiled. A profiled request runs under a ``SamplingProfiler`` of
+    the event loop thread, and the collapsed stacks are saved in the store
+    under the id returned in the ``X-Profile-Id`` header. The event loop
+    also runs the other requests in flight, whose stacks show up in the
+    report when they overlap.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: Iterable[str],
+        admin_token: Callable[[], Optional[str]],
+        get_store: Callable[[], ProfileStore],
+        interval: float = 0.001,
+    ):
+        """
+        Parameters
+        ----------
+        app : ASGIApp
+            The application profiled.
+        paths : Iterable[str]
+            Paths of the endpoints that may be profiled.
+        admin_token : Callable[[], Optional[str]]
+            Returns the admin token, or None to disable profiling.
+        get_store : Callable[[], ProfileStore]
+            Returns the store of the reports.
+        interval : float, optional
+            Seconds between two samples (default: 0.001).
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.admin_token = admin_token
+        self.get_store = get_store
+        self.interval = interval
+
+    @staticmethod
+    def _requested(scope: Scope, headers: Headers) -> bool:
+        if headers.get('x-profile', '').lower() in TRUE_VALUES:
+            return True
+        query = scope.get('query_string', b'')
+        if b'profile' not in query:
+            return False
+        values = parse_qs(query.decode('latin-1')).get('profile', [''])
+        return values[-1].lower() in TRUE_VALUES
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not self._requested(scope, headers) or not is_authorized(
+            headers.get('x-admin-token'), self.admin_token()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        header = (b'x-profile-id', profile_id.encode())
+
+        async def send_profiled(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), header]
+            await send(message)
+
+        profiler = SamplingProfiler(
+            self.interval, thread_ids=[threading.get_ident()]
+        )
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            counts = profiler.stop()
+            await asyncio.to_thread(self.get_store().save, profile_id, counts)
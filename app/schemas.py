@@ -1,6 +1,6 @@
 from typing import Dict, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class CityLocation(BaseModel):
@@ -18,3 +18,71 @@ class ListCityLocation(BaseModel):
 
 class Message(BaseModel):
     msg: str
+    github_url: Optional[str] = None
+    job_id: Optional[str] = None
+
+
+class GistJob(BaseModel):
+    id: str
+    status: str
+    attempts: int
+    github_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class Coordinate(BaseModel):
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+
+
+class BatchForecastRequest(BaseModel):
+    locations: list[Coordinate] = Field(min_length=1, max_length=1000)
+    units: str = 'metric'
+    lang: str = 'pt_br'
+
+
+class BatchForecastItem(BaseModel):
+    latitude: float
+    longitude: float
+    msg: Optional[str] = None
+    error: Optional[str] = None
+    stale: bool = False
+
+
+class BatchForecast(BaseModel):
+    results: list[BatchForecastItem]
+
+
+class NearestCitiesRequest(BaseModel):
+    locations: list[Coordinate] = Field(min_length=1, max_length=1000)
+    limit: int = Field(default=5, ge=1, le=50)
+
+
+class NearestCitiesBatch(BaseModel):
+    results: list[ListCityLocation]
+
+
+class StreamLocation(BaseModel):
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_coordinates_or_city(self) -> 'StreamLocation':
+        has_coordinates = (
+            self.latitude is not None and self.longitude is not None
+        )
+        if not has_coordinates and not self.city:
+            raise ValueError(
+                'Either latitude and longitude or city is required'
+            )
+        return self
+
+
+class ForecastStreamItem(BatchForecastItem):
+    index: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    city: Optional[str] = None
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable
+
+import pydantic_core
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+SSE_MEDIA_TYPE = 'text/event-stream'
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes], max_line: int = 64 * 1024
+) -> AsyncIterator[bytes]:
+    """
+    Splits a stream of byte chunks into its non-blank lines, holding at most
+    one line in memory.
+
+    Raises
+    ------
+    ValueError
+        When a line is longer than ``max_line`` bytes.
+    """
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > max_line:
+            raise ValueError(f'Line longer than {max_line} bytes')
+    if buffer.strip():
+        yield buffer
+
+
+async def map_as_completed(
+    function: Callable[[int, Any], Awaitable[Any]],
+    items: AsyncIterable,
+    concurrency: int,
+) -> AsyncIterator[Any]:
+    """
+    Yields ``function(index, item)`` for every item of ``items`` as soon as
+    it completes, running at most ``concurrency`` calls at a time.
+
+    A call holds its slot until its result is taken by the consumer, so
+    items are only read from ``items`` as fast as results are consumed:
+    a slow consumer slows the producer down and memory is bounded by
+    ``concurrency`` whatever the number of items. Closing the iterator
+    early cancels the calls still running.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    running: set[asyncio.Task] = set()
+    done = object()
+
+    async def call(index: int, item) -> None:
+        try:
+            await results.put(await function(index, item))
+        except BaseException:
+            slots.release()
+            raise
+
+    async def produce() -> None:
+        index = 0
+        async for item in items:
+            await slots.acquire()
+            task = asyncio.create_task(call(index, item))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            index += 1
+        if running:
+            await asyncio.gather(*running)
+        await results.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            getter = asyncio.ensure_future(results.get())
+            await asyncio.wait(
+                (getter, producer), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not getter.done() and producer.exception() is not None:
+                getter.cancel()
+                producer.result()
+            # a producer that finished has queued ``done`` last
+            result = await getter
+            if result is done:
+                break
+            yield result
+            slots.release()
+    finally:
+        producer.cancel()
+        for task in list(running):
+            task.cancel()
+
+
+def ndjson_line(item) -> bytes:
+    return pydantic_core.to_json(item) + b'\n'
+
+
+def sse_event(item, event: str, id=None) -> bytes:
+    """
+    Formats ``item`` as a server-sent event whose data is its JSON.
+    """
+    head = f'event: {event}\n'
+    if id is not None:
+        head += f'id: {id}\n'
+    return head.encode() + b'data: ' + pydantic_core.to_json(item) + b'\n\n'
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    A streaming response whose content is produced while the request body
+    is still being read.
+
+    ``StreamingResponse`` watches for the client disconnecting by reading
+    ``receive`` next to the stream, which would steal the chunks of a
+    request body read by the content. This one only sends the content, so
+    the content must stop by itself once the client is gone, for instance
+    checking ``Request.is_disconnected`` after the body was read.
+    """
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,479 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional, Protocol
+
+import requests
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+REQUEST_ID = re.compile(r'^[\w.:-]{1,128}$')
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    A timed operation of a trace, recorded and exported when it ends.
+
+    Used as a context manager, it becomes the parent of the spans started
+    inside it, and an exception leaving it marks it as failed. Every span
+    carries the ``request.id`` of the request its trace belongs to.
+    """
+
+    __slots__ = (
+        'tracer',
+        'name',
+        'kind',
+        'trace_id',
+        'span_id',
+        'parent_id',
+        'request_id',
+        'attributes',
+        'start_ns',
+        'end_ns',
+        'status',
+        'status_message',
+        '_token',
+    )
+    sampled = True
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        tracer: 'Tracer',
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        kind: int = INTERNAL,
+        attributes: Optional[dict] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.attributes = attributes or {}
+        if request_id is not None:
+            self.attributes['request.id'] = request_id
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = STATUS_OK
+        self.status_message = ''
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = STATUS_ERROR
+            self.status_message = f'{exc_type.__name__}: {exc}'
+        _current.reset(self._token)
+        self.tracer._finish(self)
+
+
+class NonRecordingSpan:
+    """
+    A span of a trace left out by sampling. It records nothing, but keeps
+    the trace and request ids, so the spans started inside it are left out
+    as well and the request id still reaches the response.
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'request_id', '_token')
+    sampled = False
+
+    def __init__(
+        self,
+        trace_id: str = '0' * 32,
+        span_id: str = '0' * 16,
+        request_id: Optional[str] = None,
+    ):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.request_id = request_id
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def __enter__(self) -> 'NonRecordingSpan':
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current.reset(self._token)
+
+
+class _NoopSpan:
+    # the child of a non recording span, which needs no context of its own
+    sampled = False
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current: ContextVar = ContextVar('span', default=None)
+
+
+def current_span():
+    """
+    Returns the span of the running code, or None outside any trace.
+    """
+    return _current.get()
+
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [
+        {'key': key, 'value': _attribute_value(value)}
+        for key, value in attributes.items()
+    ]
+
+
+def _otlp_span(span: Span) -> dict:
+    return {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'parentSpanId': span.parent_id or '',
+        'name': span.name,
+        'kind': span.kind,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': _otlp_attributes(span.attributes),
+        'status': {'code': span.status, 'message': span.status_message},
+    }
+
+
+def otlp_json(spans: list[Span], service_name: str) -> dict:
+    """
+    Returns spans as an OTLP/JSON ``ExportTraceServiceRequest``, the body
+    an OpenTelemetry collector accepts on ``/v1/traces``.
+    """
+    resource = {'attributes': _otlp_attributes({'service.name': service_name})}
+    scope_spans = {
+        'scope': {'name': __name__},
+        'spans': [_otlp_span(span) for span in spans],
+    }
+    return {
+        'resourceSpans': [{'resource': resource, 'scopeSpans': [scope_spans]}]
+    }
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span], service_name: str) -> None: ...
+
+
+class InMemorySpanExporter:
+    """
+    Keeps exported spans in ``spans``, for tests.
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span], service_name: str) -> None:
+        self.spans.extend(spans)
+
+
+class FileSpanExporter:
+    """
+    Appends every batch of spans to a file as one line of OTLP/JSON, the
+    format of the file exporter of the OpenTelemetry collector, so the file
+    can be replayed into a collector or read by tests.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span], service_name: str) -> None:
+        line = json.dumps(otlp_json(spans, service_name)) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+
+class OTLPSpanExporter:
+    """
+    Posts batches of spans as OTLP/JSON to a collector's HTTP endpoint.
+
+    Export failures are counted in ``failed`` and the batch is dropped, so
+    a collector that is down never slows requests down.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.timeout = timeout
+        self.failed = 0
+        self.session = requests.Session()
+
+    def export(self, spans: list[Span], service_name: str) -> None:
+        try:
+            response = self.session.post(
+                self.url,
+                json=otlp_json(spans, service_name),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            self.failed += len(spans)
+
+
+class Tracer:
+    """
+    Starts spans and hands the finished ones to an exporter in batches.
+
+    Sampling is decided once per trace, at its root span: a trace is
+    recorded with probability ``sample_rate``, or as the ``traceparent``
+    header of the caller says, and every span under a root left out costs
+    a context lookup and nothing else. Finished spans are queued and
+    exported by a background thread every ``export_interval`` seconds or
+    once ``batch_size`` are waiting; when the exporter falls behind more
+    than ``max_queue`` spans, the oldest are dropped.
+
+    Attributes
+    ----------
+    exported : int
+        Number of spans handed to the exporter.
+    dropped : int
+        Number of spans dropped from a full queue.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        exporter: Optional[SpanExporter] = None,
+        *,
+        sample_rate: float = 1.0,
+        service_name: str = 'openweathergit',
+        batch_size: int = 512,
+        max_queue: int = 2048,
+        export_interval: float = 5.0,
+    ):
+        """
+        Parameters
+        ----------
+        exporter : SpanExporter, optional
+            Destination of the finished spans (default: None, nothing is
+            recorded).
+        sample_rate : float, optional
+            Share of the traces recorded, from 0 to 1 (default: 1.0).
+        service_name : str, optional
+            ``service.name`` of the exported spans (default: openweathergit).
+        batch_size : int, optional
+            Spans waiting that trigger an export (default: 512).
+        max_queue : int, optional
+            Maximum number of spans waiting for export (default: 2048).
+        export_interval : float, optional
+            Seconds between two exports of the spans waiting (default: 5.0).
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.export_interval = export_interval
+        self.exported = 0
+        self.dropped = 0
+        self._queue: deque[Span] = deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sampled(self) -> bool:
+        return self.exporter is not None and (
+            self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        )
+
+    def span(self, name: str, kind: int = INTERNAL, **attributes):
+        """
+        Returns a span named ``name`` to be used as a context manager,
+        child of the current span or the root of a new trace.
+        """
+        parent = _current.get()
+        if parent is None:
+            return self.start_trace(name, kind=kind, attributes=attributes)
+        if not parent.sampled:
+            return NOOP_SPAN
+        return Span(
+            self,
+            name,
+            parent.trace_id,
+            parent.span_id,
+            parent.request_id,
+            kind,
+            attributes,
+        )
+
+    def start_trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        request_id: Optional[str] = None,
+        kind: int = INTERNAL,
+        attributes: Optional[dict] = None,
+    ):
+        """
+        Returns the root span of a new trace, continuing the trace of a W3C
+        ``traceparent`` header when one is given, recorded or not as the
+        head sampling decides.
+        """
+        match = TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = self.exporter is not None and int(flags, 16) & 1
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = self._sampled()
+        if not sampled:
+            return NonRecordingSpan(
+                trace_id, parent_id or '0' * 16, request_id
+            )
+        return Span(
+            self, name, trace_id, parent_id, request_id, kind, attributes
+        )
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(span)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Exports the spans waiting, in the calling thread.
+        """
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+        if spans and self.exporter is not None:
+            self.exporter.export(spans, self.service_name)
+            self.exported += len(spans)
+
+    def start(self) -> None:
+        """
+        Starts the thread exporting the finished spans.
+        """
+        if self._thread is None and self.exporter is not None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._work, name='trace-exporter', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the export thread and exports the spans left.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.export_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Span export failed')
+
+    def stats(self) -> dict:
+        return {
+            'exported': self.exported,
+            'dropped': self.dropped,
+            'queued': len(self._queue),
+        }
+
+
+class TracingMiddleware:
+    """
+    Runs every HTTP request in the root span of a trace named after its
+    method and route template, and tags it with a request id.
+
+    The id is taken from the ``X-Request-ID`` header of the request when it
+    is a sane one and generated otherwise, carried by every span of the
+    trace and returned in the ``X-Request-ID`` response header, sampled or
+    not. A ``traceparent`` header continues the caller's trace and its
+    sampling decision.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_id = headers.get('x-request-id', '')
+        if not REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        root = self.tracer.start_trace(
+            scope['method'],
+            traceparent=headers.get('traceparent'),
+            request_id=request_id,
+            kind=SERVER,
+            attributes={'http.method': scope['method']},
+        )
+        header = (b'x-request-id', request_id.encode())
+
+        async def send_traced(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), header]
+                root.set_attribute('http.status_code', message['status'])
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                if root.sampled:
+                    route = scope.get('route')
+                    path = route.path if route is not None else scope['path']
+                    root.name = f'{scope["method"]} {path}'
+                    root.set_attribute('http.route', path)
@@ -1,6 +1,17 @@
+import hashlib
+import os
+import threading
 from datetime import datetime
+from functools import lru_cache, wraps
+from typing import Optional
 
-from github import Github, GithubException, InputFileContent
+from app.aggregation import aggregate_daily, forecast_columns
+from app.gist import GistClient, GistIndex
+from app.openweathersdk.resilience import CircuitBreaker, RetryPolicy
+
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(
+    os.path.expanduser('~'), '.openweathergit'
+)
 
 
 def format_datetime_into_date(
@@ -14,16 +25,112 @@ def format_datetime_into_date(
     return format_date
 
 
-def create_gist(token: str, gist_name: str, content: str):
-    g = Github(token)
-    user = g.get_user()
-    try:
-        gist_file = {gist_name: InputFileContent(content)}
-        gist = user.create_gist(
-            public=True,
-            files=gist_file,
-            description='Weather forecast message',
-        )
-    except GithubException as e:
-        raise GithubException(e.message)
-    return gist.html_url
+def build_forecast_message(forecast, symbol: str) -> str:
+    city = forecast.city.name
+    current_forecast = forecast.list[0]
+    current_temp = current_forecast.main.temp
+    if current_temp.is_integer():
+        current_temp = int(current_temp)
+    current_weather = current_forecast.weather[0].description
+
+    current_day, *next_days = aggregate_daily(forecast_columns(forecast))
+
+    current_forecast_text = (
+        f'{current_temp}{symbol} e {current_weather} em {city} '
+        f'em {current_day.date:%d/%m}. '
+    )
+
+    next_days_forecast_text = 'Média para os próximos dias: ' + ', '.join(
+        f'{int(day.temp_mean)}{symbol} em {day.date:%d/%m}'
+        for day in next_days
+    )
+
+    return current_forecast_text + next_days_forecast_text + '.'
+
+
+def make_etag(*parts) -> str:
+    """
+    Returns a strong entity tag derived from the ``repr`` of ``parts``,
+    stable across processes unlike ``hash``.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an ``If-None-Match`` header matches ``etag``, comparing weakly
+    as RFC 9110 requires for that header.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag.removeprefix('W/') for tag in tags)
+
+
+def data_path(name: str) -> str:
+    """
+    Returns the path of ``name`` in ``DATA_DIR``, where the SQLite
+    databases and the profiles live, creating the directory if missing.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+@lru_cache
+def get_gist_index() -> GistIndex:
+    return GistIndex(
+        os.getenv('GIST_INDEX_PATH') or data_path('gist_index.sqlite3')
+    )
+
+
+def get_github_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        attempts=int(os.getenv('GITHUB_RETRY_ATTEMPTS', '3')),
+        backoff=float(os.getenv('GITHUB_RETRY_BACKOFF', '0.2')),
+    )
+
+
+@lru_cache
+def get_github_circuit_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        'GitHub',
+        failure_threshold=int(os.getenv('GITHUB_BREAKER_THRESHOLD', '5')),
+        recovery_timeout=float(os.getenv('GITHUB_BREAKER_RECOVERY', '30')),
+    )
+
+
+def memoized(function):
+    """
+    Caches the results of ``function`` by its positional arguments, like
+    ``functools.cache``, and adds ``peek(*args)``, returning the result
+    cached for ``args`` or None without calling ``function``.
+    """
+    results = {}
+    lock = threading.Lock()
+
+    @wraps(function)
+    def getter(*args):
+        with lock:
+            if args not in results:
+                results[args] = function(*args)
+            return results[args]
+
+    getter.peek = lambda *args: results.get(args)
+    getter.cache_clear = results.clear
+    return getter
+
+
+@memoized
+def get_gist_client(token: str, tracer=None) -> GistClient:
+    return GistClient(
+        token,
+        index=get_gist_index(),
+        retry_policy=get_github_retry_policy(),
+        circuit_breaker=get_github_circuit_breaker(),
+        tracer=tracer,
+    )
+
+
+def create_gist(token: str, gist_name: str, content: str, tracer=None) -> str:
+    return get_gist_client(token, tracer).publish(gist_name, content)
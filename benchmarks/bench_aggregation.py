@@ -0,0 +1,50 @@
+"""
+Daily aggregation of a 40-step forecast: the former ``strptime`` +
+``defaultdict`` + ``statistics.mean`` loop against ``aggregate_daily``.
+
+Run with ``python -m benchmarks.bench_aggregation``.
+"""
+
+import timeit
+from collections import defaultdict
+from statistics import mean
+
+from app.aggregation import aggregate_daily, forecast_columns
+from app.openweathersdk.openweather import WeatherForecast
+from app.util import format_datetime_into_date
+from tests.mocks import mock_response
+
+ROUNDS = 2000
+
+
+def strptime_loop(forecast):
+    current_date = format_datetime_into_date(
+        forecast.list[0].dt_txt, '%Y-%m-%d %H:%M:%S', '%d/%m'
+    )
+    temps_by_day = defaultdict(list)
+    for item in forecast.list:
+        day = format_datetime_into_date(
+            item.dt_txt, '%Y-%m-%d %H:%M:%S', '%d/%m'
+        )
+        if day != current_date:
+            temps_by_day[day].append(item.main.temp)
+    return {day: mean(temps) for day, temps in temps_by_day.items()}
+
+
+def main():
+    forecast = WeatherForecast(**mock_response)
+    columns = forecast_columns(forecast)
+    cases = {
+        'strptime loop': lambda: strptime_loop(forecast),
+        'columns + aggregate': lambda: aggregate_daily(
+            forecast_columns(forecast)
+        ),
+        'aggregate only': lambda: aggregate_daily(columns),
+    }
+    for label, case in cases.items():
+        elapsed = min(timeit.repeat(case, number=ROUNDS, repeat=5))
+        print(f'{label:<20} {elapsed / ROUNDS * 1e6:10.1f} us/forecast')
+
+
+if __name__ == '__main__':
+    main()
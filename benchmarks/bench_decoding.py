@@ -0,0 +1,34 @@
+"""
+Parse time per forecast of the raw response body of ``mock_response``.
+
+Run with ``python -m benchmarks.bench_decoding``.
+"""
+
+import json
+import timeit
+
+from app.openweathersdk.decoding import decode_forecast, loads
+from app.openweathersdk.openweather import WeatherForecast
+from app.openweathersdk.series import ForecastSeries
+from tests.mocks import mock_response
+
+ROUNDS = 500
+
+
+def main():
+    raw = json.dumps(mock_response).encode()
+    cases = {
+        'json.loads + model': lambda: WeatherForecast(**json.loads(raw)),
+        'model_validate_json': lambda: decode_forecast(raw),
+        'json.loads + series': lambda: ForecastSeries.from_dict(
+            json.loads(raw)
+        ),
+        'loads + series': lambda: ForecastSeries.from_dict(loads(raw)),
+    }
+    for label, case in cases.items():
+        elapsed = min(timeit.repeat(case, number=ROUNDS, repeat=5))
+        print(f'{label:<22} {elapsed / ROUNDS * 1e6:10.1f} us/forecast')
+
+
+if __name__ == '__main__':
+    main()
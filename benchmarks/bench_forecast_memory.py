@@ -0,0 +1,39 @@
+"""
+Memory held per cached forecast: ``WeatherForecast`` models against the
+array-backed ``ForecastSeries``.
+
+Run with ``python -m benchmarks.bench_forecast_memory``.
+"""
+
+import gc
+import tracemalloc
+
+from app.openweathersdk.openweather import WeatherForecast
+from app.openweathersdk.series import ForecastSeries
+from tests.mocks import mock_response
+
+FORECASTS = 500
+
+
+def _bytes_per_forecast(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = [build() for _ in range(FORECASTS)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / FORECASTS
+
+
+def main():
+    ForecastSeries.from_dict(mock_response)
+    cases = {
+        'WeatherForecast': lambda: WeatherForecast(**mock_response),
+        'ForecastSeries': lambda: ForecastSeries.from_dict(mock_response),
+    }
+    for label, build in cases.items():
+        print(f'{label:<20} {_bytes_per_forecast(build):10.0f} bytes/forecast')
+
+
+if __name__ == '__main__':
+    main()
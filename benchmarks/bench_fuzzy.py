@@ -0,0 +1,137 @@
+"""
+Fuzzy city search over 200k synthetic names: index build time, table size,
+search latency percentiles and how often the misspelled name is found.
+
+Names are drawn from a character-pair Markov chain trained on real city
+names, so their spelling and their trigrams are realistic, and queries are
+those names with one random typo and their accents stripped.
+
+Run with ``python -m benchmarks.bench_fuzzy``.
+"""
+
+import random
+import string
+import time
+from collections import defaultdict
+
+from app.openweathersdk.cache import normalize_query
+from app.openweathersdk.fuzzy import FuzzyCityIndex
+
+CITIES = 200_000
+QUERIES = 5_000
+MIN_LENGTH, MAX_LENGTH = 3, 28
+SUBSTITUTE, INSERT, DELETE, TRANSPOSE = range(4)
+SEED_NAMES = """
+São Paulo, Rio de Janeiro, Belo Horizonte, Salvador, Fortaleza, Natal,
+Recife, Curitiba, Porto Alegre, Manaus, Belém, Goiânia, Campinas, São Luís,
+Maceió, Teresina, João Pessoa, Florianópolis, Vitória, Cuiabá, Aracaju,
+Londrina, Joinville, Uberlândia, Sorocaba, Ribeirão Preto, Mossoró,
+Parnamirim, Caicó, Juazeiro do Norte, Petrolina, Campina Grande,
+New York, Los Angeles, Chicago, Houston, Phoenix, Philadelphia, San Antonio,
+San Diego, Dallas, San Jose, Austin, Jacksonville, Columbus, Charlotte,
+Indianapolis, Seattle, Denver, Washington, Boston, Nashville, Detroit,
+Portland, Memphis, Louisville, Baltimore, Milwaukee, Albuquerque, Tucson,
+Fresno, Sacramento, Kansas City, Atlanta, Omaha, Raleigh, Miami, Oakland,
+London, Birmingham, Manchester, Liverpool, Leeds, Sheffield, Bristol,
+Glasgow, Edinburgh, Cardiff, Belfast, Paris, Marseille, Lyon, Toulouse,
+Nice, Nantes, Strasbourg, Montpellier, Bordeaux, Lille, Rennes, Reims,
+Berlin, Hamburg, München, Köln, Frankfurt am Main, Stuttgart, Düsseldorf,
+Dortmund, Essen, Leipzig, Bremen, Dresden, Hannover, Nürnberg, Duisburg,
+Madrid, Barcelona, Valencia, Sevilla, Zaragoza, Málaga, Murcia, Palma,
+Bilbao, Alicante, Córdoba, Valladolid, Vigo, Gijón, Lisboa, Porto, Braga,
+Coimbra, Funchal, Setúbal, Roma, Milano, Napoli, Torino, Palermo, Genova,
+Bologna, Firenze, Bari, Catania, Venezia, Verona, Messina, Padova, Trieste,
+Buenos Aires, Rosario, Mendoza, La Plata, Mar del Plata, Salta, Santa Fe,
+San Juan, Resistencia, Santiago del Estero, Corrientes, Posadas, Neuquén,
+Ciudad de México, Guadalajara, Monterrey, Puebla, Tijuana, León, Juárez,
+Zapopan, Mérida, San Luis Potosí, Aguascalientes, Hermosillo, Saltillo,
+Mexicali, Culiacán, Querétaro, Morelia, Chihuahua, Bogotá, Medellín, Cali,
+Barranquilla, Cartagena, Cúcuta, Bucaramanga, Pereira, Santa Marta, Ibagué,
+Lima, Arequipa, Trujillo, Chiclayo, Piura, Iquitos, Cusco, Huancayo,
+Santiago, Valparaíso, Concepción, Antofagasta, Temuco, Rancagua, Talca
+"""
+
+
+def markov_chain() -> dict[str, list[str]]:
+    chain = defaultdict(list)
+    for name in SEED_NAMES.replace('\n', ' ').split(','):
+        padded = f'^^{name.strip()}$'
+        for i in range(len(padded) - 2):
+            chain[padded[i : i + 2]].append(padded[i + 2])
+    return chain
+
+
+def synthetic_names(rng, count: int) -> list[str]:
+    chain = markov_chain()
+    names = []
+    while len(names) < count:
+        name = '^^'
+        while len(name) < len('^^') + MAX_LENGTH:
+            char = rng.choice(chain[name[-2:]])
+            if char == '$':
+                break
+            name += char
+        name = name[2:].strip()
+        if MIN_LENGTH <= len(name) <= MAX_LENGTH:
+            names.append(name)
+    return names
+
+
+def misspell(rng, name: str) -> str:
+    key = normalize_query(name)
+    i = rng.randrange(len(key))
+    char = rng.choice(string.ascii_lowercase)
+    edit = rng.randrange(TRANSPOSE + 1)
+    if edit == SUBSTITUTE:
+        return key[:i] + char + key[i + 1 :]
+    if edit == INSERT:
+        return key[:i] + char + key[i:]
+    if edit == DELETE and len(key) > MIN_LENGTH:
+        return key[:i] + key[i + 1 :]
+    if i + 1 < len(key):
+        return key[:i] + key[i + 1] + key[i] + key[i + 2 :]
+    return key + char
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    rng = random.Random(42)
+    names = synthetic_names(rng, CITIES)
+    populations = [int(rng.paretovariate(1.2) * 1000) for _ in names]
+
+    start = time.perf_counter()
+    index = FuzzyCityIndex()
+    index.extend(zip(names, populations))
+    print(f'{"build index":<22} {time.perf_counter() - start:10.2f} s')
+    print(f'{"distinct names":<22} {len(index):10d}')
+    print(f'{"table":<22} {len(index._table) * 8 / 2**20:10.1f} MiB')
+
+    targets = [rng.choice(names) for _ in range(QUERIES)]
+    queries = [misspell(rng, name) for name in targets]
+    for query in queries[:500]:
+        index.search(query)
+
+    latencies = []
+    found = 0
+    for target, query in zip(targets, queries):
+        start = time.perf_counter()
+        matches = index.search(query)
+        latencies.append(time.perf_counter() - start)
+        found += normalize_query(target) in {
+            normalize_query(match.name) for match in matches
+        }
+    latencies.sort()
+
+    for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        print(
+            f'{"search " + label:<22} '
+            f'{percentile(latencies, fraction) * 1e3:10.3f} ms'
+        )
+    print(f'{"recall@5":<22} {found / QUERIES:10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Offline gazetteer over a synthetic ``city.list.json`` of 200k cities:
+index build and load time, memory footprint and lookup latency, against
+keeping the decoded list in a dict.
+
+Run with ``python -m benchmarks.bench_gazetteer``.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from app.openweathersdk.cache import normalize_query
+from app.openweathersdk.gazetteer import Gazetteer, build_index
+
+CITIES = 200_000
+ROUNDS = 20_000
+SYLLABLES = (
+    'na tal sao pau lo ri o be lem for ta le za ma ca ju ran gua ber lin '
+    'vi to ria cu ti ba flo ri an po lis goi ni pal mas rec fe sal va dor'
+).split()
+
+
+def synthetic_city_list(rng) -> list[dict]:
+    return [
+        {
+            'id': index,
+            'name': ''.join(
+                rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))
+            ).title(),
+            'state': '',
+            'country': rng.choice(['BR', 'US', 'AR', 'PT', 'DE']),
+            'coord': {
+                'lat': rng.uniform(-60, 70),
+                'lon': rng.uniform(-180, 180),
+            },
+        }
+        for index in range(CITIES)
+    ]
+
+
+def load_dict(source: str) -> dict:
+    by_name = {}
+    with open(source, encoding='utf-8') as file:
+        for city in json.load(file):
+            by_name.setdefault(normalize_query(city['name']), []).append(city)
+    return by_name
+
+
+def measure(label, case):
+    elapsed = min(timeit.repeat(case, number=ROUNDS, repeat=3))
+    print(f'{label:<22} {elapsed / ROUNDS * 1e6:10.2f} us/lookup')
+
+
+def main():
+    rng = random.Random(42)
+    cities = synthetic_city_list(rng)
+    names = [rng.choice(cities)['name'] for _ in range(ROUNDS)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'city.list.json')
+        index_path = source + '.idx'
+        with open(source, 'w', encoding='utf-8') as file:
+            json.dump(cities, file)
+
+        start = time.perf_counter()
+        build_index(source, index_path)
+        print(f'{"build index":<22} {time.perf_counter() - start:10.2f} s')
+
+        start = time.perf_counter()
+        gazetteer = Gazetteer(index_path)
+        load_index = time.perf_counter() - start
+        gazetteer.close()
+
+        tracemalloc.start()
+        gazetteer = Gazetteer(index_path)
+        index_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        by_name = load_dict(source)
+        load_time = time.perf_counter() - start
+        del by_name
+
+        tracemalloc.start()
+        by_name = load_dict(source)
+        dict_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f'{"load json dict":<22} {load_time * 1e3:10.1f} ms')
+        print(f'{"open index":<22} {load_index * 1e3:10.3f} ms')
+        print(f'{"json dict heap":<22} {dict_memory / 2**20:10.1f} MiB')
+        print(f'{"index heap":<22} {index_memory / 2**10:10.1f} KiB')
+        print(
+            f'{"index file (mmap)":<22} '
+            f'{os.path.getsize(index_path) / 2**20:10.1f} MiB'
+        )
+
+        names_iter = iter(names * 3)
+        measure(
+            'dict lookup',
+            lambda: by_name.get(normalize_query(next(names_iter)), [])[:5],
+        )
+        names_iter = iter(names * 3)
+        measure('index lookup', lambda: gazetteer.lookup(next(names_iter)))
+        names_iter = iter(names * 3)
+        measure(
+            'index lookup + country',
+            lambda: gazetteer.lookup(next(names_iter), country='BR'),
+        )
+        names_iter = iter(names * 3)
+        measure(
+            'index prefix search',
+            lambda: gazetteer.search(next(names_iter)[:3]),
+        )
+        gazetteer.close()
+
+
+if __name__ == '__main__':
+    main()
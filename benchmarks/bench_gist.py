@@ -0,0 +1,77 @@
+"""
+Per-gist latency of a fresh PyGithub ``Github`` client per call, as
+``create_gist`` used to do, against the pooled ``GistClient``. Both talk
+to a local stand-in for the GitHub REST API.
+
+Run with ``python -m benchmarks.bench_gist``.
+"""
+
+import json
+import time
+
+from github import Auth, Github, InputFileContent
+
+from app.gist import GistClient
+from benchmarks.server import LocalServer, MockResponseHandler
+
+CALLS = 200
+
+
+class GithubHandler(MockResponseHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json(200, {'login': 'octocat', 'id': 1})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self._send_json(
+            201,
+            {
+                'id': 'abc',
+                'url': f'http://{self.headers["Host"]}/gists/abc',
+                'html_url': 'https://gist.github.com/abc',
+                'files': {},
+            },
+        )
+
+
+def pygithub_per_call(base_url):
+    g = Github(auth=Auth.Token('token'), base_url=base_url.rstrip('/'))
+    user = g.get_user()
+    gist = user.create_gist(
+        public=True,
+        files={'forecast': InputFileContent('content')},
+        description='Weather forecast message',
+    )
+    return gist.html_url
+
+
+def _bench(label, create):
+    create()
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        create()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<22} {elapsed / CALLS * 1e6:10.1f} us/gist')
+
+
+def main():
+    with LocalServer(GithubHandler) as server:
+        client = GistClient('token', base_url=server.url)
+        _bench('PyGithub per call', lambda: pygithub_per_call(server.url))
+        _bench(
+            'pooled GistClient',
+            lambda: client.create_gist('forecast', 'content'),
+        )
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Per-call latency of bare ``requests.get`` against the pooled session of
+``OpenWeather``, both talking to a local keep-alive server.
+
+Run with ``python -m benchmarks.bench_http_session``.
+"""
+
+import time
+
+import requests
+
+from app.openweathersdk.openweather import OpenWeather
+from benchmarks.server import LocalServer
+
+CALLS = 500
+
+
+def _bench(label, get, url):
+    get(url)
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        get(url).raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<20} {elapsed / CALLS * 1e6:10.1f} us/call')
+
+
+def main():
+    with LocalServer() as server, OpenWeather() as opw:
+        _bench('requests.get', requests.get, server.url)
+        _bench(
+            'pooled session',
+            lambda url: opw.session.get(url, timeout=opw.timeout),
+            server.url,
+        )
+
+
+if __name__ == '__main__':
+    main()
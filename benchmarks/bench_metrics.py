@@ -0,0 +1,86 @@
+"""
+Cost of the request instrumentation: one ``stage`` block, a histogram
+observation, and ``MetricsMiddleware`` wrapped around an ASGI app that
+answers right away, against the bare app.
+
+Run with ``python -m benchmarks.bench_metrics``.
+"""
+
+import asyncio
+import timeit
+
+from app.metrics import Histogram, MetricsMiddleware, stage
+
+ROUNDS = 100_000
+SCOPE = {
+    'type': 'http',
+    'method': 'GET',
+    'path': '/get-weather-forecast',
+    'headers': [],
+}
+
+
+async def endpoint(scope, receive, send):
+    with stage('aggregate'):
+        pass
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b''}
+
+
+async def send(message):
+    pass
+
+
+def request_timer(app):
+    loop = asyncio.new_event_loop()
+
+    async def requests(number: int):
+        for _ in range(number):
+            await app(dict(SCOPE), receive, send)
+
+    return lambda number: loop.run_until_complete(requests(number))
+
+
+def measure(case, number: int = ROUNDS) -> float:
+    return min(timeit.repeat(case, number=number, repeat=3)) / number
+
+
+def measure_requests(app, number: int = ROUNDS // 10) -> float:
+    run = request_timer(app)
+    return min(timeit.repeat(lambda: run(number), number=1, repeat=3)) / (
+        number
+    )
+
+
+def main():
+    histogram = Histogram('bench_seconds', 'Benchmark.', ('stage',))
+    child = histogram.labels('fetch')
+
+    def timed_stage():
+        with stage('fetch'):
+            pass
+
+    bare = measure_requests(endpoint)
+    instrumented = measure_requests(MetricsMiddleware(endpoint))
+    cases = [
+        ('histogram observe', measure(lambda: child.observe(0.01))),
+        (
+            'histogram labels + observe',
+            measure(lambda: histogram.labels('fetch').observe(0.01)),
+        ),
+        ('stage block', measure(timed_stage)),
+        ('bare request', bare),
+        ('instrumented request', instrumented),
+        ('middleware overhead', instrumented - bare),
+    ]
+    print(f'{"case":<28} {"time":>8}')
+    for label, seconds in cases:
+        print(f'{label:<28} {seconds * 1e6:6.2f}us')
+
+
+if __name__ == '__main__':
+    main()
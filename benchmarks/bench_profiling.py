@@ -0,0 +1,73 @@
+"""
+Cost of profiling: one sample of a thread 30 frames deep, and the time of
+CPU-bound work alone, under the continuous profiler and under the 1 ms
+sampling of a profiled request.
+
+Run with ``python -m benchmarks.bench_profiling``.
+"""
+
+import tempfile
+import threading
+import timeit
+
+from app.profiling import ContinuousProfiler, ProfileStore, SamplingProfiler
+
+ROUNDS = 1_000
+
+
+def measure(case, number: int = ROUNDS) -> float:
+    return min(timeit.repeat(case, number=number, repeat=3)) / number
+
+
+def nested(depth: int, ready: threading.Event, done: threading.Event):
+    if depth:
+        return nested(depth - 1, ready, done)
+    ready.set()
+    done.wait()
+
+
+def work():
+    sum(i * i for i in range(10_000))
+
+
+def under(profiler: SamplingProfiler) -> float:
+    profiler.start()
+    try:
+        return measure(work, number=200)
+    finally:
+        profiler.stop()
+
+
+def main():
+    ready, done = threading.Event(), threading.Event()
+    thread = threading.Thread(target=nested, args=(30, ready, done))
+    thread.start()
+    ready.wait()
+    sampler = SamplingProfiler(thread_ids=[thread.ident])
+    per_sample = measure(sampler.sample)
+    done.set()
+    thread.join()
+
+    alone = measure(work, number=200)
+    with tempfile.TemporaryDirectory() as directory:
+        continuous = under(ContinuousProfiler(ProfileStore(directory)))
+    request = under(SamplingProfiler(interval=0.001))
+
+    cases = [
+        ('sample of 30 frames', per_sample),
+        ('work alone', alone),
+        ('work, continuous 10 Hz', continuous),
+        ('work, request 1 kHz', request),
+    ]
+    print(f'{"case":<24} {"time":>9} {"overhead":>9}')
+    for label, seconds in cases:
+        overhead = (
+            f'{(seconds / alone - 1) * 100:8.1f}%'
+            if label.startswith('work,')
+            else ''
+        )
+        print(f'{label:<24} {seconds * 1e6:7.1f}us {overhead:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Serialization CPU and bytes on the wire per response: FastAPI validating
+the result against its ``response_model`` and encoding it with the stdlib
+``json``, against ``FastJSONResponse`` serializing the models as they are,
+then the size of the body with gzip and brotli.
+
+Run with ``python -m benchmarks.bench_responses``.
+"""
+
+import asyncio
+import timeit
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.compression import Encoder, brotli
+from app.openweathersdk.models import City
+from app.responses import FastJSONResponse
+from app.schemas import BatchForecast, ListCityLocation, NearestCitiesBatch
+
+ROUNDS = 500
+LOCAL_NAMES = {
+    code: f'Natal ({code})'
+    for code in (
+        'af ar az be bg ca cs da de el en eo es et eu fa fi fr gl he hi hr '
+        'hu hy id it ja ka kk ko la lt lv mk ml mr ms nl no pl pt ro ru sk '
+        'sl sr sv ta th tr uk ur uz vi zh'
+    ).split()
+}
+
+
+def city(index: int, local_names: dict) -> City:
+    return City(
+        name=f'Natal {index}',
+        local_names=local_names,
+        lat=-5.795 + index / 100,
+        lon=-35.209 - index / 100,
+        country='BR',
+        state='Rio Grande do Norte',
+    )
+
+
+def payloads() -> list[tuple[str, type, dict]]:
+    return [
+        (
+            'city location x5',
+            ListCityLocation,
+            {'locations': [city(index, LOCAL_NAMES) for index in range(5)]},
+        ),
+        (
+            'nearest batch 100x5',
+            NearestCitiesBatch,
+            {
+                'results': [
+                    {'locations': [city(index, {}) for index in range(5)]}
+                    for _ in range(100)
+                ]
+            },
+        ),
+        (
+            'forecast batch x100',
+            BatchForecast,
+            {
+                'results': [
+                    {
+                        'latitude': -5.795 + index / 100,
+                        'longitude': -35.209,
+                        'msg': '28.11°C e nublado em Natal em 24/09. '
+                        'Média para os próximos dias: 25°C em 25/09, '
+                        '25°C em 26/09, 26°C em 27/09, 26°C em 28/09, '
+                        '25°C em 29/09.',
+                        'stale': False,
+                    }
+                    for index in range(100)
+                ]
+            },
+        ),
+    ]
+
+
+def validated_renderer(model: type, content: dict):
+    field = create_model_field(
+        name='response', type_=model, mode='serialization'
+    )
+    loop = asyncio.new_event_loop()
+
+    def render() -> bytes:
+        serialized = loop.run_until_complete(
+            serialize_response(field=field, response_content=content)
+        )
+        return JSONResponse(serialized).body
+
+    return render
+
+
+def measure(case) -> float:
+    return min(timeit.repeat(case, number=ROUNDS, repeat=3)) / ROUNDS
+
+
+def main():
+    print(
+        f'{"response":<20} {"validated":>9} {"fast":>7} {"gzip":>7} '
+        f'{"br":>7} {"identity":>9} {"gzip":>7} {"br":>7}'
+    )
+    for label, model, content in payloads():
+        validated_time = measure(validated_renderer(model, content))
+        fast_time = measure(lambda: FastJSONResponse(content).body)
+        body = FastJSONResponse(content).body
+        sizes, times = [], []
+        for encoding in ('gzip', 'br'):
+            if encoding == 'br' and brotli is None:
+                sizes.append(float('nan'))
+                times.append(float('nan'))
+                continue
+            sizes.append(len(Encoder(encoding).last(body)))
+            times.append(measure(lambda: Encoder(encoding).last(body)))
+        print(
+            f'{label:<20} {validated_time * 1e6:7.0f}us '
+            f'{fast_time * 1e6:5.0f}us {times[0] * 1e6:5.0f}us '
+            f'{times[1] * 1e6:5.0f}us {len(body):8d}B '
+            f'{sizes[0]:6.0f}B {sizes[1]:6.0f}B'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Insert, radius query and removal on ``GridIndex``, and build and 5 nearest
+neighbours query on ``KDTree``, with hundreds of thousands of random
+points, against a linear scan for the queries.
+
+Run with ``python -m benchmarks.bench_spatial``.
+"""
+
+import random
+import time
+
+from app.openweathersdk.spatial import GridIndex, KDTree, haversine_km
+
+POINTS = 300_000
+QUERIES = 2000
+RADIUS_KM = 2.0
+NEIGHBOURS = 5
+
+
+def main():
+    rng = random.Random(42)
+    points = [
+        (index, rng.uniform(-60, 70), rng.uniform(-180, 180))
+        for index in range(POINTS)
+    ]
+    queries = [
+        (rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(QUERIES)
+    ]
+    index = GridIndex(RADIUS_KM)
+
+    start = time.perf_counter()
+    for item, lat, lon in points:
+        index.insert(item, lat, lon)
+    elapsed = time.perf_counter() - start
+    print(f'{"insert":<12} {elapsed / POINTS * 1e6:10.2f} us/point')
+
+    start = time.perf_counter()
+    for lat, lon in queries:
+        index.within(lat, lon, RADIUS_KM)
+    elapsed = time.perf_counter() - start
+    print(f'{"grid query":<12} {elapsed / QUERIES * 1e6:10.2f} us/query')
+
+    start = time.perf_counter()
+    for lat, lon in queries[:20]:
+        [
+            item
+            for item, item_lat, item_lon in points
+            if haversine_km(lat, lon, item_lat, item_lon) <= RADIUS_KM
+        ]
+    elapsed = time.perf_counter() - start
+    print(f'{"linear scan":<12} {elapsed / 20 * 1e6:10.2f} us/query')
+
+    start = time.perf_counter()
+    for item, _, _ in points:
+        index.remove(item)
+    elapsed = time.perf_counter() - start
+    print(f'{"remove":<12} {elapsed / POINTS * 1e6:10.2f} us/point')
+
+    start = time.perf_counter()
+    tree = KDTree((lat, lon, item) for item, lat, lon in points)
+    elapsed = time.perf_counter() - start
+    print(f'{"kdtree build":<12} {elapsed:10.2f} s')
+
+    start = time.perf_counter()
+    for lat, lon in queries:
+        tree.nearest(lat, lon, NEIGHBOURS)
+    elapsed = time.perf_counter() - start
+    print(f'{"kdtree knn":<12} {elapsed / QUERIES * 1e6:10.2f} us/query')
+
+    start = time.perf_counter()
+    for lat, lon in queries[:20]:
+        sorted(
+            (haversine_km(lat, lon, item_lat, item_lon), item)
+            for item, item_lat, item_lon in points
+        )[:NEIGHBOURS]
+    elapsed = time.perf_counter() - start
+    print(f'{"linear knn":<12} {elapsed / 20 * 1e6:10.2f} us/query')
+
+
+if __name__ == '__main__':
+    main()
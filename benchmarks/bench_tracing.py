@@ -0,0 +1,68 @@
+"""
+Cost of tracing: a root span and its child in a recorded trace and in a
+trace left out by head sampling, a span without a tracer, and the export
+of recorded spans as OTLP/JSON.
+
+Run with ``python -m benchmarks.bench_tracing``.
+"""
+
+import os
+import tempfile
+import timeit
+
+from app.openweathersdk.resilience import NULL_SPAN
+from app.tracing import FileSpanExporter, InMemorySpanExporter, Tracer
+
+ROUNDS = 100_000
+
+
+def measure(case, number: int = ROUNDS) -> float:
+    return min(timeit.repeat(case, number=number, repeat=3)) / number
+
+
+def child_span_timer(tracer: Tracer, sampled: bool):
+    root = tracer.start_trace('GET')
+    if root.sampled != sampled:
+        raise RuntimeError('unexpected sampling decision')
+
+    def child():
+        with root:
+            with tracer.span('fetch', url='http://api'):
+                pass
+        tracer._queue.clear()
+
+    return child
+
+
+def main():
+    recorded = Tracer(InMemorySpanExporter(), sample_rate=1.0)
+    left_out = Tracer(InMemorySpanExporter(), sample_rate=0.0)
+
+    def null_span():
+        with NULL_SPAN:
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'traces.jsonl')
+        exporting = Tracer(FileSpanExporter(path))
+        spans = []
+        for _ in range(512):
+            with exporting.span('fetch', url='http://api', attempt=1) as span:
+                spans.append(span)
+        export = measure(
+            lambda: exporting.exporter.export(spans, 'bench'), number=20
+        )
+
+    cases = [
+        ('no tracer', measure(null_span)),
+        ('root + child left out', measure(child_span_timer(left_out, False))),
+        ('root + child recorded', measure(child_span_timer(recorded, True))),
+        ('file export per span', export / len(spans)),
+    ]
+    print(f'{"span":<24} {"time":>8}')
+    for label, seconds in cases:
+        print(f'{label:<24} {seconds * 1e6:6.2f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,39 @@
 import pytest
 from fastapi.testclient import TestClient
 
-from app.app import app
+from app.app import (
+    app,
+    get_gist_client,
+    get_gist_outbox,
+    get_openweather,
+    publish_gist,
+)
 from app.openweathersdk.openweather import OpenWeather
+from app.outbox import GistOutbox
+from app.util import get_gist_index
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def gist_index(monkeypatch):
+    monkeypatch.setenv('GIST_INDEX_PATH', ':memory:')
+    get_gist_index.cache_clear()
+    get_gist_client.cache_clear()
+    yield get_gist_index()
+    get_gist_index.cache_clear()
+    get_gist_client.cache_clear()
 
 
 @pytest.fixture
@@ -12,5 +43,24 @@ def openweather():
 
 
 @pytest.fixture
-def client():
-    return TestClient(app)
+def gist_outbox(tmp_path):
+    outbox = GistOutbox(publish_gist, path=str(tmp_path / 'outbox.sqlite3'))
+    yield outbox
+    outbox.stop()
+
+
+@pytest.fixture
+def async_openweather(tmp_path, monkeypatch):
+    path = str(tmp_path / 'geocoding.sqlite3')
+    monkeypatch.setenv('GEOCODING_CACHE_PATH', path)
+    get_openweather.cache_clear()
+    yield get_openweather()
+    get_openweather.cache_clear()
+
+
+@pytest.fixture
+def client(gist_outbox, async_openweather):
+    app.dependency_overrides[get_gist_outbox] = lambda: gist_outbox
+    app.dependency_overrides[get_openweather] = lambda: async_openweather
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -1146,3 +1146,12 @@ mock_response = {
         'sunset': 1727208979,
     },
 }
+
+mock_city = {
+    'name': 'Natal',
+    'local_names': {'pt': 'Natal', 'en': 'Natal'},
+    'lat': -5.805398,
+    'lon': -35.2080905,
+    'country': 'BR',
+    'state': 'Rio Grande do Norte',
+}
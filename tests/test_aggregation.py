@@ -0,0 +1,50 @@
+from datetime import date
+from statistics import mean
+
+from app.aggregation import (
+    ForecastColumns,
+    aggregate_daily,
+    forecast_columns,
+)
+from app.openweathersdk.openweather import WeatherForecast
+from tests.mocks import mock_response
+
+HOUR = 60 * 60
+
+
+def test_days_follow_city_timezone():
+    midnight = 1727654400  # 2024-09-30 00:00:00 UTC
+    columns = ForecastColumns(
+        dt=[midnight - HOUR, midnight + HOUR, midnight + 4 * HOUR],
+        temp=[10.0, 20.0, 30.0],
+        pop=[0.1, 0.5, 0.2],
+        condition=['chuva', 'nublado', 'nublado'],
+    )
+
+    utc = aggregate_daily(columns)
+    shifted = aggregate_daily(columns._replace(timezone=-3 * HOUR))
+
+    assert [day.date for day in utc] == [date(2024, 9, 29), date(2024, 9, 30)]
+    assert utc[1].temp_mean == mean(columns.temp[1:])
+    assert utc[1].pop_max == max(columns.pop[1:])
+    assert [day.date for day in shifted] == [
+        date(2024, 9, 29),
+        date(2024, 9, 30),
+    ]
+    assert shifted[0].temp_mean == mean(columns.temp[:2])
+    assert shifted[0].condition == 'chuva'
+    assert shifted[1].temp_min == shifted[1].temp_max == columns.temp[2]
+
+
+def test_aggregate_forecast():
+    days = aggregate_daily(forecast_columns(WeatherForecast(**mock_response)))
+
+    assert [day.date.day for day in days] == [24, 25, 26, 27, 28, 29]
+    for day in days:
+        assert day.temp_min <= day.temp_mean <= day.temp_max
+        assert 0 <= day.pop_max <= 1
+        assert day.condition
+
+
+def test_aggregate_empty_forecast():
+    assert aggregate_daily(ForecastColumns([], [], [], [])) == []
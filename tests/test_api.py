@@ -1,10 +1,28 @@
+import asyncio
+import json
+import time
 from http import HTTPStatus
 from unittest.mock import patch
 
-from app.openweathersdk.openweather import WeatherForecast
-from tests.mocks import mock_response
+from requests.exceptions import HTTPError
+
+from app.app import (
+    collect_app_metrics,
+    get_gist_client,
+    get_openweather,
+    get_profile_store,
+    get_sync_gist_client,
+    get_tracer,
+)
+from app.openweathersdk.cache import ForecastKey, ForecastVersion
+from app.openweathersdk.openweather import City, WeatherForecast
+from app.openweathersdk.ratelimit import BULK, RateLimitedError
+from app.openweathersdk.resilience import CircuitOpenError
+from app.tracing import InMemorySpanExporter
+from tests.mocks import mock_city, mock_response
 
 mock_forecast = WeatherForecast(**mock_response)
+forecast_ttl = 600
 
 
 def test_get_city_location_with_city(client):
@@ -49,7 +67,7 @@ def test_get_city_location_with_city_and_state_usa(client):
 
 
 @patch(
-    'app.openweathersdk.openweather.OpenWeather.get_weather_forecast',
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
     return_value=mock_forecast,
 )
 def test_get_weather_forecast_success(mock_get_weather_forecast, client):
@@ -69,6 +87,417 @@ def test_get_weather_forecast_success(mock_get_weather_forecast, client):
 
     assert '28.11°C e nublado em Natal em 24/09.' in data['msg']
     assert (
-        '25°C em 25/09, 25°C em 26/09, 26°C em 27/09, 25°C em 28/09, 25°C em 29/09.'
+        '25°C em 25/09, 25°C em 26/09, 26°C em 27/09, 26°C em 28/09, 25°C em 29/09.'
         in data['msg']
     )
+
+
+@patch('app.app.create_gist', return_value='https://gist.github.com/x')
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_get_weather_forecast_publishes_gist_in_background(
+    mock_get_weather_forecast, mock_create_gist, client, gist_outbox
+):
+    response = client.get(
+        '/get-weather-forecast',
+        params={'latitude': -5.805398, 'longitude': -35.2080905},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    job_id = response.json()['job_id']
+    mock_create_gist.assert_not_called()
+
+    job = client.get(f'/gist-jobs/{job_id}').json()
+    assert job['status'] == 'pending'
+
+    gist_outbox.run_once()
+
+    job = client.get(f'/gist-jobs/{job_id}').json()
+    assert job['status'] == 'done'
+    assert job['github_url'] == 'https://gist.github.com/x'
+
+
+@patch(
+    'app.gist.AsyncGistClient.publish',
+    return_value='https://gist.github.com/x',
+)
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_get_weather_forecast_waits_for_gist(
+    mock_get_weather_forecast, mock_create_gist, client
+):
+    response = client.get(
+        '/get-weather-forecast',
+        params={'latitude': -5.805398, 'longitude': -35.2080905, 'wait': True},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['github_url'] == 'https://gist.github.com/x'
+    assert response.json()['job_id'] is None
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_metrics_expose_stages_and_upstreams(
+    mock_get_weather_forecast, client
+):
+    response = client.get(
+        '/get-weather-forecast-message',
+        params={'latitude': -5.805398, 'longitude': -35.2080905},
+    )
+    assert 'aggregate;dur=' in response.headers['Server-Timing']
+
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'stage_duration_seconds_bucket{stage="aggregate"' in response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/get-weather-forecast-message",code="200"}'
+    ) in response.text
+    assert 'cache_hit_ratio{cache="forecast"}' in response.text
+    assert 'threadpool_threads_limit' in response.text
+
+
+def test_metrics_scrape_builds_no_clients(monkeypatch):
+    monkeypatch.setenv('GITHUB_KEY', 'token')
+    getters = [get_openweather, get_gist_client, get_sync_gist_client]
+    for getter in getters:
+        getter.cache_clear()
+    get_sync_gist_client('other-token', get_tracer())
+
+    async def scrape():
+        return collect_app_metrics()
+
+    families = {family.name: family for family in asyncio.run(scrape())}
+
+    assert get_openweather.cache_info().currsize == 0
+    assert get_gist_client.cache_info().currsize == 0
+    assert get_sync_gist_client.peek('token', get_tracer()) is None
+    assert families['cache_hits_total'].samples == []
+    assert families['upstream_responses_total'].samples == []
+    get_sync_gist_client.cache_clear()
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_requests_are_traced_with_their_request_id(
+    mock_get_weather_forecast, client
+):
+    tracer = get_tracer()
+    exporter = InMemorySpanExporter()
+    with (
+        patch.object(tracer, 'exporter', exporter),
+        patch.object(tracer, 'sample_rate', 1.0),
+    ):
+        response = client.get(
+            '/get-weather-forecast-message',
+            params={'latitude': -5.805398, 'longitude': -35.2080905},
+            headers={'X-Request-ID': 'req-1'},
+        )
+        tracer.flush()
+
+    assert response.headers['X-Request-ID'] == 'req-1'
+    aggregate, root = exporter.spans
+    assert root.name == 'GET /get-weather-forecast-message'
+    assert root.attributes['http.status_code'] == HTTPStatus.OK
+    assert aggregate.name == 'aggregate'
+    assert aggregate.parent_id == root.span_id
+    assert aggregate.attributes['request.id'] == 'req-1'
+    assert client.get('/metrics').headers['X-Request-ID'] != 'req-1'
+
+
+@patch('app.app.create_gist', return_value='https://gist.github.com/x')
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_admin_can_profile_a_request(
+    mock_get_weather_forecast, mock_create_gist, client, monkeypatch, tmp_path
+):
+    monkeypatch.setenv('PROFILING_ADMIN_TOKEN', 'secret')
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    get_profile_store.cache_clear()
+    params = {'latitude': -5.805398, 'longitude': -35.2080905}
+
+    try:
+        response = client.get(
+            '/get-weather-forecast',
+            params=params,
+            headers={'X-Profile': '1', 'X-Admin-Token': 'secret'},
+        )
+        profile_id = response.headers['X-Profile-Id']
+        forbidden = client.get(f'/profiles/{profile_id}')
+        profile = client.get(
+            f'/profiles/{profile_id}', headers={'X-Admin-Token': 'secret'}
+        )
+        missing = client.get(
+            '/profiles/unknown', headers={'X-Admin-Token': 'secret'}
+        )
+    finally:
+        get_profile_store.cache_clear()
+
+    assert response.status_code == HTTPStatus.OK
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    assert profile.status_code == HTTPStatus.OK
+    assert profile.headers['content-type'].startswith('text/plain')
+    assert (tmp_path / f'{profile_id}.collapsed').read_text() == profile.text
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_get_unknown_gist_job(client):
+    response = client.get('/gist-jobs/unknown')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+async def fake_forecast(latitude, longitude, units, lang, priority):
+    if latitude > 0:
+        raise HTTPError({'error': '404 Client Error'})
+    return mock_forecast
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    side_effect=fake_forecast,
+)
+def test_get_weather_forecast_batch(mock_get_weather_forecast, client):
+    response = client.post(
+        '/get-weather-forecast-batch',
+        json={
+            'locations': [
+                {'latitude': -5.805398, 'longitude': -35.2080905},
+                {'latitude': 10, 'longitude': 10},
+            ],
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    results = response.json()['results']
+    ok, failed = results
+
+    assert '28.11°C e nublado em Natal em 24/09.' in ok['msg']
+    assert ok['error'] is None
+    assert failed['msg'] is None
+    assert '404' in failed['error']
+    assert mock_get_weather_forecast.call_count == len(results)
+    assert mock_get_weather_forecast.call_args.kwargs['priority'] == BULK
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_stale_forecast',
+    return_value=(mock_forecast, 4000.0),
+)
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    side_effect=CircuitOpenError('OpenWeather', 12),
+)
+def test_get_weather_forecast_serves_stale_while_upstream_is_down(
+    mock_get_weather_forecast, mock_get_stale_forecast, client
+):
+    response = client.get(
+        '/get-weather-forecast',
+        params={'latitude': -5.805398, 'longitude': -35.2080905},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert '28.11°C e nublado em Natal' in response.json()['msg']
+    assert response.headers['Age'] == '4000'
+    assert response.headers['Warning'] == '110 - "Response is Stale"'
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_stale_forecast',
+    return_value=None,
+)
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    side_effect=CircuitOpenError('OpenWeather', 12),
+)
+def test_get_weather_forecast_fails_fast_while_circuit_is_open(
+    mock_get_weather_forecast, mock_get_stale_forecast, client
+):
+    response = client.get(
+        '/get-weather-forecast',
+        params={'latitude': -5.805398, 'longitude': -35.2080905},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == '12'
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_city_location',
+    side_effect=RateLimitedError('OpenWeather', 120),
+)
+def test_get_city_location_fails_fast_on_long_retry_after(
+    mock_get_city_location, client
+):
+    response = client.get('/get-city-location', params={'city': 'Natal'})
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == '120'
+
+
+def test_get_weather_forecast_batch_requires_locations(client):
+    response = client.post(
+        '/get-weather-forecast-batch', json={'locations': []}
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_nearest_cities',
+    return_value=[mock_city],
+)
+def test_get_nearest_cities(mock_get_nearest_cities, client):
+    response = client.get(
+        '/get-nearest-cities',
+        params={'latitude': -5.8, 'longitude': -35.2, 'limit': 1},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['locations'][0]['name'] == 'Natal'
+    mock_get_nearest_cities.assert_called_once_with(-5.8, -35.2, 1)
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_nearest_cities_bulk',
+    return_value=[[mock_city], []],
+)
+def test_get_nearest_cities_batch(mock_get_nearest_cities_bulk, client):
+    response = client.post(
+        '/get-nearest-cities-batch',
+        json={
+            'locations': [
+                {'latitude': -5.8, 'longitude': -35.2},
+                {'latitude': 0, 'longitude': 0},
+            ],
+            'limit': 1,
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    natal, ocean = response.json()['results']
+    assert natal['locations'][0]['name'] == 'Natal'
+    assert ocean['locations'] == []
+    mock_get_nearest_cities_bulk.assert_called_once_with(
+        [(-5.8, -35.2), (0, 0)], limit=1
+    )
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_city_location',
+    return_value=[mock_city],
+)
+def test_get_city_location_answers_if_none_match_with_304(
+    mock_get_city_location, client
+):
+    params = {'city': 'Natal'}
+    response = client.get('/get-city-location', params=params)
+    etag = response.headers['ETag']
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['Cache-Control'] == 'max-age=86400'
+
+    response = client.get(
+        '/get-city-location', params=params, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_forecast_version',
+    return_value=ForecastVersion(
+        ForecastKey(-5.81, -35.21, 'metric', 'pt_br'),
+        stored_at=1000.0,
+        expires_at=time.time() + forecast_ttl,
+    ),
+)
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    return_value=mock_forecast,
+)
+def test_get_weather_forecast_message_revalidates_without_fetching(
+    mock_get_weather_forecast, mock_get_forecast_version, client
+):
+    params = {'latitude': -5.805398, 'longitude': -35.2080905}
+    response = client.get('/get-weather-forecast-message', params=params)
+    etag = response.headers['ETag']
+
+    assert response.status_code == HTTPStatus.OK
+    assert '28.11°C e nublado em Natal' in response.json()['msg']
+    max_age = int(response.headers['Cache-Control'][8:])
+    assert forecast_ttl - 10 < max_age <= forecast_ttl
+
+    response = client.get(
+        '/get-weather-forecast-message',
+        params=params,
+        headers={'If-None-Match': etag},
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert mock_get_weather_forecast.call_count == 1
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_city_location',
+    return_value=[City(**mock_city)],
+)
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    side_effect=fake_forecast,
+)
+def test_get_weather_forecast_stream_emits_ndjson_lines(
+    mock_get_weather_forecast, mock_get_city_location, client
+):
+    body = (
+        b'{"latitude": -5.805398, "longitude": -35.2080905}\n'
+        b'{"city": "Natal", "country": "BR"}\n'
+        b'{"latitude": 10, "longitude": 10}\n'
+        b'{"state": "RN"}\n'
+    )
+    response = client.post('/get-weather-forecast-stream', content=body)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    items = {
+        item['index']: item
+        for item in map(json.loads, response.text.splitlines())
+    }
+    assert '28.11°C e nublado em Natal' in items[0]['msg']
+    assert items[1]['city'] == 'Natal'
+    assert items[1]['latitude'] == mock_city['lat']
+    assert '404' in items[2]['error']
+    assert 'city is required' in items[3]['error']
+    assert mock_get_weather_forecast.call_args.kwargs['priority'] == BULK
+
+
+@patch(
+    'app.openweathersdk.openweather.AsyncOpenWeather.get_weather_forecast',
+    side_effect=fake_forecast,
+)
+def test_get_weather_forecast_stream_emits_server_sent_events(
+    mock_get_weather_forecast, client
+):
+    response = client.post(
+        '/get-weather-forecast-stream',
+        content=b'{"latitude": -5.805398, "longitude": -35.2080905}',
+        headers={'Accept': 'text/event-stream'},
+    )
+
+    assert response.headers['Content-Type'].startswith('text/event-stream')
+    forecast, end = response.text.strip().split('\n\n')
+    assert forecast.startswith('event: forecast\nid: 0\ndata: {')
+    assert end == 'event: end\ndata: {}'
@@ -0,0 +1,197 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import httpx
+
+from app.openweathersdk.cache import (
+    FORECAST_STEP,
+    ForecastCache,
+    GeocodingCache,
+    normalize_query,
+)
+from app.openweathersdk.openweather import (
+    AsyncOpenWeather,
+    City,
+    OpenWeather,
+    WeatherForecast,
+)
+from tests.mocks import mock_city, mock_response
+
+mock_forecast = WeatherForecast(**mock_response)
+FIRST_DT = mock_forecast.list[0].dt
+
+
+def test_key_quantizes_coordinates():
+    cache = ForecastCache(precision=2)
+
+    assert cache.key(-5.805398, -35.2080905) == cache.key(-5.8071, -35.2071)
+    assert cache.key(-5.80, -35.20) != cache.key(-5.80, -35.20, 'imperial')
+
+
+def test_entry_expires_at_next_forecast_step(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(clock=clock)
+    key = cache.key(-5.8, -35.2)
+    cache.set(key, mock_forecast)
+
+    assert cache.get(key) is mock_forecast
+
+    clock.now = FIRST_DT + 1
+    assert cache.get(key) is None
+    assert cache.expires_at(mock_forecast) == FIRST_DT + FORECAST_STEP
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_stale_entries_outlive_expiry_for_stale_ttl(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(stale_ttl=3600, clock=clock)
+    key = cache.key(-5.8, -35.2)
+    cache.set(key, mock_forecast)
+
+    clock.now = FIRST_DT + 60
+    assert cache.get(key) is None
+    assert cache.get_stale(key) == (mock_forecast, 120)
+
+    clock.now = FIRST_DT + 3600
+    assert cache.get_stale(key) is None
+    assert len(cache) == 0
+
+
+def test_hot_keys_follow_lookups(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(clock=clock)
+    first, second, uncached = (cache.key(lat, 0) for lat in (1, 2, 3))
+    cache.set(first, mock_forecast)
+    cache.set(second, mock_forecast)
+    for key in (second, second, uncached, uncached, uncached):
+        cache.get(key)
+
+    assert cache.hot(2) == [(second, FIRST_DT), (first, FIRST_DT)]
+    assert len(cache._lookups) == len(cache)
+
+    cache.extend(first, FIRST_DT + 60)
+    cache.decay()
+    assert cache.hot(2) == [(second, FIRST_DT)]
+    assert cache.get(first) is mock_forecast
+
+
+def test_nearby_lookup_reuses_fresh_forecast_within_radius(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(radius_km=2, clock=clock)
+    natal = cache.key(-5.8054, -35.2081)
+    cache.set(natal, mock_forecast)
+
+    assert cache.get(cache.key(-5.7971, -35.2043)) is mock_forecast
+    assert cache.get(cache.key(-5.7971, -35.2043, 'imperial')) is None
+    assert cache.get(cache.key(-5.9156, -35.2628)) is None
+    assert cache.hot(1) == [(natal, FIRST_DT)]
+
+    clock.now = FIRST_DT + 1
+    assert cache.get(cache.key(-5.7971, -35.2043)) is None
+
+    cache.clear()
+    clock.now = FIRST_DT - 60
+    assert cache.get(cache.key(-5.7971, -35.2043)) is None
+
+
+def test_version_names_the_entry_answering_a_key(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(radius_km=2, clock=clock)
+    natal = cache.key(-5.8054, -35.2081)
+
+    assert cache.version(natal) is None
+    cache.set(natal, mock_forecast)
+
+    version = cache.version(cache.key(-5.7971, -35.2043))
+    assert version == (natal, FIRST_DT - 60, FIRST_DT)
+    assert cache.stats()['hits'] == 0
+    assert cache.hot(1) == [(natal, FIRST_DT)]
+
+    clock.now = FIRST_DT
+    assert cache.version(natal) is None
+
+
+def test_lru_eviction_by_entries_and_bytes(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(max_entries=2, max_bytes=100, clock=clock)
+    first, second, third = (cache.key(lat, 0) for lat in (1, 2, 3))
+
+    cache.set(first, mock_forecast, 10)
+    cache.set(second, mock_forecast, 10)
+    cache.get(first)
+    cache.set(third, mock_forecast, 10)
+
+    assert cache.get(second) is None
+    assert cache.get(first) is mock_forecast
+
+    size = 95
+    cache.set(second, mock_forecast, size)
+    assert len(cache) == 1
+    assert cache.stats()['bytes'] == size
+
+
+def test_client_serves_forecast_from_cache(clock):
+    clock.now = FIRST_DT - 60
+    cache = ForecastCache(clock=clock)
+    opw = OpenWeather(forecast_cache=cache)
+    response = MagicMock(content=json.dumps(mock_response).encode())
+    opw.session.get = MagicMock(return_value=response)
+
+    first = opw.get_weather_forecast(-5.805398, -35.2080905)
+    second = opw.get_weather_forecast(-5.8071, -35.2071)
+
+    assert first is second
+    assert opw.session.get.call_count == 1
+
+
+def test_normalize_query():
+    assert normalize_query(' São  Paulo, SP ') == 'sao paulo,sp'
+    assert normalize_query('SAO PAULO,sp') == 'sao paulo,sp'
+
+
+def test_geocoding_cache_persists_results(tmp_path):
+    path = str(tmp_path / 'geocoding.sqlite3')
+    cache = GeocodingCache(path)
+    cache.set('Natal', 5, [mock_city])
+    cache.set('Nowhere', 5, [])
+    cache.close()
+
+    cache = GeocodingCache(path)
+    assert cache.get('  NATAL', 5) == [mock_city]
+    assert cache.get('nowhere', 5) == []
+    assert cache.get('Natal', 1) is None
+
+
+def test_client_serves_cities_from_geocoding_cache():
+    opw = OpenWeather(geocoding_cache=GeocodingCache(':memory:'))
+    response = MagicMock(content=json.dumps([mock_city]).encode())
+    opw.session.get = MagicMock(return_value=response)
+
+    first = opw.get_city_location('Natal')
+    second = opw.get_city_location('natal ')
+
+    assert first == second == [City(**mock_city)]
+    assert opw.session.get.call_count == 1
+
+
+def test_async_client_serves_cities_from_geocoding_cache():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=[mock_city])
+
+    async def run():
+        opw = AsyncOpenWeather(geocoding_cache=GeocodingCache(':memory:'))
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return [
+            await opw.get_city_location('Natal'),
+            await opw.get_city_location('natal '),
+        ]
+
+    first, second = asyncio.run(run())
+
+    assert first == second == [City(**mock_city)]
+    assert len(calls) == 1
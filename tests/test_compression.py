@@ -0,0 +1,104 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, choose_encoding
+
+BODY = '{"msg": "' + 'nublado em Natal ' * 200 + '"}'
+
+
+@pytest.fixture
+def compressed_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get('/large')
+    async def large():
+        return PlainTextResponse(
+            BODY, media_type='application/json', headers={'ETag': '"v1"'}
+        )
+
+    @app.get('/small')
+    async def small():
+        return {'msg': 'ok'}
+
+    @app.get('/stream')
+    async def stream():
+        async def lines():
+            for index in range(3):
+                yield f'{{"index": {index}}}\n'
+
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected'),
+    [
+        ('', None),
+        ('gzip, deflate', 'gzip'),
+        ('gzip;q=0', None),
+        ('identity, *;q=0.5', 'gzip'),
+        ('deflate', None),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected, monkeypatch):
+    monkeypatch.setattr('app.compression.brotli', None)
+
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_large_bodies_are_gzipped_with_weak_etag(compressed_client):
+    response = compressed_client.get(
+        '/large', headers={'Accept-Encoding': 'gzip'}
+    )
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"v1"'
+    assert int(response.headers['Content-Length']) < len(BODY) / 10
+    assert response.text == BODY
+
+
+def test_identity_below_threshold_or_when_not_accepted(compressed_client):
+    small = compressed_client.get(
+        '/small', headers={'Accept-Encoding': 'gzip'}
+    )
+    identity = compressed_client.get(
+        '/large', headers={'Accept-Encoding': 'identity'}
+    )
+
+    assert 'Content-Encoding' not in small.headers
+    assert small.json() == {'msg': 'ok'}
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+    assert identity.headers['ETag'] == '"v1"'
+
+
+def test_streams_are_compressed_chunk_by_chunk(compressed_client):
+    with compressed_client.stream(
+        'GET', '/stream', headers={'Accept-Encoding': 'gzip'}
+    ) as response:
+        raw = b''.join(response.iter_raw())
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(raw).decode().splitlines() == [
+        '{"index": 0}',
+        '{"index": 1}',
+        '{"index": 2}',
+    ]
+
+
+def test_brotli_is_preferred_when_installed(compressed_client):
+    pytest.importorskip('brotli')
+    response = compressed_client.get(
+        '/large', headers={'Accept-Encoding': 'gzip, br'}
+    )
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.text == BODY
@@ -0,0 +1,26 @@
+import json
+
+from app.openweathersdk.decoding import (
+    decode_cities,
+    decode_forecast,
+    loads,
+)
+from app.openweathersdk.openweather import City, WeatherForecast
+from tests.mocks import mock_city, mock_response
+
+raw_forecast = json.dumps(mock_response).encode()
+
+
+def test_decode_forecast_matches_dict_validation():
+    assert decode_forecast(raw_forecast) == WeatherForecast(**mock_response)
+
+
+def test_decode_cities():
+    raw = json.dumps([mock_city, mock_city]).encode()
+
+    assert decode_cities(raw) == [City(**mock_city)] * 2
+    assert decode_cities(b'[]') == []
+
+
+def test_loads():
+    assert loads(raw_forecast) == mock_response
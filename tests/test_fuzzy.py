@@ -0,0 +1,118 @@
+import gzip
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.openweathersdk.fuzzy import FuzzyCityIndex, similarity
+from app.openweathersdk.gazetteer import Gazetteer
+from app.openweathersdk.openweather import OpenWeather
+from tests.mocks import mock_city
+
+
+def test_similarity_of_trigrams():
+    min_similarity = FuzzyCityIndex().min_similarity
+
+    assert similarity('natal', 'natal') == 1.0
+    assert min_similarity < similarity('natal', 'nattal') < 1.0
+    assert similarity('natal', 'recife') == 0.0
+
+
+def test_search_tolerates_accents_and_typos():
+    index = FuzzyCityIndex()
+    index.extend([('São Paulo', 12_000_000), ('Natal', 890_000)])
+    index.add('Parnamirim')
+
+    assert index.search('SAO PAULO')[0].name == 'São Paulo'
+    assert index.search('sao paolo')[0].name == 'São Paulo'
+    assert index.search('sao pualo')[0].name == 'São Paulo'
+    assert index.search('Parnamirm')[0].name == 'Parnamirim'
+    assert index.search('natl')[0].similarity < 1.0
+    assert index.search('recife') == []
+
+
+def test_search_ranks_by_similarity_then_population():
+    index = FuzzyCityIndex()
+    index.extend([('Lima', 10), ('Lina', 1_000), ('Lins', 100)])
+
+    assert [match.name for match in index.search('lima')] == ['Lima', 'Lina']
+    assert [match.name for match in index.search('lia')] == ['Lina', 'Lima']
+
+
+def test_duplicate_names_keep_the_largest_population():
+    population = 890_000
+    index = FuzzyCityIndex()
+    index.extend([('Natal', 10), ('natal', population)])
+    index.add('NATAL', 5)
+
+    assert len(index) == 1
+    assert index.search('natal')[0].population == population
+
+
+def test_resolve_requires_min_similarity():
+    index = FuzzyCityIndex(min_similarity=0.4)
+    index.add('São Paulo')
+
+    assert index.resolve('sao paulo') == 'São Paulo'
+    assert index.resolve('sao paulx') == 'São Paulo'
+    assert index.resolve('sau') is None
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    source = tmp_path / 'city.list.json.gz'
+    with gzip.open(source, 'wt', encoding='utf-8') as file:
+        json.dump(
+            [
+                {
+                    'name': 'São Paulo',
+                    'country': 'BR',
+                    'coord': {'lon': -46.636108, 'lat': -23.547501},
+                }
+            ],
+            file,
+        )
+    gazetteer = Gazetteer.load(str(source))
+    yield gazetteer
+    gazetteer.close()
+
+
+def test_client_resolves_typos_through_the_gazetteer(gazetteer):
+    opw = OpenWeather(
+        gazetteer=gazetteer,
+        fuzzy_index=FuzzyCityIndex.from_gazetteer(gazetteer),
+    )
+    opw.session.get = MagicMock(
+        return_value=MagicMock(status_code=200, content=b'[]')
+    )
+
+    assert opw.get_city_location('Sao Pualo')[0].name == 'São Paulo'
+    assert opw.session.get.call_args.kwargs['params']['q'] == 'Sao Pualo'
+    assert opw.session.get.call_count == 1
+
+
+def test_client_prefers_the_api_to_typo_corrections(gazetteer):
+    opw = OpenWeather(
+        gazetteer=gazetteer,
+        fuzzy_index=FuzzyCityIndex.from_gazetteer(gazetteer),
+    )
+    opw.session.get = MagicMock(
+        return_value=MagicMock(
+            status_code=200, content=json.dumps([mock_city]).encode()
+        )
+    )
+
+    assert opw.get_city_location('Sao Pualo')[0].name == mock_city['name']
+
+
+def test_client_retries_misspelled_names_with_learned_ones():
+    opw = OpenWeather(fuzzy_index=FuzzyCityIndex())
+    found = MagicMock(
+        status_code=200, content=json.dumps([mock_city]).encode()
+    )
+    empty = MagicMock(status_code=200, content=b'[]')
+    opw.session.get = MagicMock(side_effect=[found, empty, found])
+
+    assert opw.get_city_location('Natal')[0].name == 'Natal'
+    assert opw.get_city_location('Nattal')[0].name == 'Natal'
+    assert opw.session.get.call_args.kwargs['params']['q'] == 'Natal'
@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.openweathersdk.gazetteer import Gazetteer, build_index
+from app.openweathersdk.openweather import OpenWeather
+from tests.mocks import mock_city
+
+city_list = [
+    {
+        'id': 3394023,
+        'name': 'Natal',
+        'state': '',
+        'country': 'BR',
+        'coord': {'lon': -35.209438, 'lat': -5.795},
+    },
+    {
+        'id': 3394024,
+        'name': 'Natalândia',
+        'state': '',
+        'country': 'BR',
+        'coord': {'lon': -46.488, 'lat': -16.5},
+    },
+    {
+        'id': 4459467,
+        'name': 'Natal',
+        'state': 'ID',
+        'country': 'US',
+        'coord': {'lon': -116.2, 'lat': 43.6},
+    },
+    {
+        'id': 3448439,
+        'name': 'São Paulo',
+        'state': '',
+        'country': 'BR',
+        'coord': {'lon': -46.636108, 'lat': -23.547501},
+    },
+]
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    source = tmp_path / 'city.list.json.gz'
+    with gzip.open(source, 'wt', encoding='utf-8') as file:
+        json.dump(city_list, file)
+    gazetteer = Gazetteer.load(str(source))
+    yield gazetteer
+    gazetteer.close()
+
+
+def test_lookup_by_normalized_name(gazetteer):
+    cities = gazetteer.lookup('  sao   PAULO ')
+
+    assert len(gazetteer) == len(city_list)
+    assert [city.name for city in cities] == ['São Paulo']
+    assert cities[0].lat == city_list[3]['coord']['lat']
+    assert cities[0].country == 'BR'
+
+
+def test_lookup_filters_by_state_and_country(gazetteer):
+    assert {city.country for city in gazetteer.lookup('natal')} == {
+        'BR',
+        'US',
+    }
+    assert [city.state for city in gazetteer.lookup('natal', 'id')] == ['ID']
+    assert [
+        city.country for city in gazetteer.lookup('natal', country='br')
+    ] == ['BR']
+    assert gazetteer.lookup('natal', country='AR') == []
+
+
+def test_search_by_prefix(gazetteer):
+    names = [city.name for city in gazetteer.search('NAT', limit=5)]
+
+    assert sorted(names) == ['Natal', 'Natal', 'Natalândia']
+    assert gazetteer.search('nat', limit=1)[0].name == 'Natal'
+    assert gazetteer.search('x') == []
+
+
+def test_index_is_built_once_from_csv(tmp_path):
+    population = 890480
+    source = tmp_path / 'cities.csv'
+    source.write_text(
+        'name,state,country,lat,lon,population\n'
+        f'Natal,Rio Grande do Norte,BR,-5.795,-35.209,{population}\n',
+        encoding='utf-8',
+    )
+    index = tmp_path / 'cities.idx'
+
+    assert build_index(str(source), str(index)) == 1
+    built_at = os.path.getmtime(index)
+    gazetteer = Gazetteer.load(str(source), str(index))
+
+    assert os.path.getmtime(index) == built_at
+    assert gazetteer.lookup('natal', 'rio grande do norte')[0].state == (
+        'Rio Grande do Norte'
+    )
+    assert gazetteer.population(0) == population
+    gazetteer.close()
+
+
+def test_client_answers_from_gazetteer_and_falls_back(gazetteer):
+    opw = OpenWeather(gazetteer=gazetteer)
+    response = MagicMock(
+        status_code=200, content=json.dumps([mock_city]).encode()
+    )
+    opw.session.get = MagicMock(return_value=response)
+
+    natal = opw.get_city_location('Natal', country='BR')[0]
+    assert natal.lon == city_list[0]['coord']['lon']
+    assert opw.session.get.call_count == 0
+
+    assert opw.get_city_location('Recife')[0].name == 'Natal'
+    assert opw.session.get.call_count == 1
+
+
+def test_nearest_cities(gazetteer):
+    cities = gazetteer.nearest(-5.81, -35.2, limit=2)
+
+    assert [city.name for city in cities] == ['Natal', 'Natalândia']
+    assert cities[0].country == 'BR'
+    assert gazetteer.nearest(40, -100, limit=1)[0].state == 'ID'
+
+
+def test_client_finds_nearest_cities_offline_or_upstream(gazetteer):
+    response = MagicMock(
+        status_code=200, content=json.dumps([mock_city]).encode()
+    )
+    offline = OpenWeather(gazetteer=gazetteer)
+    offline.session.get = MagicMock(return_value=response)
+    online = OpenWeather()
+    online.session.get = MagicMock(return_value=response)
+
+    nearest = offline.get_nearest_cities_bulk(
+        [(-23.5, -46.6), (-5.8, -35.2)], limit=1
+    )
+    assert [cities[0].name for cities in nearest] == ['São Paulo', 'Natal']
+    assert offline.session.get.call_count == 0
+
+    lat, lon = -5.8, -35.2
+    assert online.get_nearest_cities(lat, lon, limit=1)[0].name == 'Natal'
+    assert online.session.get.call_args.kwargs['params']['lat'] == lat
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from github import GithubException
+
+from app.gist import (
+    AsyncGistClient,
+    BaseGistClient,
+    GistClient,
+    GistIndex,
+    IndexedGist,
+    content_hash,
+)
+
+
+def test_base_gist_client_needs_a_session_builder():
+    with pytest.raises(TypeError, match='_build_session'):
+        BaseGistClient('token')
+
+
+def github_handler(request):
+    if request.url.path == '/user':
+        return httpx.Response(200, json={'login': 'octocat'})
+    payload = json.loads(request.content)
+    if request.headers['Authorization'] != 'Bearer token':
+        return httpx.Response(401, json={'message': 'Bad credentials'})
+    (name,) = payload['files']
+    return httpx.Response(
+        201, json={'html_url': f'https://gist.github.com/{name}'}
+    )
+
+
+def test_gist_client_reuses_session():
+    client = GistClient('token')
+    response = MagicMock(status_code=201)
+    response.json.return_value = {'html_url': 'https://gist.github.com/1'}
+    client.session.post = MagicMock(return_value=response)
+
+    assert client.create_gist('forecast', 'content') == (
+        'https://gist.github.com/1'
+    )
+    client.create_gist('forecast', 'other content')
+
+    payload = client.session.post.call_args.kwargs['json']
+    assert payload['files'] == {'forecast': {'content': 'other content'}}
+    assert payload['public'] is True
+    assert client.session.headers['Authorization'] == 'Bearer token'
+    assert [
+        call.kwargs['json']['files']['forecast']['content']
+        for call in client.session.post.call_args_list
+    ] == ['content', 'other content']
+
+
+def test_gist_client_raises_github_exception():
+    client = GistClient('token')
+    response = MagicMock(status_code=HTTPStatus.UNAUTHORIZED)
+    response.json.return_value = {'message': 'Bad credentials'}
+    client.session.post = MagicMock(return_value=response)
+
+    with pytest.raises(GithubException) as exc_info:
+        client.create_gist('forecast', 'content')
+    assert exc_info.value.status == HTTPStatus.UNAUTHORIZED
+
+
+def test_async_gist_client():
+    async def run(token):
+        client = AsyncGistClient(token)
+        client.session = httpx.AsyncClient(
+            headers=client.headers,
+            transport=httpx.MockTransport(github_handler),
+        )
+        user = await client.get_user()
+        url = await client.create_gist('forecast', 'content')
+        await client.aclose()
+        return user, url
+
+    assert asyncio.run(run('token')) == (
+        'octocat',
+        'https://gist.github.com/forecast',
+    )
+    with pytest.raises(GithubException):
+        asyncio.run(run('wrong'))
+
+
+class FakeGithub:
+    def __init__(self):
+        self.gists = {}
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request.method)
+        payload = json.loads(request.content)
+        if request.method == 'POST':
+            gist_id = str(len(self.gists) + 1)
+        else:
+            gist_id = request.url.path.rsplit('/', 1)[-1]
+            if gist_id not in self.gists:
+                return httpx.Response(404, json={'message': 'Not Found'})
+        self.gists[gist_id] = payload['files']
+        return httpx.Response(
+            200,
+            json={
+                'id': gist_id,
+                'html_url': f'https://gist.github.com/{gist_id}',
+            },
+        )
+
+
+def test_publish_deduplicates_and_updates_in_place(tmp_path):
+    github = FakeGithub()
+    index = GistIndex(str(tmp_path / 'index.sqlite3'))
+
+    async def run():
+        client = AsyncGistClient('token', index=index)
+        client.session = httpx.AsyncClient(
+            transport=httpx.MockTransport(github)
+        )
+        return [
+            await client.publish('forecast', 'sunny'),
+            await client.publish('forecast', 'sunny'),
+            await client.publish('forecast', 'rainy'),
+            await client.publish('other', 'rainy'),
+        ]
+
+    urls = asyncio.run(run())
+
+    assert urls == [
+        'https://gist.github.com/1',
+        'https://gist.github.com/1',
+        'https://gist.github.com/1',
+        'https://gist.github.com/2',
+    ]
+    assert github.requests == ['POST', 'PATCH', 'POST']
+    assert github.gists['1'] == {'forecast': {'content': 'rainy'}}
+    assert index.get('forecast').content_hash == content_hash('rainy')
+
+
+def test_publish_recreates_deleted_gist(tmp_path):
+    index = GistIndex(str(tmp_path / 'index.sqlite3'))
+    index.set('forecast', IndexedGist('404', 'old-url', content_hash('x')))
+    client = GistClient('token', index=index)
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'id': '1', 'html_url': 'new-url'}
+    client.session.patch = MagicMock(
+        return_value=MagicMock(status_code=404, json=dict)
+    )
+    client.session.post = MagicMock(return_value=response)
+
+    assert client.publish('forecast', 'sunny') == 'new-url'
+    assert index.get('forecast') == IndexedGist(
+        '1', 'new-url', content_hash('sunny')
+    )
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from http import HTTPStatus
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.metrics import (
+    REQUEST_DURATION,
+    STAGE_DURATION,
+    Counter,
+    Gauge,
+    Histogram,
+    LoopLagMonitor,
+    MetricsMiddleware,
+    Registry,
+    server_timing,
+    stage,
+)
+
+
+def test_registry_renders_prometheus_text_format():
+    registry = Registry()
+    requests = registry.register(
+        Counter('requests_total', 'Requests.', ('code',))
+    )
+    in_flight = registry.register(Gauge('in_flight', 'In flight.'))
+    latency = registry.register(
+        Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    )
+
+    requests.labels(200).inc()
+    requests.labels(200).inc()
+    requests.labels('a"b').inc()
+    in_flight.inc()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert registry.render() == (
+        '# HELP requests_total Requests.\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{code="200"} 2\n'
+        'requests_total{code="a\\"b"} 1\n'
+        '# HELP in_flight In flight.\n'
+        '# TYPE in_flight gauge\n'
+        'in_flight 1\n'
+        '# HELP latency_seconds Latency.\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{le="0.1"} 2\n'
+        'latency_seconds_bucket{le="1"} 3\n'
+        'latency_seconds_bucket{le="+Inf"} 4\n'
+        'latency_seconds_sum 3.65\n'
+        'latency_seconds_count 4\n'
+    )
+
+
+def test_labels_must_match_label_names():
+    counter = Counter('requests_total', 'Requests.', ('method', 'code'))
+
+    with pytest.raises(ValueError, match='expects labels'):
+        counter.labels('GET')
+
+
+def test_stage_is_observed_and_formatted_as_server_timing():
+    before = sum(STAGE_DURATION.labels('parse').counts)
+
+    with stage('parse'):
+        pass
+
+    assert sum(STAGE_DURATION.labels('parse').counts) == before + 1
+    assert server_timing({'fetch': 0.0123, 'parse': 0.0004}, 0.02) == (
+        'fetch;dur=12.300, parse;dur=0.400, total;dur=20.000'
+    )
+
+
+def test_middleware_times_stages_and_counts_by_route():
+    fetch_ms = 10
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/items/{item_id}')
+    async def item(item_id: int):
+        with stage('fetch'):
+            await asyncio.sleep(fetch_ms / 1000)
+        with stage('fetch'):
+            pass
+        with stage('aggregate'):
+            pass
+        return {'id': item_id}
+
+    requests = REQUEST_DURATION.labels('GET', '/items/{item_id}', 200)
+    before = sum(requests.counts)
+
+    response = TestClient(app).get('/items/1')
+
+    assert response.status_code == HTTPStatus.OK
+    timings = dict(
+        entry.split(';dur=')
+        for entry in response.headers['Server-Timing'].split(', ')
+    )
+    assert list(timings) == ['fetch', 'aggregate', 'total']
+    assert float(timings['fetch']) >= fetch_ms
+    assert float(timings['total']) >= float(timings['fetch'])
+    assert sum(requests.counts) == before + 1
+
+
+def test_loop_lag_monitor_measures_blocked_loop():
+    histogram = Histogram('lag_seconds', 'Lag.', buckets=(0.05,))
+
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01, histogram=histogram)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+
+    asyncio.run(run())
+
+    counts = histogram.labels().counts
+    assert counts[1] >= 1
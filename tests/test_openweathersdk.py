@@ -1,4 +1,20 @@
-from app.openweathersdk.openweather import City, WeatherData, WeatherForecast
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from requests.exceptions import HTTPError
+
+from app.openweathersdk.openweather import (
+    AsyncOpenWeather,
+    BaseOpenWeather,
+    City,
+    OpenWeather,
+    WeatherData,
+    WeatherForecast,
+)
+from tests.mocks import mock_city, mock_response
 
 
 def test_get_city_coordinates(openweather):
@@ -43,3 +59,62 @@ def test_get_temperature_scale(openweather):
     )
     assert openweather.get_temperature_scale('standard') == ('Kelvin', 'K')
     assert openweather.get_temperature_scale('any_text') == ('Kelvin', 'K')
+
+
+def test_base_client_needs_a_session_builder():
+    with pytest.raises(TypeError, match='_build_session'):
+        BaseOpenWeather()
+
+
+def test_session_is_pooled_and_reused():
+    pool_size, calls = 4, 2
+    opw = OpenWeather(pool_size=pool_size, timeout=(1, 2))
+    adapter = opw.session.get_adapter('http://api.openweathermap.org/')
+
+    assert adapter._pool_maxsize == pool_size
+    assert 'gzip' in opw.session.headers['Accept-Encoding']
+
+    response = MagicMock(content=json.dumps(mock_response).encode())
+    opw.session.get = MagicMock(return_value=response)
+
+    for _ in range(calls):
+        opw.get_weather_forecast(-5.8, -35.2)
+
+    assert opw.session.get.call_count == calls
+    assert opw.session.get.call_args.kwargs['timeout'] == (1, 2)
+    opw.close()
+
+
+def test_async_client_parses_forecast_and_cities():
+    def handler(request):
+        if request.url.path.endswith('/forecast'):
+            return httpx.Response(200, json=mock_response)
+        return httpx.Response(200, json=[mock_city])
+
+    async def run():
+        async with AsyncOpenWeather() as opw:
+            opw.session = httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)
+            )
+            return (
+                await opw.get_weather_forecast(-5.8, -35.2),
+                await opw.get_city_location('Natal'),
+            )
+
+    forecast, cities = asyncio.run(run())
+
+    assert isinstance(forecast, WeatherForecast)
+    assert forecast.city.name == 'Natal'
+    assert cities == [City(**mock_city)]
+
+
+def test_async_client_raises_http_error():
+    async def run():
+        opw = AsyncOpenWeather()
+        opw.session = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(401))
+        )
+        await opw.get_weather_forecast(-5.8, -35.2)
+
+    with pytest.raises(HTTPError):
+        asyncio.run(run())
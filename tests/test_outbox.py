@@ -0,0 +1,135 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.outbox import DONE, FAILED, PENDING, GistOutbox
+
+
+class FlakyPublisher:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, gist_name, content):
+        self.calls.append((gist_name, content))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError('github is down')
+        return f'https://gist.github.com/{gist_name}'
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'outbox.sqlite3')
+
+
+def test_job_is_published(db_path):
+    publish = FlakyPublisher(failures=0)
+    outbox = GistOutbox(publish, path=db_path)
+    job_id = outbox.enqueue('forecast', 'content')
+
+    assert outbox.get(job_id)['status'] == PENDING
+    assert outbox.run_once()
+    assert not outbox.run_once()
+
+    job = outbox.get(job_id)
+    assert job['status'] == DONE
+    assert job['url'] == 'https://gist.github.com/forecast'
+    assert publish.calls == [('forecast', 'content')]
+
+
+def test_failures_are_retried_with_backoff(db_path, clock):
+    publish = FlakyPublisher(failures=1)
+    outbox = GistOutbox(publish, path=db_path, backoff=10, clock=clock)
+    job_id = outbox.enqueue('forecast', 'content')
+
+    outbox.run_once()
+    job = outbox.get(job_id)
+    assert job['status'] == PENDING
+    assert job['error'] == 'github is down'
+    assert not outbox.run_once()
+
+    clock.now += 10
+    assert outbox.run_once()
+    assert outbox.get(job_id)['status'] == DONE
+    assert outbox.get(job_id)['attempts'] == len(publish.calls)
+
+
+def test_job_fails_after_max_attempts(db_path, clock):
+    outbox = GistOutbox(
+        FlakyPublisher(failures=5), path=db_path, max_attempts=2, clock=clock
+    )
+    job_id = outbox.enqueue('forecast', 'content')
+
+    outbox.run_once()
+    clock.now += 60
+    outbox.run_once()
+
+    assert outbox.get(job_id)['status'] == FAILED
+
+
+def test_jobs_survive_restart(db_path):
+    outbox = GistOutbox(FlakyPublisher(failures=0), path=db_path)
+    job_id = outbox.enqueue('forecast', 'content')
+    outbox._claim()
+    outbox.stop()
+
+    outbox = GistOutbox(
+        FlakyPublisher(failures=0), path=db_path, poll_interval=0.01
+    )
+    outbox.start()
+    for _ in range(100):
+        if outbox.get(job_id)['status'] == DONE:
+            break
+        time.sleep(0.01)
+    outbox.stop()
+
+    outbox = GistOutbox(FlakyPublisher(failures=0), path=db_path)
+    assert outbox.get(job_id)['status'] == DONE
+
+
+def test_done_jobs_are_pruned_after_retention(db_path, clock):
+    retention = 60
+    outbox = GistOutbox(
+        FlakyPublisher(failures=1),
+        path=db_path,
+        max_attempts=1,
+        retention=retention,
+        clock=clock,
+    )
+    failed_id = outbox.enqueue('forecast', 'content')
+    outbox.run_once()
+    done_id = outbox.enqueue('forecast', 'content')
+    outbox.run_once()
+
+    assert outbox.prune() == 0
+    clock.now += retention + 1
+    assert outbox.prune() == 1
+    assert outbox.get(done_id) is None
+    assert outbox.get(failed_id)['status'] == FAILED
+
+
+def test_worker_survives_errors_outside_publish(db_path, caplog):
+    outbox = GistOutbox(
+        FlakyPublisher(failures=0), path=db_path, workers=1, poll_interval=0.01
+    )
+    claim = outbox._claim
+    errors = [sqlite3.OperationalError('database is locked')]
+
+    def flaky_claim():
+        if errors:
+            raise errors.pop()
+        return claim()
+
+    outbox._claim = flaky_claim
+    job_id = outbox.enqueue('forecast', 'content')
+    outbox.start()
+    for _ in range(100):
+        if outbox.get(job_id)['status'] == DONE:
+            break
+        time.sleep(0.01)
+    job = outbox.get(job_id)
+    outbox.stop()
+
+    assert job['status'] == DONE
+    assert 'database is locked' in caplog.text
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import httpx
+
+from app.openweathersdk.cache import ForecastCache
+from app.openweathersdk.openweather import AsyncOpenWeather
+from app.openweathersdk.prefetch import ForecastPrefetcher
+from app.openweathersdk.ratelimit import PREFETCH
+from tests.mocks import mock_response
+
+FIRST_DT = mock_response['list'][0]['dt']
+SECOND_DT = mock_response['list'][1]['dt']
+
+
+def test_prefetcher_refreshes_hot_keys_at_the_step_boundary(clock):
+    clock.now = FIRST_DT - 600
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.params['lat'])
+        return httpx.Response(200, content=json.dumps(mock_response))
+
+    async def run():
+        opw = AsyncOpenWeather(forecast_cache=ForecastCache(clock=clock))
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        for _ in range(3):
+            await opw.get_weather_forecast(-5.8, -35.2)
+        await opw.get_weather_forecast(10, 10)
+
+        prefetcher = ForecastPrefetcher(
+            opw, top_n=1, lead_time=60, clock=clock
+        )
+        assert prefetcher.next_boundary() == FIRST_DT
+
+        clock.now = FIRST_DT - 60
+        hot_key, cold_key = opw.forecast_cache.hot(2)
+        assert prefetcher.hold(FIRST_DT) == [hot_key[0]]
+
+        clock.now = FIRST_DT + 30
+        cache = opw.forecast_cache
+        assert cache.get(hot_key[0]) is not None
+        assert cache.get(cold_key[0]) is None
+
+        assert await prefetcher.refresh([hot_key[0]]) == 1
+        await opw.aclose()
+        return cache.hot(1)
+
+    ((_, expires_at),) = asyncio.run(run())
+
+    assert requests == ['-5.8', '10', '-5.8']
+    assert expires_at == SECOND_DT
+
+
+def test_prefetcher_uses_its_own_budget_and_priority():
+    class FakeClient:
+        forecast_cache = ForecastCache()
+        calls = []
+
+        async def get_weather_forecast(self, *args, **kwargs):
+            self.calls.append(kwargs)
+
+    class FakeLimiter:
+        priorities = []
+
+        async def acquire_async(self, priority):
+            self.priorities.append(priority)
+
+    client, limiter = FakeClient(), FakeLimiter()
+    prefetcher = ForecastPrefetcher(client, rate_limiter=limiter)
+    keys = [prefetcher.cache.key(1, 2)] * 2
+
+    assert asyncio.run(prefetcher.refresh(keys)) == len(keys)
+    assert limiter.priorities == [PREFETCH] * len(keys)
+    refresh = {'priority': PREFETCH, 'refresh': True}
+    assert client.calls == [refresh] * len(keys)
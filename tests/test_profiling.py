@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.profiling import (
+    ContinuousProfiler,
+    ProfileStore,
+    ProfilingMiddleware,
+    SamplingProfiler,
+    collapse,
+    is_authorized,
+)
+
+
+def busy_wait(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_sampling_profiler_counts_stacks_of_one_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001, thread_ids=[worker.ident])
+
+    profiler.start()
+    time.sleep(0.1)
+    counts = profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    assert sum(counts.values()) <= profiler.samples
+    stack = counts.most_common(1)[0][0]
+    frames = stack.split(';')
+    assert frames[0].startswith('_bootstrap (')
+    assert frames[-1].startswith('busy_wait (tests/test_profiling.py:')
+
+
+def test_collapse_formats_flame_graph_lines():
+    counts = Counter({'main;parse': 2, 'main;fetch;send': 5})
+
+    assert collapse(counts) == 'main;fetch;send 5\nmain;parse 2\n'
+
+
+def test_is_authorized_needs_the_expected_token():
+    assert is_authorized('secret', 'secret')
+    assert not is_authorized('guess', 'secret')
+    assert not is_authorized(None, 'secret')
+    assert not is_authorized('', '')
+
+
+def test_store_prunes_old_reports_and_rejects_bad_ids(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+
+    for index in range(3):
+        store.save(f'p{index}', Counter({'main': index + 1}))
+        time.sleep(0.01)
+
+    assert store.get('p0') is None
+    assert store.get('p2') == 'main 3\n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'p1.collapsed',
+        'p2.collapsed',
+    ]
+    assert store.get('../p2') is None
+    with pytest.raises(ValueError, match='Invalid profile id'):
+        store.save('../p3', Counter())
+
+
+def test_continuous_profiler_flushes_stacks_by_thread(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    profiler = ContinuousProfiler(store, interval=0.01, flush_interval=60)
+
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+
+    (path,) = tmp_path.iterdir()
+    assert path.name.startswith('continuous-')
+    lines = path.read_text().splitlines()
+    assert any(line.startswith('MainThread;') for line in lines)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+    assert profiler.flush() is None
+
+
+def test_middleware_profiles_authorized_requests(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    app = FastAPI()
+    app.add_middleware(
+        ProfilingMiddleware,
+        paths=['/slow'],
+        admin_token=lambda: 'secret',
+        get_store=lambda: store,
+    )
+
+    @app.get('/slow')
+    async def slow():
+        time.sleep(0.05)
+        await asyncio.sleep(0)
+        return {}
+
+    client = TestClient(app)
+    plain = client.get('/slow', params={'profile': 1})
+    unauthorized = client.get(
+        '/slow', headers={'X-Profile': '1', 'X-Admin-Token': 'guess'}
+    )
+    profiled = client.get(
+        '/slow',
+        params={'profile': 'true'},
+        headers={'X-Admin-Token': 'secret'},
+    )
+
+    assert plain.status_code == HTTPStatus.OK
+    assert 'X-Profile-Id' not in plain.headers
+    assert 'X-Profile-Id' not in unauthorized.headers
+    assert profiled.status_code == HTTPStatus.OK
+    report = store.get(profiled.headers['X-Profile-Id'])
+    assert 'slow (tests/test_profiling.py:' in report
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from app.openweathersdk.openweather import AsyncOpenWeather, OpenWeather
+from app.openweathersdk.ratelimit import (
+    BULK,
+    INTERACTIVE,
+    RateLimitedError,
+    RateLimiter,
+    parse_retry_after,
+)
+from tests.mocks import mock_city
+
+# share of a computed wait that timing assertions require, for slow clocks
+SLACK = 0.75
+
+
+def test_burst_is_granted_without_waiting():
+    limiter = RateLimiter(rate=1, burst=3)
+
+    waits = [limiter.acquire() for _ in range(3)]
+
+    assert waits == pytest.approx([0, 0, 0], abs=0.01)
+    assert limiter.expected_wait() == pytest.approx(1, abs=0.05)
+
+
+def test_waiters_are_served_by_priority():
+    limiter = RateLimiter(rate=50, burst=1)
+    limiter.acquire()
+    order = []
+
+    def take(priority, label):
+        limiter.acquire(priority)
+        order.append(label)
+
+    threads = [threading.Thread(target=take, args=(BULK, 'bulk'))]
+    threads[0].start()
+    time.sleep(0.005)
+    threads.append(
+        threading.Thread(target=take, args=(INTERACTIVE, 'interactive'))
+    )
+    threads[1].start()
+    assert limiter.queue_depth == len(threads)
+
+    for thread in threads:
+        thread.join()
+
+    assert order == ['interactive', 'bulk']
+    assert limiter.queue_depth == 0
+
+
+def test_async_waiters_share_the_bucket():
+    rate, burst, waiters = 100, 2, 4
+    limiter = RateLimiter(rate=rate, burst=burst)
+
+    async def run():
+        return await asyncio.gather(
+            *(limiter.acquire_async() for _ in range(waiters))
+        )
+
+    started = time.monotonic()
+    asyncio.run(run())
+
+    elapsed = time.monotonic() - started
+    assert elapsed >= (waiters - burst) / rate * SLACK
+    assert limiter.stats()['granted'] == waiters
+
+
+def test_long_waits_fail_fast(clock):
+    max_queue_wait = 5
+    limiter = RateLimiter(
+        rate=0.1, clock=clock, name='Slow', max_queue_wait=max_queue_wait
+    )
+    limiter.acquire()
+
+    with pytest.raises(RateLimitedError, match='Slow') as err:
+        limiter.acquire(BULK)
+
+    assert err.value.retry_after > max_queue_wait
+    assert limiter.queue_depth == 0
+
+
+def test_full_queue_fails_fast():
+    limiter = RateLimiter(rate=20, max_queue=1)
+    limiter.acquire()
+    waiter = threading.Thread(target=limiter.acquire)
+    waiter.start()
+    time.sleep(0.005)
+
+    with pytest.raises(RateLimitedError):
+        limiter.acquire()
+
+    waiter.join()
+    assert limiter.queue_depth == 0
+
+
+def test_penalize_pauses_the_bucket():
+    pause = 0.05
+    limiter = RateLimiter(rate=1000, burst=5)
+    limiter.penalize(pause)
+
+    assert limiter.acquire() >= pause * SLACK
+
+
+@pytest.mark.parametrize(
+    ('header', 'default', 'expected'),
+    [
+        ('3', 0, 3),
+        (None, 2, 2),
+        ('Wed, 21 Oct 2015 07:28:00 GMT', 0, 0),
+    ],
+)
+def test_parse_retry_after(header, default, expected):
+    assert parse_retry_after(header, default=default) == expected
+
+
+def test_client_honours_retry_after():
+    retry_after = 0.05
+    opw = OpenWeather(rate_limiter=RateLimiter(rate=1000, burst=5))
+    limited = MagicMock(
+        status_code=429, headers={'Retry-After': str(retry_after)}
+    )
+    ok = MagicMock(status_code=200, content=b'[]')
+    responses = [limited, ok]
+    opw.session.get = MagicMock(side_effect=responses)
+
+    started = time.monotonic()
+    assert opw.get_city_location('Nowhere') == []
+
+    assert time.monotonic() - started >= retry_after * SLACK
+    assert opw.session.get.call_count == len(responses)
+
+
+def test_client_fails_fast_on_long_retry_after():
+    limiter = RateLimiter(rate=1000, burst=5)
+    opw = OpenWeather(rate_limiter=limiter, rate_limit_max_wait=1)
+    limited = MagicMock(status_code=429, headers={'Retry-After': '120'})
+    opw.session.get = MagicMock(return_value=limited)
+
+    with pytest.raises(RateLimitedError) as err:
+        opw.get_city_location('Nowhere')
+
+    assert err.value.retry_after == float(limited.headers['Retry-After'])
+    assert opw.session.get.call_count == 1
+    assert limiter.expected_wait() == 0
+
+
+def test_async_client_gives_up_after_retries():
+    def handler(request):
+        return httpx.Response(429, headers={'Retry-After': '0'})
+
+    async def run():
+        opw = AsyncOpenWeather(rate_limit_retries=1)
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await opw.get_city_location('Natal')
+
+    with pytest.raises(Exception, match='429'):
+        asyncio.run(run())
+
+
+def test_async_client_waits_for_tokens():
+    rate = 50
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        return httpx.Response(200, json=[mock_city])
+
+    async def run():
+        opw = AsyncOpenWeather(rate_limiter=RateLimiter(rate=rate, burst=1))
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await asyncio.gather(
+            opw.get_city_location('Natal'),
+            opw.get_city_location('Recife'),
+        )
+
+    asyncio.run(run())
+
+    assert calls[1] - calls[0] >= SLACK / rate
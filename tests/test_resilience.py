@@ -0,0 +1,245 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+import requests
+
+from app.gist import AsyncGistClient, GistClient
+from app.openweathersdk.openweather import AsyncOpenWeather, OpenWeather
+from app.openweathersdk.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+)
+from tests.mocks import mock_response
+
+
+def test_retry_delays_are_jittered_and_bounded():
+    policy = RetryPolicy(attempts=5, backoff=1, max_backoff=3)
+    delays = list(policy.delays())
+
+    assert len(delays) == policy.attempts - 1
+    for delay, bound in zip(delays, (1, 2, 3, 3)):
+        assert 0 <= delay <= bound
+
+
+def test_circuit_breaker_opens_and_recovers(clock):
+    recovery = 10
+    breaker = CircuitBreaker(
+        'upstream', failure_threshold=2, recovery_timeout=recovery, clock=clock
+    )
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.check()
+    assert exc_info.value.retry_after == recovery
+
+    clock.now = recovery
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 2 * recovery
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_client_retries_transient_errors():
+    opw = OpenWeather(retry_policy=RetryPolicy(attempts=3, backoff=0))
+    ok = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
+    responses = [
+        requests.ConnectionError('reset'),
+        MagicMock(status_code=503),
+        ok,
+    ]
+    opw.session.get = MagicMock(side_effect=responses)
+
+    forecast = opw.get_weather_forecast(-5.8, -35.2)
+
+    assert forecast.city.name == 'Natal'
+    assert opw.session.get.call_count == len(responses)
+
+
+def test_client_does_not_retry_client_errors():
+    opw = OpenWeather(retry_policy=RetryPolicy(attempts=3, backoff=0))
+    response = MagicMock(status_code=404)
+    response.raise_for_status.side_effect = requests.HTTPError('404')
+    opw.session.get = MagicMock(return_value=response)
+
+    with pytest.raises(requests.HTTPError):
+        opw.get_weather_forecast(-5.8, -35.2)
+    assert opw.session.get.call_count == 1
+
+
+def test_async_client_fails_fast_while_circuit_is_open():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError('refused', request=request)
+
+    policy = RetryPolicy(attempts=2, backoff=0)
+
+    async def run():
+        opw = AsyncOpenWeather(
+            retry_policy=policy,
+            circuit_breaker=CircuitBreaker('OpenWeather', failure_threshold=1),
+        )
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with pytest.raises(Exception, match='refused'):
+            await opw.get_weather_forecast(-5.8, -35.2)
+        with pytest.raises(CircuitOpenError):
+            await opw.get_weather_forecast(-5.8, -35.2)
+        await opw.aclose()
+
+    asyncio.run(run())
+
+    assert len(calls) == policy.attempts
+
+
+def test_gist_client_retries_edits():
+    client = GistClient('token', retry_policy=RetryPolicy(backoff=0))
+    edited = MagicMock(status_code=200)
+    edited.json.return_value = {'html_url': 'https://gist.github.com/1'}
+    responses = [MagicMock(status_code=502), edited]
+    client.session.patch = MagicMock(side_effect=responses)
+
+    assert client.edit_gist('1', 'forecast', 'content') == (
+        'https://gist.github.com/1'
+    )
+    assert client.session.patch.call_count == len(responses)
+
+
+def test_gist_client_looks_up_a_failed_create_before_retrying():
+    client = GistClient('token', retry_policy=RetryPolicy(backoff=0))
+    created = MagicMock(status_code=201)
+    created.json.return_value = {'html_url': 'https://gist.github.com/1'}
+    responses = [MagicMock(status_code=502), created]
+    client.session.post = MagicMock(side_effect=responses)
+    listed = MagicMock(status_code=200)
+    listed.json.return_value = []
+    client.session.get = MagicMock(return_value=listed)
+
+    assert client.create_gist('forecast', 'content') == (
+        'https://gist.github.com/1'
+    )
+    assert client.session.post.call_count == len(responses)
+    assert 'since' in client.session.get.call_args.kwargs['params']
+
+
+def listed_gist(gist_id: str, content: str) -> dict:
+    return {
+        'id': gist_id,
+        'html_url': f'https://gist.github.com/{gist_id}',
+        'description': 'Weather forecast message',
+        'files': {'forecast': {'size': len(content.encode())}},
+    }
+
+
+def fetched_gist(gist_id: str, content: str) -> dict:
+    gist = listed_gist(gist_id, content)
+    gist['files']['forecast']['content'] = content
+    return gist
+
+
+def gist_api(*contents: str):
+    gists = {str(n): content for n, content in enumerate(contents, 1)}
+
+    def get(url, **kwargs):
+        response = MagicMock(status_code=200)
+        gist_id = url.rsplit('/', 1)[1]
+        if gist_id in gists:
+            response.json.return_value = fetched_gist(gist_id, gists[gist_id])
+        else:
+            response.json.return_value = [
+                listed_gist(n, content) for n, content in gists.items()
+            ]
+        return response
+
+    return MagicMock(side_effect=get)
+
+
+def test_gist_client_does_not_create_a_gist_twice():
+    client = GistClient('token', retry_policy=RetryPolicy(backoff=0))
+    client.session.post = MagicMock(side_effect=requests.Timeout('read'))
+    client.session.get = gist_api('other', 'content')
+
+    assert client.create_gist('forecast', 'content') == (
+        'https://gist.github.com/2'
+    )
+    assert client.session.post.call_count == 1
+
+
+def test_gist_client_ignores_other_gists_of_the_same_size():
+    client = GistClient('token', retry_policy=RetryPolicy(backoff=0))
+    created = MagicMock(status_code=201)
+    created.json.return_value = {'html_url': 'https://gist.github.com/3'}
+    responses = [requests.Timeout('read'), created]
+    client.session.post = MagicMock(side_effect=responses)
+    client.session.get = gist_api('CONTENT')
+
+    assert client.create_gist('forecast', 'content') == (
+        'https://gist.github.com/3'
+    )
+    assert client.session.post.call_count == len(responses)
+
+
+def test_async_gist_client_does_not_create_a_gist_twice():
+    requested = []
+
+    def handler(request):
+        requested.append((request.method, request.url.path))
+        if request.method == 'POST':
+            raise httpx.ReadTimeout('read', request=request)
+        if request.url.path == '/gists/1':
+            return httpx.Response(200, json=fetched_gist('1', 'content'))
+        return httpx.Response(200, json=[listed_gist('1', 'content')])
+
+    async def run():
+        client = AsyncGistClient('token', retry_policy=RetryPolicy(backoff=0))
+        client.session = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        return await client.create_gist('forecast', 'content')
+
+    assert asyncio.run(run()) == 'https://gist.github.com/1'
+    assert requested == [
+        ('POST', '/gists'),
+        ('GET', '/gists'),
+        ('GET', '/gists/1'),
+    ]
+
+
+def test_clients_count_upstream_statuses():
+    opw = OpenWeather(retry_policy=RetryPolicy(attempts=3, backoff=0))
+    ok = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
+    opw.session.get = MagicMock(
+        side_effect=[requests.ConnectionError('reset'), ok]
+    )
+    gist = GistClient('token', retry_policy=RetryPolicy(backoff=0))
+    created = MagicMock(status_code=201)
+    created.json.return_value = {'html_url': 'https://gist.github.com/1'}
+    gist.session.post = MagicMock(
+        side_effect=[MagicMock(status_code=502), created]
+    )
+    listed = MagicMock(status_code=200)
+    listed.json.return_value = []
+    gist.session.get = MagicMock(return_value=listed)
+
+    opw.get_weather_forecast(-5.8, -35.2)
+    gist.create_gist('forecast', 'content')
+
+    assert opw.statuses == {'error': 1, 200: 1}
+    assert gist.statuses == {502: 1, 200: 1, 201: 1}
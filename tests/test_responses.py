@@ -0,0 +1,16 @@
+import json
+
+from app.openweathersdk.models import City
+from app.responses import FastJSONResponse
+from tests.mocks import mock_city
+
+
+def test_fast_json_response_serializes_models_as_is():
+    city = City(**mock_city)
+    response = FastJSONResponse({'locations': [city], 'total': 1})
+
+    assert response.media_type == 'application/json'
+    assert json.loads(response.body) == {
+        'locations': [city.model_dump()],
+        'total': 1,
+    }
@@ -0,0 +1,81 @@
+import copy
+
+import pytest
+
+from app.aggregation import aggregate_daily, forecast_columns
+from app.openweathersdk.openweather import WeatherData, WeatherForecast
+from app.openweathersdk.series import ForecastSeries
+from app.util import build_forecast_message
+from tests.mocks import mock_response
+
+mock_forecast = WeatherForecast(**mock_response)
+
+
+def test_series_round_trips_to_forecast():
+    series = ForecastSeries.from_dict(mock_response)
+
+    assert series.cnt == mock_forecast.cnt
+    assert series.city == mock_forecast.city
+    assert series.to_forecast() == mock_forecast
+    assert ForecastSeries.from_forecast(mock_forecast).to_forecast() == (
+        mock_forecast
+    )
+
+
+def malformed(path: tuple, value):
+    data = copy.deepcopy(mock_response)
+    *parents, key = path
+    target = data
+    for parent in parents:
+        target = target[parent]
+    if value is None:
+        del target[key]
+    else:
+        target[key] = value
+    return data
+
+
+@pytest.mark.parametrize(
+    ('path', 'value'),
+    [
+        (('list',), None),
+        (('list', 0, 'main', 'temp'), '28.5'),
+        (('list', 0, 'main', 'humidity'), 300),
+        (('list', 0, 'weather', 0, 'description'), 7),
+        (('city', 'coord'), None),
+    ],
+)
+def test_series_rejects_malformed_forecasts(path, value):
+    with pytest.raises(ValueError, match='Malformed forecast'):
+        ForecastSeries.from_dict(malformed(path, value))
+
+
+def test_series_builds_weather_data_on_access():
+    series = ForecastSeries.from_dict(mock_response)
+
+    assert len(series.list) == len(mock_response['list'])
+    assert isinstance(series.list[0], WeatherData)
+    assert series.list[-1] == mock_forecast.list[-1]
+    assert series.list[1:3] == mock_forecast.list[1:3]
+    assert series.list[0].rain is None
+
+
+def test_series_interns_conditions():
+    first = ForecastSeries.from_dict(mock_response)
+    second = ForecastSeries.from_dict(mock_response)
+
+    assert (
+        first.list[0].weather[0].description
+        is second.list[0].weather[0].description
+    )
+
+
+def test_series_aggregates_like_forecast():
+    series = ForecastSeries.from_dict(mock_response)
+
+    assert aggregate_daily(forecast_columns(series)) == aggregate_daily(
+        forecast_columns(mock_forecast)
+    )
+    assert build_forecast_message(series, '°C') == build_forecast_message(
+        mock_forecast, '°C'
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from app.openweathersdk.openweather import (
+    AsyncOpenWeather,
+    OpenWeather,
+    WeatherForecast,
+)
+from app.openweathersdk.singleflight import AsyncSingleFlight, SingleFlight
+from tests.mocks import mock_response
+
+
+def test_concurrent_threads_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flights.do, 'key', fetch) for _ in range(8)]
+        time.sleep(0.05)
+        release.set()
+        results = {id(future.result()) for future in futures}
+
+    assert len(calls) == 1
+    assert len(results) == 1
+    assert len(flights) == 0
+
+
+def test_errors_are_shared_and_not_kept():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError, match='boom'):
+        flights.do('key', fail)
+    assert flights.do('key', lambda: 'ok') == 'ok'
+
+
+def test_concurrent_coroutines_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def run():
+        flights = AsyncSingleFlight()
+        results = await asyncio.gather(
+            *(flights.do('key', fetch) for _ in range(8))
+        )
+        return flights, results
+
+    flights, results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+    assert len(flights) == 0
+
+
+def test_sync_client_coalesces_forecasts():
+    opw = OpenWeather()
+    release = threading.Event()
+    response = MagicMock(content=json.dumps(mock_response).encode())
+
+    def get(*args, **kwargs):
+        release.wait()
+        return response
+
+    opw.session.get = MagicMock(side_effect=get)
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [
+            pool.submit(opw.get_weather_forecast, -5.8, -35.2)
+            for _ in range(4)
+        ]
+        time.sleep(0.05)
+        release.set()
+        forecasts = [future.result() for future in futures]
+
+    assert opw.session.get.call_count == 1
+    assert all(forecast is forecasts[0] for forecast in forecasts)
+
+
+def test_async_client_coalesces_forecasts():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=mock_response)
+
+    async def run():
+        opw = AsyncOpenWeather()
+        opw.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return await asyncio.gather(
+            *(opw.get_weather_forecast(-5.8, -35.2) for _ in range(4))
+        )
+
+    forecasts = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert isinstance(forecasts[0], WeatherForecast)
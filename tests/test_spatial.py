@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from app.openweathersdk.spatial import GridIndex, KDTree, haversine_km
+
+
+def test_haversine_km():
+    assert haversine_km(0, 0, 0, 0) == 0
+    assert haversine_km(0, 0, 1, 0) == pytest.approx(111.195, rel=1e-4)
+    assert haversine_km(-5.795, -35.209, -23.55, -46.633) == pytest.approx(
+        2316, rel=1e-2
+    )
+
+
+def test_within_returns_nearest_first():
+    index = GridIndex(2)
+    index.insert('natal', -5.7945, -35.211)
+    index.insert('parnamirim', -5.9156, -35.2628)
+    index.insert('near-natal', -5.8, -35.2)
+
+    radius_km = 2
+    found = index.within(-5.795, -35.209, radius_km)
+
+    assert [item for _, item in found] == ['natal', 'near-natal']
+    assert found[0][0] < found[1][0] <= radius_km
+
+
+def test_insert_moves_and_remove_forgets():
+    index = GridIndex(1)
+    index.insert('point', 10, 10)
+    index.insert('point', 20, 20)
+
+    assert len(index) == 1
+    assert index.within(10, 10, 1) == []
+    assert [item for _, item in index.within(20, 20, 1)] == ['point']
+
+    index.remove('point')
+    index.remove('point')
+    assert len(index) == 0
+    assert index.within(20, 20, 1) == []
+
+
+def test_within_wraps_around_antimeridian_and_poles():
+    index = GridIndex(5)
+    index.insert('east', 0, 179.99)
+    index.insert('pole', 89.99, 0)
+
+    assert [item for _, item in index.within(0, -179.99, 5)] == ['east']
+    assert [item for _, item in index.within(89.99, 180, 5)] == ['pole']
+
+
+def test_kdtree_matches_a_linear_scan():
+    rng = random.Random(7)
+    points = [
+        (rng.uniform(-90, 90), rng.uniform(-180, 180), index)
+        for index in range(2000)
+    ]
+    tree = KDTree(points)
+
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        expected = sorted(
+            (haversine_km(lat, lon, item_lat, item_lon), item)
+            for item_lat, item_lon, item in points
+        )[:3]
+        found = tree.nearest(lat, lon, 3)
+
+        assert [item for _, item in found] == [item for _, item in expected]
+        assert found[0][0] == pytest.approx(expected[0][0], abs=1e-6)
+
+
+def test_kdtree_wraps_around_the_antimeridian_and_poles():
+    tree = KDTree([
+        (0, 179.9, 'east'),
+        (0, -179.9, 'west'),
+        (89.9, 0, 'north'),
+    ])
+
+    assert [item for _, item in tree.nearest(0, -179.95, 2)] == [
+        'west',
+        'east',
+    ]
+    assert tree.nearest(89.9, 180, 1)[0][1] == 'north'
+    assert tree.nearest(0, 0, 0) == []
+    assert KDTree([]).nearest(0, 0) == []
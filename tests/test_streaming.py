@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.streaming import iter_lines, map_as_completed, ndjson_line, sse_event
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_iter_lines_joins_chunks_and_skips_blank_lines():
+    lines = asyncio.run(
+        collect(
+            iter_lines(chunks(b'{"a": 1}\n{"b"', b': 2}\n\n', b'{"c": 3}'))
+        )
+    )
+
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_iter_lines_rejects_long_lines():
+    with pytest.raises(ValueError, match='longer than 4 bytes'):
+        asyncio.run(collect(iter_lines(chunks(b'x' * 10), max_line=4)))
+
+
+def test_map_as_completed_yields_in_completion_order_with_bounded_calls():
+    concurrency = 2
+    running = 0
+    peak = 0
+
+    async def slow_echo(index, item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - item))
+        running -= 1
+        return index
+
+    async def items():
+        for item in range(5):
+            yield item
+
+    results = asyncio.run(
+        collect(map_as_completed(slow_echo, items(), concurrency))
+    )
+
+    assert sorted(results) == [0, 1, 2, 3, 4]
+    assert results[:concurrency] == [1, 0]
+    assert peak == concurrency
+
+
+def test_map_as_completed_reads_only_as_fast_as_results_are_consumed():
+    concurrency = 3
+    read = 0
+
+    async def items():
+        nonlocal read
+        for item in range(100):
+            read += 1
+            yield item
+
+    async def echo(index, item):
+        return item
+
+    async def take_two():
+        results = map_as_completed(echo, items(), concurrency)
+        taken = [await anext(results), await anext(results)]
+        await asyncio.sleep(0.01)
+        await results.aclose()
+        return taken
+
+    assert asyncio.run(take_two()) == [0, 1]
+    assert read <= 2 * concurrency
+
+
+def test_stream_formats():
+    assert ndjson_line({'index': 1}) == b'{"index":1}\n'
+    assert sse_event({'index': 1}, 'forecast', 1) == (
+        b'event: forecast\nid: 1\ndata: {"index":1}\n\n'
+    )
@@ -0,0 +1,190 @@
+import json
+import time
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from app.openweathersdk.openweather import OpenWeather
+from app.openweathersdk.resilience import RetryPolicy
+from app.tracing import (
+    SERVER,
+    STATUS_ERROR,
+    FileSpanExporter,
+    InMemorySpanExporter,
+    Tracer,
+    current_span,
+)
+from tests.mocks import mock_response
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+def test_spans_nest_and_carry_the_request_id():
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.start_trace('GET', request_id='abc', kind=SERVER) as root:
+        with tracer.span('fetch', url='http://api') as fetch:
+            assert current_span() is fetch
+            with tracer.span('parse'):
+                pass
+        with tracer.span('aggregate'):
+            pass
+    assert current_span() is None
+    tracer.flush()
+
+    spans = {span.name: span for span in exporter.spans}
+    assert list(spans) == ['parse', 'fetch', 'aggregate', 'GET']
+    assert {span.trace_id for span in exporter.spans} == {root.trace_id}
+    assert spans['GET'].parent_id is None
+    assert spans['fetch'].parent_id == root.span_id
+    assert spans['parse'].parent_id == fetch.span_id
+    assert all(
+        span.attributes['request.id'] == 'abc' for span in exporter.spans
+    )
+    assert spans['fetch'].attributes['url'] == 'http://api'
+    assert spans['fetch'].end_ns >= spans['parse'].end_ns
+
+
+def test_failed_span_records_its_error():
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    with pytest.raises(ValueError, match='bad json'):
+        with tracer.span('parse'):
+            raise ValueError('bad json')
+    tracer.flush()
+
+    (span,) = exporter.spans
+    assert span.status == STATUS_ERROR
+    assert span.status_message == 'ValueError: bad json'
+
+
+def test_head_sampling_decides_for_the_whole_trace():
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter, sample_rate=0.0)
+
+    with tracer.start_trace('GET', request_id='abc') as root:
+        with tracer.span('fetch') as fetch:
+            fetch.set_attribute('http.status_code', 200)
+    tracer.flush()
+
+    assert not root.sampled
+    assert root.request_id == 'abc'
+    assert exporter.spans == []
+
+    with tracer.start_trace(
+        'GET', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-01'
+    ):
+        with tracer.span('fetch'):
+            pass
+    with Tracer(exporter, sample_rate=1.0).start_trace(
+        'GET', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-00'
+    ) as unsampled:
+        pass
+    tracer.flush()
+
+    assert not unsampled.sampled
+    assert [span.name for span in exporter.spans] == ['fetch', 'GET']
+    assert exporter.spans[1].trace_id == TRACE_ID
+    assert exporter.spans[1].parent_id == PARENT_ID
+
+
+def test_full_queue_drops_the_oldest_spans():
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter, batch_size=10, max_queue=2)
+
+    for name in ('a', 'b', 'c'):
+        with tracer.span(name):
+            pass
+    tracer.flush()
+
+    assert [span.name for span in exporter.spans] == ['b', 'c']
+    assert tracer.stats()['dropped'] == 1
+
+
+def test_export_thread_logs_failures_and_keeps_going(caplog):
+    exporter = InMemorySpanExporter()
+    failures = [OSError('collector down')]
+
+    def export(spans, service_name):
+        if failures:
+            raise failures.pop()
+        exporter.export(spans, service_name)
+
+    tracer = Tracer(MagicMock(export=export), export_interval=0.01)
+    tracer.start()
+    with tracer.span('lost'):
+        pass
+    for _ in range(100):
+        if not failures:
+            break
+        time.sleep(0.01)
+    with tracer.span('kept'):
+        pass
+    tracer.stop()
+
+    assert 'collector down' in caplog.text
+    assert [span.name for span in exporter.spans] == ['kept']
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracer = Tracer(FileSpanExporter(str(path)), service_name='weather')
+
+    with tracer.start_trace('GET', request_id='abc'):
+        with tracer.span('fetch', attempt=2, cached=False):
+            pass
+    tracer.flush()
+
+    (line,) = path.read_text().splitlines()
+    (resource_spans,) = json.loads(line)['resourceSpans']
+    assert resource_spans['resource']['attributes'] == [
+        {'key': 'service.name', 'value': {'stringValue': 'weather'}}
+    ]
+    fetch, root = resource_spans['scopeSpans'][0]['spans']
+    assert fetch['parentSpanId'] == root['spanId']
+    assert len(fetch['traceId']) == len(TRACE_ID)
+    assert {'key': 'attempt', 'value': {'intValue': '2'}} in (
+        fetch['attributes']
+    )
+    assert {'key': 'cached', 'value': {'boolValue': False}} in (
+        fetch['attributes']
+    )
+    assert int(root['endTimeUnixNano']) >= int(root['startTimeUnixNano'])
+
+
+def test_client_traces_every_attempt_of_a_call():
+    exporter = InMemorySpanExporter()
+    opw = OpenWeather(
+        retry_policy=RetryPolicy(attempts=3, backoff=0),
+        tracer=Tracer(exporter),
+    )
+    ok = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
+    opw.session.get = MagicMock(
+        side_effect=[
+            requests.ConnectionError('reset'),
+            MagicMock(status_code=HTTPStatus.SERVICE_UNAVAILABLE),
+            ok,
+        ]
+    )
+
+    opw.get_weather_forecast(-5.8, -35.2)
+    opw.tracer.flush()
+
+    spans = exporter.spans
+    call = spans[-1]
+    attempts = [span for span in spans if span.name == 'openweather.request']
+    assert call.name == 'openweather.get_weather_forecast'
+    assert [span.attributes['attempt'] for span in attempts] == [1, 2, 3]
+    assert attempts[0].status == STATUS_ERROR
+    assert (
+        attempts[1].attributes['http.status_code']
+        == HTTPStatus.SERVICE_UNAVAILABLE
+    )
+    assert attempts[2].attributes['url'].endswith('data/2.5/forecast')
+    assert {span.parent_id for span in spans[:-1]} == {call.span_id}
+    assert 'openweather.parse' in [span.name for span in spans]
@@ -3,7 +3,15 @@ from datetime import datetime
 
 import pytest
 
-from app.util import create_gist, format_datetime_into_date
+from app.openweathersdk.openweather import WeatherForecast
+from app.util import (
+    build_forecast_message,
+    create_gist,
+    etag_matches,
+    format_datetime_into_date,
+    make_etag,
+)
+from tests.mocks import mock_response
 
 
 @pytest.mark.parametrize(
@@ -22,6 +30,40 @@ def test_format_datetime_into_date(
     assert result == expected
 
 
+def test_build_forecast_message():
+    message = build_forecast_message(WeatherForecast(**mock_response), '°C')
+
+    assert message == (
+        '28.11°C e nublado em Natal em 24/09. '
+        'Média para os próximos dias: 25°C em 25/09, 25°C em 26/09, '
+        '26°C em 27/09, 26°C em 28/09, 25°C em 29/09.'
+    )
+
+
+def test_make_etag_is_strong_and_stable():
+    etag = make_etag('forecast', (-5.81, -35.21), 1727190000.0)
+
+    assert etag == make_etag('forecast', (-5.81, -35.21), 1727190000.0)
+    assert etag != make_etag('forecast', (-5.81, -35.21), 1727190001.0)
+    assert etag.startswith('"')
+    assert etag.endswith('"')
+
+
+@pytest.mark.parametrize(
+    ('if_none_match', 'expected'),
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('*', True),
+        ('"xyz"', False),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
+
+
 def test_create_gist():
     token = os.getenv('GITHUB_KEY')
     gist_name = 'weather_forecast_message'